@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""
+Núcleo de BALONEO SIMPLE sin dependencias de Qt
+
+Modelo del documento, transformaciones de coordenadas y escritura de globos
+en el PDF, utilizables desde procesos de trabajo y programas sin interfaz
+gráfica. fitz se importa de forma diferida (ver lazy.py).
+
+    model       numeración de globos, filas de la tabla y JSON de dimensiones
+    transforms  zoom de render y coordenadas escena <-> página PDF
+    pdfwriter   dibujo de globos, glifos compartidos, anotaciones y perfiles
+    units       fracciones, decimales y conversión exacta mm <-> pulgadas
+    report      reporte de inspección (CSV, XLSX, PDF)
+    raster      miniaturas y exportación PNG/TIFF en procesos de trabajo
+    scan        enderezado, contraste y binarizado de planos escaneados
+    detect      detección de candidatos a globo
+    textindex   índice de cotas de la capa de texto
+    diff        comparación de revisiones
+    search      búsqueda de características
+    stats       estadística de tolerancias y apilamiento
+    cache       cachés de renders en memoria y en disco
+    workers     pool de procesos compartido
+    service     servicio HTTP local de exportación (python -m baloneo_core.service)
+"""
+
+from .model import (BalloonNumbering, new_dimension_row, snapshot_balloons, collect_dimensions,
+                    dimensions_json)
+from .transforms import BALLOON_SIZE, scene_to_pdf_point, pdf_to_scene_point, choose_render_zoom
+from .pdfwriter import (EXPORT_PROFILES, DEFAULT_EXPORT_PROFILE, ExportCancelled, draw_balloons_on_page,
+                        build_balloon_pdf, write_balloon_annotations, read_balloon_annotations)
+from .units import parse_fraction_or_decimal
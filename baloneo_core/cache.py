@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Cachés de renders: en memoria (LRU por bytes) y en disco (compartida entre instancias)
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import time
+from collections import OrderedDict, namedtuple
+from pathlib import Path
+
+
+# Carpeta de caché en disco compartida por todas las sesiones
+CACHE_DIR = Path.home() / '.cache' / 'baloneo_simple'
+# Presupuesto de memoria para renders y páginas vectoriales de todos los documentos
+MEMORY_CACHE_BUDGET = 512 * 1024 * 1024
+
+
+class MemoryRenderCache:
+    """
+    Caché LRU en memoria con presupuesto en bytes, compartida por todos los
+    documentos abiertos. Las claves incluyen el hash del PDF.
+    """
+    
+    def __init__(self, budget_bytes=MEMORY_CACHE_BUDGET):
+        self.budget_bytes = budget_bytes
+        self.items = OrderedDict()  # clave -> (valor, coste)
+        self.used_bytes = 0
+    
+    def get(self, key):
+        entry = self.items.get(key)
+        if entry is None:
+            return None
+        self.items.move_to_end(key)
+        return entry[0]
+    
+    def put(self, key, value, cost):
+        if key in self.items:
+            self.used_bytes -= self.items.pop(key)[1]
+        self.items[key] = (value, cost)
+        self.used_bytes += cost
+        # Nunca se expulsa la entrada recién guardada
+        while self.used_bytes > self.budget_bytes and len(self.items) > 1:
+            _, (_, old_cost) = self.items.popitem(last=False)
+            self.used_bytes -= old_cost
+
+
+# === CACHÉ DE RENDERS EN DISCO ===
+
+# Límite de tamaño de las cachés en disco (se eliminan los menos usados)
+RENDER_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+THUMBNAIL_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# Cabecera de los blobs 'raw': firma, ancho, alto, stride, componentes
+RAW_HEADER = struct.Struct('<4sIIII')
+RAW_MAGIC = b'BLN1'
+# Un bloqueo de evicción más viejo que esto se considera abandonado
+EVICTION_LOCK_TIMEOUT = 60.0
+
+CachedRender = namedtuple('CachedRender', 'width height stride components data')
+
+
+class RenderCache:
+    """
+    Caché en disco de renders de página compartida entre instancias.
+
+    Clave: (hash del PDF, página, zoom, rotación, variante). Formato 'raw'
+    (blob mapeable en memoria, sin decodificar) o 'png' (comprimido).
+    La escritura es atómica (archivo temporal + os.replace) y la evicción
+    LRU usa la fecha de modificación, que se actualiza en cada acierto.
+    """
+    
+    def __init__(self, directory, max_bytes=RENDER_CACHE_MAX_BYTES, fmt='raw'):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.fmt = fmt
+        self._approx_size = None  # Se calcula en la primera escritura
+    
+    def path_for(self, file_hash, page_num, zoom, rotation=0, variant=''):
+        key = f'{file_hash}:{page_num}:{zoom:.4f}:{rotation}:{variant}'
+        name = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        # Subcarpeta por hash del PDF: evita directorios enormes
+        return self.directory / file_hash[:2] / f'{name}.{self.fmt}'
+    
+    def get(self, file_hash, page_num, zoom, rotation=0, variant=''):
+        """Retorna CachedRender o None si no está en la caché"""
+        path = self.path_for(file_hash, page_num, zoom, rotation, variant)
+        try:
+            with open(path, 'rb') as f:
+                if self.fmt == 'raw':
+                    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    magic, width, height, stride, components = RAW_HEADER.unpack_from(data)
+                    if magic != RAW_MAGIC or len(data) < RAW_HEADER.size + stride * height:
+                        data.close()
+                        return None
+                else:
+                    data = f.read()
+                    # Dimensiones desde la cabecera IHDR del PNG
+                    width = int.from_bytes(data[16:20], 'big')
+                    height = int.from_bytes(data[20:24], 'big')
+                    stride = components = 0
+            # Marcar como usado recientemente (LRU)
+            os.utime(path)
+        except (OSError, ValueError, struct.error):
+            return None
+        return CachedRender(width, height, stride, components, data)
+    
+    def encode(self, pix):
+        """Codificar un fitz.Pixmap en el formato de la caché"""
+        if self.fmt == 'raw':
+            header = RAW_HEADER.pack(RAW_MAGIC, pix.width, pix.height, pix.stride, pix.n)
+            return header + pix.samples
+        return pix.tobytes('png')
+    
+    def put(self, file_hash, page_num, zoom, pix, rotation=0, variant=''):
+        """Guardar un fitz.Pixmap en la caché"""
+        self.put_bytes(file_hash, page_num, zoom, self.encode(pix), rotation, variant)
+    
+    def put_bytes(self, file_hash, page_num, zoom, data, rotation=0, variant=''):
+        """Guardar datos ya codificados en el formato de la caché"""
+        path = self.path_for(file_hash, page_num, zoom, rotation, variant)
+        temp_path = path.with_suffix(f'.{os.getpid()}.{id(data)}.tmp')
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError:
+            # Disco lleno o sin permisos: no dejar el temporal a medio escribir
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            return
+        
+        if self._approx_size is None:
+            self._approx_size = self.disk_usage()
+        else:
+            self._approx_size += len(data)
+        if self._approx_size > self.max_bytes:
+            self.evict()
+    
+    def _entries(self):
+        entries = []
+        for path in self.directory.glob('*/*.' + self.fmt):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+    
+    def disk_usage(self):
+        return sum(size for _, size, _ in self._entries())
+    
+    def evict(self):
+        """Eliminar los renders menos usados hasta quedar en el 80% del límite"""
+        lock_path = self.directory / 'evict.lock'
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            # Otra instancia está evictando; si el bloqueo quedó huérfano se elimina
+            try:
+                if time.time() - lock_path.stat().st_mtime > EVICTION_LOCK_TIMEOUT:
+                    os.unlink(lock_path)
+            except OSError:
+                pass
+            return
+        except OSError:
+            return
+        
+        try:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            target = self.max_bytes * 0.8
+            for _, size, path in entries:
+                if total <= target:
+                    break
+                try:
+                    os.unlink(path)
+                    total -= size
+                except OSError:
+                    pass  # En uso por otra instancia (Windows): se intenta la próxima vez
+            self._approx_size = total
+        finally:
+            os.close(fd)
+            try:
+                os.unlink(lock_path)
+            except OSError:
+                pass
+
+
+def file_digest(file_path, chunk_size=1 << 20):
+    """Hash del contenido del archivo (identifica el PDF aunque cambie de nombre)"""
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
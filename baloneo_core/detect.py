@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Detección automática de candidatos a globo (reglas sobre texto y dibujos, sin IA)
+"""
+
+from .lazy import fitz
+from .textindex import DIMENSION_TOKEN_RE, WordIndex, parse_dimension_words
+from .workers import worker_document
+
+
+# Símbolos GD&T (características geométricas y modificadores)
+GDT_SYMBOLS = set('⌖⊥∥∠⌓⌒◎⌭⏥⌯↗⌰⏤⏢')
+# Alto (en puntos PDF) de un marco de control de tolerancia típico
+FRAME_MIN_HEIGHT = 6.0
+FRAME_MAX_HEIGHT = 30.0
+
+
+def find_page_candidates(page):
+    """
+    Proponer posiciones de globo en una página a partir de reglas sobre la
+    capa de texto y los dibujos vectoriales (sin IA).
+    Retorna una lista de dicts con 'kind', 'rect', 'text', 'nominal', 'tol_pos', 'tol_neg'.
+    """
+    candidates = []
+    claimed = []  # Rects ya propuestos, para no duplicar cotas dentro de marcos
+    
+    # Marcos de control de tolerancia: rectángulos bajos y alargados con texto
+    frames = []
+    for drawing in page.get_drawings():
+        rect = drawing['rect']
+        if (FRAME_MIN_HEIGHT <= rect.height <= FRAME_MAX_HEIGHT and
+                rect.width >= rect.height * 2 and
+                any(item[0] == 're' for item in drawing['items'])):
+            frames.append(rect)
+    
+    words = page.get_text("words")
+    for frame in frames:
+        inside = [w for w in words if fitz.Rect(w[:4]).intersects(frame)]
+        text = ' '.join(w[4] for w in inside)
+        if not text:
+            continue
+        # Solo marcos que contienen un símbolo GD&T o un valor numérico
+        if any(ch in GDT_SYMBOLS for ch in text) or any(ch.isdigit() for ch in text):
+            candidates.append({
+                'kind': 'marco', 'rect': tuple(frame), 'text': text,
+                'nominal': None, 'tol_pos': None, 'tol_neg': None
+            })
+            claimed.append(frame)
+    
+    index = WordIndex(words)
+    for line in index.lines.values():
+        i = 0
+        while i < len(line):
+            word = line[i]
+            if any(ch in GDT_SYMBOLS for ch in word[4]):
+                # Símbolo GD&T suelto (fuera de un marco detectado)
+                rect = fitz.Rect(word[:4])
+                if not any(rect.intersects(frame) for frame in claimed):
+                    candidates.append({
+                        'kind': 'gdt', 'rect': tuple(rect), 'text': word[4],
+                        'nominal': None, 'tol_pos': None, 'tol_neg': None
+                    })
+                    claimed.append(rect)
+                i += 1
+                continue
+            
+            dimension = parse_dimension_words(line, i)
+            if not dimension:
+                i += 1
+                continue
+            
+            nominal, tol_pos, tol_neg, text, rect = dimension
+            consumed = len(text.split())
+            match = DIMENSION_TOKEN_RE.match(word[4])
+            # Los enteros sin prefijo ni tolerancia suelen ser notas o números de hoja
+            is_dimension = (match.group('prefix') or tol_pos or tol_neg or
+                            '.' in nominal or '/' in nominal)
+            rect = fitz.Rect(rect)
+            if is_dimension and not any(rect.intersects(frame) for frame in claimed):
+                candidates.append({
+                    'kind': 'tolerancia' if (tol_pos or tol_neg) else 'cota',
+                    'rect': tuple(rect), 'text': text,
+                    'nominal': nominal, 'tol_pos': tol_pos, 'tol_neg': tol_neg
+                })
+            i += consumed
+    
+    # Orden de lectura: de arriba a abajo, de izquierda a derecha
+    candidates.sort(key=lambda c: (round(c['rect'][1] / 20), c['rect'][0]))
+    return candidates
+
+
+def detect_page_candidates(pdf_path, page_num):
+    """Tarea de un proceso de trabajo: detectar candidatos de una página"""
+    return page_num, find_page_candidates(worker_document(pdf_path)[page_num])
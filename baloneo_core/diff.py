@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+Comparación de revisiones: zonas de la página que cambiaron entre dos PDF
+"""
+
+import hashlib
+from collections import Counter
+
+from .lazy import fitz
+
+
+# Zoom bajo para el hash de imagen (suficiente para detectar cambios)
+DIFF_RENDER_ZOOM = 0.5
+# Tamaño de la celda (en píxeles del render de comparación)
+DIFF_TILE_SIZE = 16
+
+
+def _flatten_coords(values):
+    """Aplanar puntos, rects y quads de fitz a una secuencia de números redondeados"""
+    for value in values:
+        if isinstance(value, (int, float)):
+            yield round(value, 1)
+        elif hasattr(value, '__iter__'):
+            yield from _flatten_coords(value)
+
+
+def page_content_elements(page):
+    """
+    Extraer los elementos de texto y vectoriales de una página como
+    lista de (clave, rect) en coordenadas PDF sin rotar.
+    """
+    elements = []
+    
+    # Texto (spans) - get_text("dict") ya devuelve coordenadas sin rotar
+    text_dict = page.get_text("dict")
+    for block in text_dict.get('blocks', []):
+        for line in block.get('lines', []):
+            for span in line.get('spans', []):
+                text = span['text'].strip()
+                if not text:
+                    continue
+                bbox = tuple(round(v, 1) for v in span['bbox'])
+                elements.append((('t', text, bbox, round(span['size'], 1)), bbox))
+    
+    # Dibujos vectoriales
+    for drawing in page.get_drawings():
+        rect = tuple(round(v, 1) for v in drawing['rect'])
+        items = tuple((item[0],) + tuple(_flatten_coords(item[1:])) for item in drawing['items'])
+        key = ('d', items, drawing.get('color'), drawing.get('fill'), drawing.get('width'))
+        elements.append((key, rect))
+    
+    return elements
+
+
+def page_raster_digest(page, zoom=DIFF_RENDER_ZOOM):
+    """Renderizar la página a baja resolución en escala de grises y calcular su hash"""
+    # Sin anotaciones: los globos exportados como anotaciones no son cambios del plano
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, annots=False)
+    digest = hashlib.blake2b(pix.samples, digest_size=16).hexdigest()
+    return pix, digest
+
+
+def diff_raster_tiles(pix_old, pix_new, page, zoom=DIFF_RENDER_ZOOM, tile=DIFF_TILE_SIZE):
+    """
+    Comparar dos renders celda por celda.
+    Retorna los rectángulos cambiados en coordenadas PDF sin rotar.
+    """
+    width, height = pix_old.width, pix_old.height
+    old_samples, new_samples = pix_old.samples, pix_new.samples
+    stride_old, stride_new = pix_old.stride, pix_new.stride
+    changed = []
+    
+    for ty in range(0, height, tile):
+        rows = range(ty, min(ty + tile, height))
+        # Filas completas idénticas: saltar la banda entera
+        if all(old_samples[y * stride_old:y * stride_old + width] ==
+               new_samples[y * stride_new:y * stride_new + width] for y in rows):
+            continue
+        for tx in range(0, width, tile):
+            x1 = min(tx + tile, width)
+            if any(old_samples[y * stride_old + tx:y * stride_old + x1] !=
+                   new_samples[y * stride_new + tx:y * stride_new + x1] for y in rows):
+                # El render está en el espacio rotado: llevarlo a PDF sin rotar
+                rect = fitz.Rect(tx / zoom, ty / zoom, x1 / zoom, rows[-1] / zoom + 1 / zoom)
+                rect = rect * page.derotation_matrix
+                changed.append(tuple(rect))
+    
+    return changed
+
+
+def merge_rects(rects, gap=2.0):
+    """Fusionar rectángulos que se tocan o solapan para reducir el resaltado"""
+    merged = [fitz.Rect(r) for r in rects]
+    changed = True
+    while changed:
+        changed = False
+        result = []
+        while merged:
+            current = merged.pop()
+            i = 0
+            while i < len(merged):
+                other = merged[i]
+                if (current.x0 - gap <= other.x1 and other.x0 - gap <= current.x1 and
+                        current.y0 - gap <= other.y1 and other.y0 - gap <= current.y1):
+                    current |= other
+                    merged.pop(i)
+                    changed = True
+                else:
+                    i += 1
+            result.append(current)
+        merged = result
+    return [tuple(r) for r in merged]
+
+
+def diff_pages(old_page, new_page):
+    """
+    Comparar una página de la revisión anterior con la nueva.
+    Retorna None si la página no cambió, o la lista de rectángulos
+    cambiados (coordenadas PDF sin rotar de la página nueva).
+    """
+    old_box, new_box = old_page.cropbox, new_page.cropbox
+    if (round(old_box.width, 1), round(old_box.height, 1)) != (round(new_box.width, 1), round(new_box.height, 1)):
+        # Tamaño distinto: la página entera cambió
+        return [tuple(new_box)]
+    
+    old_elements = page_content_elements(old_page)
+    new_elements = page_content_elements(new_page)
+    
+    pix_old, digest_old = page_raster_digest(old_page)
+    pix_new, digest_new = page_raster_digest(new_page)
+    
+    old_keys = Counter(key for key, _ in old_elements)
+    new_keys = Counter(key for key, _ in new_elements)
+    
+    if digest_old == digest_new and old_keys == new_keys:
+        return None
+    
+    # Elementos que solo existen en una de las dos revisiones
+    removed = old_keys - new_keys
+    added = new_keys - old_keys
+    changed = [rect for key, rect in old_elements if key in removed]
+    changed += [rect for key, rect in new_elements if key in added]
+    
+    # Sin diferencias vectoriales (p.ej. planos escaneados): usar el render
+    if not changed and (pix_old.width, pix_old.height) == (pix_new.width, pix_new.height):
+        changed = diff_raster_tiles(pix_old, pix_new, new_page)
+    
+    if not changed:
+        # El render cambió pero no se pudo localizar: marcar la página entera
+        changed = [tuple(new_box)]
+    
+    return merge_rects(changed)
+
+
+def point_in_rects(x, y, rects, margin=0.0):
+    """Verificar si el punto cae dentro de alguno de los rectángulos"""
+    for x0, y0, x1, y1 in rects:
+        if x0 - margin <= x <= x1 + margin and y0 - margin <= y <= y1 + margin:
+            return True
+    return False
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""
+Importación diferida de dependencias pesadas
+"""
+
+import importlib.util
+import sys
+
+
+def lazy_import(name):
+    """
+    Importar un módulo de forma diferida: se carga en el primer acceso a un
+    atributo. fitz tarda más en importarse que el resto de la aplicación y no
+    hace falta para abrir la ventana.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+fitz = lazy_import('fitz')
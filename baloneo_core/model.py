@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Modelo del documento: numeración de globos y filas de la tabla de dimensiones
+"""
+
+import json
+from datetime import datetime
+
+from .units import row_value
+
+
+# Políticas de secuencia: una numeración para todo el documento o una por página
+NUMBERING_DOCUMENT = 'documento'
+NUMBERING_PAGE = 'pagina'
+
+
+class FenwickTree:
+    """Árbol de Fenwick (sumas prefijas con actualización en O(log n))"""
+    
+    def __init__(self, size=0):
+        self.size = size
+        self.tree = [0] * (size + 1)
+    
+    def add(self, index, delta):
+        """Sumar delta a la posición index (base 0)"""
+        i = index + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+    
+    def prefix(self, index):
+        """Suma de las posiciones [0, index)"""
+        total = 0
+        i = min(index, self.size)
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+
+def suffix_letters(n):
+    """Sufijo de un número intercalado: 1 -> A, 26 -> Z, 27 -> AA"""
+    letters = ''
+    while n > 0:
+        n, rest = divmod(n - 1, 26)
+        letters = chr(ord('A') + rest) + letters
+    return letters
+
+
+class BalloonNumbering:
+    """
+    Motor de numeración de globos.
+    
+    Los globos principales se numeran en orden (página, posición en la página);
+    los intercalados toman el número del principal anterior con sufijo (12A, 12B).
+    El árbol de Fenwick guarda cuántos principales hay en cada página, así el
+    desplazamiento de una página se obtiene en O(log n) al borrar o insertar.
+    """
+    
+    def __init__(self, total_pages=0, policy=NUMBERING_DOCUMENT):
+        self.policy = policy
+        self.counts = [0] * total_pages  # Globos principales por página
+        self.tree = FenwickTree(total_pages)
+    
+    def rebuild(self, balloons_by_page, total_pages):
+        """Reconstruir los conteos a partir de los globos guardados por página"""
+        self.counts = [0] * total_pages
+        self.tree = FenwickTree(total_pages)
+        for page_num, page_data in balloons_by_page.items():
+            if page_num < total_pages:
+                self.set_page_count(page_num, sum(
+                    1 for balloon in page_data['balloons'] if not balloon.get('sub')
+                ))
+    
+    def set_page_count(self, page_num, count):
+        """Actualizar el número de globos principales de una página"""
+        delta = count - self.counts[page_num]
+        if delta:
+            self.counts[page_num] = count
+            self.tree.add(page_num, delta)
+    
+    def offset(self, page_num):
+        """Último número usado antes de la página según la política"""
+        if self.policy == NUMBERING_PAGE:
+            return 0
+        return self.tree.prefix(page_num)
+    
+    def labels(self, page_num, sub_flags):
+        """Etiquetas de los globos de una página dada la lista de marcas de intercalado"""
+        number = self.offset(page_num)
+        subs = 0
+        labels = []
+        for sub in sub_flags:
+            if sub:
+                subs += 1
+                labels.append(f'{number}{suffix_letters(subs)}')
+            else:
+                number += 1
+                subs = 0
+                labels.append(str(number))
+        return labels
+
+
+# === FILAS DE LA TABLA ===
+
+# Instrumentos de medición de la columna Instrumento
+INSTRUMENTS = ('Vernier', 'Micrómetro', 'Calibrador', 'Probador', 'CMM', 'Comparador', 'Otro')
+
+
+def new_dimension_row(nombre, nominal='0.0', tol_pos='0.0', tol_neg='0.0', unidad='mm', notas=''):
+    """Fila de tabla con los valores por defecto"""
+    return {
+        'nombre': nombre,
+        'nominal': nominal,
+        'tol_pos': tol_pos,
+        'tol_neg': tol_neg,
+        'instrumento': INSTRUMENTS[0],
+        'unidad': unidad,
+        'notas': notas
+    }
+
+
+def snapshot_balloons(balloons_by_page):
+    """Copia de globos y filas: la exportación no ve las ediciones que siguen en la interfaz"""
+    return {
+        page_num: {
+            'balloons': [dict(balloon) for balloon in page_data['balloons']],
+            'table': [dict(row) for row in page_data['table']],
+        }
+        for page_num, page_data in balloons_by_page.items()
+    }
+
+
+def collect_dimensions(rows):
+    """Filas de una hoja con los valores numéricos ya parseados"""
+    return [
+        {
+            'nombre': row['nombre'] or f'D{i+1}',
+            # Valores aceptando fracciones o decimales (exactos tras convertir unidades)
+            'nominal': row_value(row, 'nominal'),
+            'tol_pos': row_value(row, 'tol_pos'),
+            'tol_neg': row_value(row, 'tol_neg'),
+            'instrumento': row['instrumento'],
+            'unidad': row['unidad'],
+            'notas': row.get('notas', '')
+        }
+        for i, row in enumerate(rows)
+    ]
+
+
+def dimensions_json(rows, created=None):
+    """JSON de dimensiones (formato de exportación, versión 1) de las filas de una hoja"""
+    data = {
+        'dimensiones': collect_dimensions(rows),
+        'version': 1,
+        'fecha_creacion': (created or datetime.now()).strftime('%Y-%m-%d %H:%M:%S')
+    }
+    return json.dumps(data, indent=2, ensure_ascii=False)
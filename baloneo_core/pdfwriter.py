@@ -0,0 +1,374 @@
+# -*- coding: utf-8 -*-
+"""
+Escritura de globos en el PDF: dibujo, glifos compartidos, anotaciones y perfiles
+"""
+
+import json
+import logging
+import os
+
+from .lazy import fitz
+from .model import new_dimension_row
+from .transforms import BALLOON_SIZE
+
+
+logger = logging.getLogger(__name__)
+
+
+# === GLOBOS COMO ANOTACIONES PDF ===
+
+# Asunto (/Subj) con el que se marcan las anotaciones propias
+BALLOON_ANNOT_SUBJECT = 'baloneo:globo'
+BALLOON_LABEL_SUBJECT = 'baloneo:etiqueta'
+BALLOON_COLOR = (0, 0.47, 0.84)
+
+
+def write_balloon_annotations(page, balloons, rows):
+    """
+    Escribir los globos de una página como anotaciones editables: un círculo
+    con los datos de la cota en JSON (/Contents) y un FreeText con el número.
+    Los globos están en coordenadas PDF de la página sin rotar.
+    """
+    rotation = page.rotation
+    
+    for i, balloon in enumerate(balloons):
+        pdf_x, pdf_y = balloon['x'], balloon['y']
+        radius = balloon['size'] / 2.0
+        label = str(balloon['number'])
+        data = {
+            'orden': i,
+            'numero': label,
+            'intercalado': bool(balloon.get('sub')),
+            'tamano': balloon['size'],
+            'fila': rows[i] if i < len(rows) else None,
+        }
+        
+        circle = page.add_circle_annot(
+            fitz.Rect(pdf_x - radius, pdf_y - radius, pdf_x + radius, pdf_y + radius)
+        )
+        circle.set_colors(stroke=BALLOON_COLOR, fill=BALLOON_COLOR)
+        circle.set_border(width=2.5)
+        circle.set_opacity(0.6)
+        circle.set_info(title='Baloneo', subject=BALLOON_ANNOT_SUBJECT,
+                        content=json.dumps(data, ensure_ascii=False))
+        circle.update()
+        
+        # Número centrado, con el texto derecho en la página rotada
+        fontsize = min(radius * 1.2, radius * 1.7 / fitz.get_text_length(label or '0', fontname='helv', fontsize=1))
+        half_width, half_height = radius, fontsize * 0.65
+        if rotation in (90, 270):
+            half_width, half_height = half_height, half_width
+        label_annot = page.add_freetext_annot(
+            fitz.Rect(pdf_x - half_width, pdf_y - half_height, pdf_x + half_width, pdf_y + half_height),
+            label, fontsize=fontsize, fontname='helv', text_color=(1, 1, 1),
+            rotate=rotation, align=fitz.TEXT_ALIGN_CENTER
+        )
+        label_annot.set_info(title='Baloneo', subject=BALLOON_LABEL_SUBJECT)
+        label_annot.update()
+
+
+def read_balloon_annotations(doc, strip=False):
+    """
+    Reconstruir los globos y la tabla de un PDF exportado con anotaciones,
+    con una sola pasada por page.annots() (sin interpretar el contenido de la página).
+    Con strip=True las anotaciones propias se eliminan del documento abierto
+    para que la vista no las dibuje dos veces. Retorna balloons_by_page.
+    """
+    balloons_by_page = {}
+    annot_types = (fitz.PDF_ANNOT_CIRCLE, fitz.PDF_ANNOT_FREE_TEXT)
+    
+    for page in doc:
+        if page.first_annot is None:
+            continue
+        
+        entries = []
+        own_xrefs = []
+        for annot in page.annots(types=annot_types):
+            info = annot.info
+            subject = info.get('subject')
+            if subject == BALLOON_LABEL_SUBJECT:
+                own_xrefs.append(annot.xref)
+                continue
+            if subject != BALLOON_ANNOT_SUBJECT:
+                continue
+            own_xrefs.append(annot.xref)
+            try:
+                data = json.loads(info.get('content') or '{}')
+            except ValueError:
+                continue
+            
+            center = annot.rect.tl + (annot.rect.br - annot.rect.tl) * 0.5
+            entries.append((data.get('orden', len(entries)), {
+                'x': center.x,
+                'y': center.y,
+                'number': data.get('numero', str(len(entries) + 1)),
+                'size': data.get('tamano', BALLOON_SIZE),
+                'sub': data.get('intercalado', False),
+                'rotation': page.rotation
+            }, data.get('fila')))
+        
+        if strip:
+            for xref in own_xrefs:
+                page.delete_annot(page.load_annot(xref))
+        
+        if not entries:
+            continue
+        entries.sort(key=lambda entry: entry[0])
+        balloons = [balloon for _, balloon, _ in entries]
+        table = [row or new_dimension_row(f'D{balloon["number"]}') for _, balloon, row in entries]
+        balloons_by_page[page.number] = {'balloons': balloons, 'table': table, 'counter': len(balloons)}
+    
+    return balloons_by_page
+
+
+# === PERFILES DE EXPORTACIÓN PDF ===
+
+# Opciones de guardado por perfil y si el globo se dibuja como Form XObject compartido
+EXPORT_PROFILES = {
+    'rapido': {
+        'titulo': 'Rápido',
+        'glifo_compartido': True,
+        'guardado': {'garbage': 0, 'deflate': False, 'clean': False},
+    },
+    'minimo': {
+        'titulo': 'Mínimo tamaño',
+        'glifo_compartido': True,
+        'guardado': {'garbage': 4, 'deflate': True, 'deflate_images': True,
+                     'deflate_fonts': True, 'clean': True},
+    },
+}
+DEFAULT_EXPORT_PROFILE = 'rapido'
+# Constante para aproximar un círculo con cuatro curvas de Bézier
+BEZIER_CIRCLE_K = 0.5523
+
+
+def balloon_glyph_xref(doc, radius, glyphs):
+    """
+    Form XObject con el círculo del globo (sin número), creado una vez por
+    documento y radio. glyphs es el diccionario {radio: (nombre, xref)} del documento.
+    """
+    key = round(radius, 2)
+    if key in glyphs:
+        return glyphs[key]
+    
+    r = key
+    k = r * BEZIER_CIRCLE_K
+    path = (
+        f'{r} 0 m {r} {k} {k} {r} 0 {r} c {-k} {r} {-r} {k} {-r} 0 c '
+        f'{-r} {-k} {-k} {-r} 0 {-r} c {k} {-r} {r} {-k} {r} 0 c'
+    )
+    red, green, blue = BALLOON_COLOR
+    stream = (
+        f'/BlnGs gs {red} {green} {blue} RG {red} {green} {blue} rg 2.5 w {path} b'
+    ).encode('ascii')
+    margin = r + 2
+    xref = doc.get_new_xref()
+    doc.update_object(xref, (
+        f'<< /Type /XObject /Subtype /Form /BBox [{-margin} {-margin} {margin} {margin}] '
+        '/Resources << /ExtGState << /BlnGs << /Type /ExtGState /ca 0.4 /CA 1 >> >> >> >>'
+    ))
+    doc.update_stream(xref, stream)
+    glyphs[key] = (f'BlnG{len(glyphs)}', xref)
+    return glyphs[key]
+
+
+def glyph_resources_target(page):
+    """
+    Dónde escribir los nombres de los glifos: (xref, prefijo de clave) del
+    diccionario /XObject de la página, siguiendo /Resources y /XObject
+    cuando son objetos indirectos. None si la página hereda sus recursos.
+    """
+    doc = page.parent
+    kind, value = doc.xref_get_key(page.xref, 'Resources')
+    if kind == 'xref':
+        resources_xref, path = int(value.split()[0]), ''
+    elif kind == 'dict':
+        resources_xref, path = page.xref, 'Resources/'
+    else:
+        return None
+    
+    kind, value = doc.xref_get_key(resources_xref, path + 'XObject')
+    if kind == 'xref':
+        return int(value.split()[0]), ''
+    if kind in ('dict', 'null'):
+        return resources_xref, path + 'XObject/'
+    return None
+
+
+def page_accepts_glyphs(page):
+    """El glifo compartido necesita que la página tenga su propio diccionario /Resources"""
+    return glyph_resources_target(page) is not None
+
+
+def place_balloon_glyphs(page, placements, glyphs):
+    """
+    Referenciar el glifo compartido en cada posición: una sola secuencia
+    'q ... cm /BlnG Do Q' por globo en un único stream de contenido nuevo.
+    placements es una lista de (x, y, radio) en coordenadas de página sin rotar.
+    """
+    doc = page.parent
+    xobject_xref, prefix = glyph_resources_target(page)
+    
+    if not page.is_wrapped:
+        page.wrap_contents()
+    
+    # Coordenadas de MuPDF (las de los globos) -> espacio del PDF, igual que Shape
+    matrix = ~page.transformation_matrix
+    ops = []
+    for x, y, radius in placements:
+        name, xref = balloon_glyph_xref(doc, radius, glyphs)
+        doc.xref_set_key(xobject_xref, prefix + name, f'{xref} 0 R')
+        point = fitz.Point(x, y) * matrix
+        ops.append(f'q 1 0 0 1 {point.x:.2f} {point.y:.2f} cm /{name} Do Q\n')
+    
+    contents_xref = doc.get_new_xref()
+    doc.update_object(contents_xref, '<< >>')
+    doc.update_stream(contents_xref, ''.join(ops).encode('ascii'))
+    contents = page.get_contents() + [contents_xref]
+    doc.xref_set_key(page.xref, 'Contents', '[' + ' '.join(f'{xref} 0 R' for xref in contents) + ']')
+
+
+# === EXPORTACIÓN EN SEGUNDO PLANO ===
+
+class ExportCancelled(Exception):
+    """La exportación se canceló antes de terminar"""
+
+
+def write_file_atomic(file_path, data):
+    """Escribir en un temporal junto al destino y renombrar: no quedan archivos a medias"""
+    temp_path = f'{file_path}.part'
+    if isinstance(data, bytes):
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+    else:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+    os.replace(temp_path, file_path)
+
+
+def draw_balloons_on_page(page, balloons, glyphs=None):
+    """
+    Dibujar globos en una página específica del PDF.
+    Con glyphs (diccionario de glifos del documento) el círculo se referencia
+    como Form XObject compartido; los números van en una sola Shape.
+    """
+    # Obtener rotación de la página (solo afecta a la orientación del texto)
+    rotation = page.rotation
+    
+    logger.debug('Página %d - tamaño %sx%s, rotación %d°, %d globos',
+                 page.number + 1, page.rect.width, page.rect.height, rotation, len(balloons))
+    
+    # Todo el contenido de la página en una sola Shape (un solo stream)
+    shape = page.new_shape()
+    use_glyphs = glyphs is not None and page_accepts_glyphs(page)
+    glyph_placements = []
+    
+    # Dibujar cada globo en el PDF
+    for i, balloon in enumerate(balloons):
+        # Los globos se guardan en coordenadas PDF de la página sin rotar,
+        # las mismas que usan los dibujos de PyMuPDF: no hace falta transformar
+        pdf_x = balloon['x']
+        pdf_y = balloon['y']
+        number = balloon['number']
+        pdf_radius = balloon['size'] / 2.0
+        
+        # Dibujar círculo con relleno (o referenciar el glifo compartido)
+        if use_glyphs:
+            glyph_placements.append((pdf_x, pdf_y, pdf_radius))
+        else:
+            shape.draw_circle((pdf_x, pdf_y), pdf_radius)
+            shape.finish(
+                color=(0, 0.47, 0.84),  # Azul
+                width=2.5,  # Línea gruesa
+                fill=(0, 0.47, 0.84),  # Relleno azul
+                fill_opacity=0.4
+            )
+        
+        # Calcular el tamaño de fuente
+        fontsize = pdf_radius * 1.2
+        
+        # Insertar texto centrado en el globo - ROTANDO JUNTO CON LA PÁGINA
+        text = str(number)
+        
+        # Calcular el tamaño aproximado del texto
+        text_width = fitz.get_text_length(text, fontname="helv", fontsize=fontsize)
+        text_height = fontsize
+        
+        # Usar el centro del globo como punto de anclaje para la rotación
+        # y ajustar desde ahí según la rotación
+        if rotation == 0:
+            # Sin rotación - centrado normal
+            text_x = pdf_x - (text_width / 2)
+            text_y = pdf_y + (text_height / 3)
+        elif rotation == 90:
+            # Rotado 90° horario
+            text_x = pdf_x + (text_height / 3)
+            text_y = pdf_y + (text_width / 2)
+        elif rotation == 180:
+            # Rotado 180°
+            text_x = pdf_x + (text_width / 2)
+            text_y = pdf_y - (text_height / 3)
+        elif rotation == 270:
+            # Rotado 270° horario (90° antihorario)
+            text_x = pdf_x - (text_height / 3)
+            text_y = pdf_y - (text_width / 2)
+        else:
+            text_x = pdf_x - (text_width / 2)
+            text_y = pdf_y + (text_height / 3)
+        
+        # Aplicar la MISMA rotación que la página para que el texto rote junto con ella
+        try:
+            shape.insert_text(
+                (text_x, text_y),
+                text,
+                fontsize=fontsize,
+                color=(1, 1, 1),  # Blanco
+                fontname="helv",
+                rotate=rotation  # MISMA rotación que la página
+            )
+            
+        except Exception as e:
+            logger.warning('Error insertando texto en globo %s: %s', number, e, exc_info=True)
+    
+    # Los círculos primero, los números encima
+    if glyph_placements:
+        place_balloon_glyphs(page, glyph_placements, glyphs)
+    shape.commit(overlay=True)
+
+
+def build_balloon_pdf(pdf_bytes, balloons_by_page, profile_key, annotations=False,
+                      progress=None, cancelled=None):
+    """
+    Generar el PDF con globos a partir de una instantánea (bytes del PDF y globos).
+    progress(hechas, total) se llama por hoja (el guardado final cuenta como una);
+    si cancelled() es verdadero entre hojas se lanza ExportCancelled.
+    """
+    profile = EXPORT_PROFILES[profile_key]
+    doc = fitz.open('pdf', pdf_bytes)
+    try:
+        glyphs = {} if profile['glifo_compartido'] else None
+        pages = [
+            (page_num, page_data) for page_num, page_data in sorted(balloons_by_page.items())
+            if page_num < len(doc) and page_data['balloons']
+        ]
+        total = len(pages) + 1
+        
+        for done, (page_num, page_data) in enumerate(pages, 1):
+            if cancelled and cancelled():
+                raise ExportCancelled()
+            page = doc[page_num]
+            if annotations:
+                write_balloon_annotations(page, page_data['balloons'], page_data['table'])
+            else:
+                draw_balloons_on_page(page, page_data['balloons'], glyphs)
+            if progress:
+                progress(done, total)
+        
+        if cancelled and cancelled():
+            raise ExportCancelled()
+        pdf_bytes = doc.tobytes(**profile['guardado'])
+        if progress:
+            progress(total, total)
+        return pdf_bytes
+    finally:
+        doc.close()
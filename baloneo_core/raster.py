@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+Rasterizado de páginas en los procesos de trabajo: miniaturas y exportación PNG/TIFF
+"""
+
+import os
+import struct
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+
+from .lazy import fitz
+from .pdfwriter import ExportCancelled
+from .workers import SHARED_POOL_WORKERS, shared_render_pool, worker_document
+
+
+# Ancho de las miniaturas en píxeles
+THUMBNAIL_WIDTH = 140
+# Resolución por defecto y límites de la exportación raster
+IMAGE_EXPORT_DPI = 300
+IMAGE_EXPORT_MIN_DPI = 72
+IMAGE_EXPORT_MAX_DPI = 1200
+# Nivel de compresión deflate de las hojas TIFF (se comprime en los procesos de trabajo)
+TIFF_DEFLATE_LEVEL = 6
+
+TIFF_SHORT = 3
+TIFF_LONG = 4
+TIFF_RATIONAL = 5
+
+
+def render_thumbnail_png(pdf_path, page_num, width=THUMBNAIL_WIDTH):
+    """
+    Tarea de un proceso de trabajo: renderizar la miniatura de una página como PNG.
+    Sin anotaciones: los globos exportados como anotaciones ya se dibujan en la escena.
+    """
+    page = worker_document(pdf_path)[page_num]
+    zoom = width / page.rect.width
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), annots=False)
+    return page_num, pix.tobytes('png')
+
+
+def render_page_raster(pdf_path, page_num, dpi, fmt):
+    """
+    Rasterizar una página en un proceso de trabajo.
+    PNG: retorna los bytes del archivo. TIFF: retorna (ancho, alto, muestras RGB comprimidas).
+    """
+    # PDF temporal de una sola exportación: se abre y se cierra aquí, sin
+    # quedar abierto en el proceso (en Windows impediría borrarlo)
+    with fitz.open(pdf_path) as doc:
+        pix = doc[page_num].get_pixmap(dpi=dpi, alpha=False)
+    if fmt == 'png':
+        return pix.tobytes('png')
+    return pix.width, pix.height, zlib.compress(pix.samples, TIFF_DEFLATE_LEVEL)
+
+
+def iter_rendered_pages(pdf_path, page_count, dpi, fmt, pool, in_flight):
+    """
+    Repartir las páginas en el pool y entregarlas en orden.
+    Nunca hay más de in_flight páginas pendientes, así la memoria queda
+    acotada a una página por proceso aunque el disco sea lento.
+    """
+    pending = OrderedDict()
+    next_page = 0
+    try:
+        while pending or next_page < page_count:
+            while next_page < page_count and len(pending) < in_flight:
+                pending[next_page] = pool.submit(render_page_raster, pdf_path, next_page, dpi, fmt)
+                next_page += 1
+            page_num, future = pending.popitem(last=False)
+            yield page_num, future.result()
+    finally:
+        for future in pending.values():
+            future.cancel()
+
+
+class TiffWriter:
+    """Escritor de TIFF multipágina RGB con compresión deflate, hoja a hoja"""
+    
+    def __init__(self, file_path, dpi):
+        self.file = open(file_path, 'wb')
+        self.dpi = dpi
+        self.file.write(b'II*\x00\x00\x00\x00\x00')
+        self.next_ifd_pointer = 4  # Dónde escribir el offset del próximo IFD
+    
+    def _align(self):
+        if self.file.tell() % 2:
+            self.file.write(b'\x00')
+    
+    def add_page(self, width, height, compressed):
+        """Agregar una hoja ya comprimida con deflate (muestras RGB de 8 bits)"""
+        f = self.file
+        self._align()
+        strip_offset = f.tell()
+        f.write(compressed)
+        
+        # Valores que no caben en la entrada del IFD
+        self._align()
+        bits_offset = f.tell()
+        f.write(struct.pack('<3H', 8, 8, 8))
+        resolution_offset = f.tell()
+        f.write(struct.pack('<2I', self.dpi, 1))
+        
+        entries = [
+            (256, TIFF_LONG, 1, width),
+            (257, TIFF_LONG, 1, height),
+            (258, TIFF_SHORT, 3, bits_offset),
+            (259, TIFF_SHORT, 1, 8),  # Adobe Deflate
+            (262, TIFF_SHORT, 1, 2),  # RGB
+            (273, TIFF_LONG, 1, strip_offset),
+            (277, TIFF_SHORT, 1, 3),
+            (278, TIFF_LONG, 1, height),
+            (279, TIFF_LONG, 1, len(compressed)),
+            (282, TIFF_RATIONAL, 1, resolution_offset),
+            (283, TIFF_RATIONAL, 1, resolution_offset),
+            (296, TIFF_SHORT, 1, 2),  # Pulgadas
+        ]
+        
+        self._align()
+        ifd_offset = f.tell()
+        f.write(struct.pack('<H', len(entries)))
+        for tag, field_type, count, value in entries:
+            if field_type == TIFF_SHORT and count == 1:
+                f.write(struct.pack('<HHIHH', tag, field_type, count, value, 0))
+            else:
+                f.write(struct.pack('<HHII', tag, field_type, count, value))
+        f.write(struct.pack('<I', 0))
+        end = f.tell()
+        
+        # Enlazar esta hoja desde la anterior
+        f.seek(self.next_ifd_pointer)
+        f.write(struct.pack('<I', ifd_offset))
+        f.seek(end)
+        self.next_ifd_pointer = end - 4
+    
+    def close(self):
+        self.file.close()
+
+
+def export_pdf_as_images(pdf_path, file_path, dpi, progress=None, cancelled=None):
+    """
+    Exportar todas las hojas de un PDF (ya con globos) como PNG o TIFF multipágina.
+    PNG genera un archivo por hoja (<nombre>_p001.png...). Retorna la lista de archivos.
+    Si cancelled() es verdadero entre hojas se lanza ExportCancelled y no queda ningún archivo.
+    """
+    fmt = 'png' if Path(file_path).suffix.lower() == '.png' else 'tiff'
+    with fitz.open(pdf_path) as doc:
+        page_count = len(doc)
+    
+    pool = shared_render_pool()
+    pages = iter_rendered_pages(pdf_path, page_count, dpi, fmt, pool, SHARED_POOL_WORKERS)
+    written = []
+    
+    if fmt == 'png':
+        # Cada hoja va a un .part: solo se renombran cuando están todas escritas
+        base = Path(file_path)
+        try:
+            for page_num, png in pages:
+                if cancelled and cancelled():
+                    raise ExportCancelled()
+                page_path = str(base.with_name(f'{base.stem}_p{page_num + 1:03d}.png'))
+                with open(f'{page_path}.part', 'wb') as f:
+                    written.append(page_path)
+                    f.write(png)
+                if progress:
+                    progress(page_num + 1, page_count)
+        except BaseException:
+            for page_path in written:
+                try:
+                    os.unlink(f'{page_path}.part')
+                except OSError:
+                    pass
+            raise
+        for page_path in written:
+            os.replace(f'{page_path}.part', page_path)
+    else:
+        temp_path = f'{file_path}.part'
+        writer = TiffWriter(temp_path, dpi)
+        try:
+            for page_num, (width, height, compressed) in pages:
+                if cancelled and cancelled():
+                    raise ExportCancelled()
+                writer.add_page(width, height, compressed)
+                if progress:
+                    progress(page_num + 1, page_count)
+        except BaseException:
+            writer.close()
+            os.unlink(temp_path)
+            raise
+        writer.close()
+        os.replace(temp_path, file_path)
+        written.append(file_path)
+    
+    return written
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+Reporte de inspección en CSV, XLSX y PDF, escrito por bloques
+
+Los escritores aceptan progress(filas escritas) y cancelled() como build_balloon_pdf.
+"""
+
+import csv
+import re
+import zipfile
+from html import escape
+
+from .lazy import fitz
+from .pdfwriter import ExportCancelled
+
+
+# Columnas del reporte (clave en la fila de tabla, encabezado, ancho relativo en el PDF)
+REPORT_COLUMNS = (
+    ('pagina', 'Hoja', 0.6),
+    ('globo', 'Globo', 0.7),
+    ('nombre', 'Característica', 1.4),
+    ('nominal', 'Nominal', 1.0),
+    ('tol_pos', 'Tol +', 0.8),
+    ('tol_neg', 'Tol -', 0.8),
+    ('instrumento', 'Instrumento', 1.2),
+    ('unidad', 'Unidad', 0.6),
+    ('notas', 'Notas', 2.4),
+)
+# Filas que se acumulan antes de escribir al archivo
+REPORT_CHUNK_ROWS = 1000
+# Formato de la tabla en PDF (A4 horizontal)
+REPORT_PAGE_SIZE = (842, 595)
+REPORT_MARGIN = 36
+REPORT_FONT_SIZE = 8
+REPORT_LINE_HEIGHT = 1.6
+
+NUMBER_CELL_RE = re.compile(r'^-?\d+(?:\.\d+)?$')
+INVALID_XML_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def iter_report_rows(balloons_by_page):
+    """
+    Recorrer todas las características del documento en orden de hoja y globo.
+    Genera tuplas con los valores de REPORT_COLUMNS sin construir listas intermedias.
+    """
+    for page_num in sorted(balloons_by_page):
+        page_data = balloons_by_page[page_num]
+        balloons = page_data['balloons']
+        for i, row in enumerate(page_data['table']):
+            number = balloons[i]['number'] if i < len(balloons) else ''
+            yield (
+                str(page_num + 1), str(number), row['nombre'], row['nominal'],
+                row['tol_pos'], row['tol_neg'], row['instrumento'], row['unidad'],
+                row.get('notas', '')
+            )
+
+
+def _chunks(rows, size=REPORT_CHUNK_ROWS, progress=None, cancelled=None):
+    """
+    Agrupar un iterador de filas en bloques de tamaño fijo.
+    Antes de cada bloque se informa progress(filas entregadas) y, si cancelled()
+    es verdadero, se lanza ExportCancelled.
+    """
+    chunk = []
+    done = 0
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            if cancelled and cancelled():
+                raise ExportCancelled()
+            yield chunk
+            done += size
+            if progress:
+                progress(done)
+            chunk = []
+    if chunk:
+        if cancelled and cancelled():
+            raise ExportCancelled()
+        yield chunk
+        if progress:
+            progress(done + len(chunk))
+
+
+def write_report_csv(file_path, rows, progress=None, cancelled=None):
+    """Escribir el reporte en CSV fila a fila. Retorna el número de filas"""
+    count = 0
+    with open(file_path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow([header for _, header, _ in REPORT_COLUMNS])
+        for chunk in _chunks(rows, progress=progress, cancelled=cancelled):
+            writer.writerows(chunk)
+            count += len(chunk)
+    return count
+
+
+def _xlsx_cell(value):
+    """Celda de hoja de cálculo: número si el texto es numérico, texto en línea si no"""
+    if NUMBER_CELL_RE.match(value):
+        return f'<c><v>{value}</v></c>'
+    text = escape(INVALID_XML_RE.sub('', value), quote=False)
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+XLSX_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="Inspección" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+XLSX_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+    '</styleSheet>'
+)
+
+
+def write_report_xlsx(file_path, rows, progress=None, cancelled=None):
+    """
+    Escribir el reporte como libro XLSX mínimo (sin dependencias externas).
+    La hoja se comprime mientras se escribe, bloque a bloque. Retorna el número de filas
+    """
+    count = 0
+    with zipfile.ZipFile(file_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('[Content_Types].xml', XLSX_CONTENT_TYPES)
+        zf.writestr('_rels/.rels', XLSX_ROOT_RELS)
+        zf.writestr('xl/workbook.xml', XLSX_WORKBOOK)
+        zf.writestr('xl/_rels/workbook.xml.rels', XLSX_WORKBOOK_RELS)
+        zf.writestr('xl/styles.xml', XLSX_STYLES)
+        
+        with zf.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            header = ''.join(
+                f'<c t="inlineStr" s="1"><is><t>{escape(title, quote=False)}</t></is></c>'
+                for _, title, _ in REPORT_COLUMNS
+            )
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                '<sheetViews><sheetView workbookViewId="0">'
+                '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+                '</sheetView></sheetViews>'
+                f'<sheetData><row r="1">{header}</row>'
+            ).encode('utf-8'))
+            
+            for chunk in _chunks(rows, progress=progress, cancelled=cancelled):
+                parts = []
+                for row in chunk:
+                    count += 1
+                    parts.append(f'<row r="{count + 1}">')
+                    parts.extend(_xlsx_cell(value) for value in row)
+                    parts.append('</row>')
+                sheet.write(''.join(parts).encode('utf-8'))
+            
+            sheet.write(b'</sheetData></worksheet>')
+    return count
+
+
+def write_report_pdf(file_path, rows, title='', progress=None, cancelled=None):
+    """
+    Escribir el reporte como tabla paginada en PDF.
+    Cada hoja se dibuja con una sola Shape y cada columna con una sola llamada
+    de texto multilínea. A diferencia de CSV y XLSX, el documento completo queda
+    en memoria hasta guardarlo: MuPDF no escribe un PDF nuevo por partes.
+    Retorna el número de filas
+    """
+    page_width, page_height = REPORT_PAGE_SIZE
+    row_height = REPORT_FONT_SIZE * REPORT_LINE_HEIGHT
+    table_top = REPORT_MARGIN + 28
+    rows_per_page = int((page_height - table_top - REPORT_MARGIN - row_height) // row_height)
+    
+    # Posición y ancho (en caracteres aproximados) de cada columna
+    usable = page_width - 2 * REPORT_MARGIN
+    total_weight = sum(weight for _, _, weight in REPORT_COLUMNS)
+    columns = []
+    x = REPORT_MARGIN
+    for _, header, weight in REPORT_COLUMNS:
+        width = usable * weight / total_weight
+        columns.append((x + 3, header, max(int(width / (REPORT_FONT_SIZE * 0.5)), 3)))
+        x += width
+    
+    doc = fitz.open()
+    count = 0
+    for chunk in _chunks(rows, rows_per_page, progress, cancelled):
+        page = doc.new_page(width=page_width, height=page_height)
+        
+        # Encabezado y rayado de filas
+        shape = page.new_shape()
+        shape.draw_rect(fitz.Rect(REPORT_MARGIN, table_top, page_width - REPORT_MARGIN,
+                                  table_top + row_height))
+        shape.finish(color=None, fill=(0.85, 0.89, 0.95))
+        for i in range(2, len(chunk) + 1, 2):
+            y = table_top + i * row_height
+            shape.draw_rect(fitz.Rect(REPORT_MARGIN, y, page_width - REPORT_MARGIN, y + row_height))
+        shape.finish(color=None, fill=(0.95, 0.95, 0.95))
+        
+        shape.insert_text((REPORT_MARGIN, REPORT_MARGIN + 10), title or 'Reporte de inspección',
+                          fontsize=12, fontname='hebo')
+        shape.insert_text((page_width - REPORT_MARGIN - 40, page_height - REPORT_MARGIN / 2),
+                          f'Hoja {page.number + 1}', fontsize=REPORT_FONT_SIZE)
+        baseline = table_top + row_height * 0.7
+        for column, (x, header, max_chars) in enumerate(columns):
+            shape.insert_text((x, baseline), header, fontsize=REPORT_FONT_SIZE, fontname='hebo')
+            lines = [
+                value if len(value) <= max_chars else value[:max_chars - 1] + '…'
+                for value in (row[column] for row in chunk)
+            ]
+            shape.insert_text((x, baseline + row_height), lines, fontsize=REPORT_FONT_SIZE,
+                              lineheight=REPORT_LINE_HEIGHT)
+        shape.commit()
+        count += len(chunk)
+    
+    if not count:
+        doc.new_page(width=page_width, height=page_height)
+    
+    doc.save(file_path, garbage=1, deflate=True)
+    doc.close()
+    return count
+
+
+REPORT_WRITERS = {
+    '.csv': write_report_csv,
+    '.xlsx': write_report_xlsx,
+    '.pdf': write_report_pdf,
+}
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+Preprocesado de planos escaneados: enderezado, contraste automático y binarizado
+
+Todo se hace en un proceso de trabajo sobre el búfer pix.samples en escala de
+grises: el histograma y el binarizado usan Counter y bytes.translate, y el giro
+lo hace MuPDF al renderizar la página. Solo la estimación de la inclinación
+recorre puntos en Python, como mucho unos SCAN_MAX_SAMPLES del render de baja
+resolución.
+"""
+
+import math
+import struct
+from collections import Counter
+
+from .cache import RAW_HEADER, RAW_MAGIC
+from .lazy import fitz
+from .workers import worker_document
+
+
+# Ancho (px) del render de baja resolución usado para estimar la inclinación
+SCAN_ESTIMATE_WIDTH = 1000
+# Inclinación máxima que se corrige (grados) y pasos de la búsqueda
+SCAN_MAX_SKEW = 5.0
+SCAN_COARSE_STEP = 0.5
+SCAN_FINE_STEP = 0.05
+# Por debajo de esta inclinación no se gira la página
+SCAN_MIN_SKEW = 0.05
+# Píxeles oscuros que se usan en el perfil de proyección
+SCAN_MAX_SAMPLES = 20000
+# Fracción de píxeles que el contraste automático recorta en cada extremo
+SCAN_CONTRAST_CLIP = 0.01
+# Variante de la caché en disco para los renders preprocesados
+SCAN_CACHE_VARIANT = 'scan'
+# Los blobs preprocesados llevan al final el ángulo de enderezado
+SCAN_TRAILER = struct.Struct('<4sd')
+SCAN_MAGIC = b'SKW1'
+
+
+def gray_histogram(samples):
+    """Histograma de 256 niveles de un búfer en escala de grises"""
+    counts = Counter(samples)
+    return [counts.get(level, 0) for level in range(256)]
+
+
+def contrast_range(histogram, clip=SCAN_CONTRAST_CLIP):
+    """Niveles (bajo, alto) que dejan fuera la fracción clip de píxeles en cada extremo"""
+    total = sum(histogram)
+    limit = total * clip
+    low, seen = 0, 0
+    for level, count in enumerate(histogram):
+        seen += count
+        if seen > limit:
+            low = level
+            break
+    high, seen = 255, 0
+    for level in range(255, -1, -1):
+        seen += histogram[level]
+        if seen > limit:
+            high = level
+            break
+    if high <= low:
+        return 0, 255
+    return low, high
+
+
+def otsu_threshold(histogram):
+    """Umbral de Otsu: maximiza la varianza entre las clases fondo y trazo"""
+    total = sum(histogram)
+    weighted_total = sum(level * count for level, count in enumerate(histogram))
+    best_level, best_variance = 127, -1.0
+    background = weighted_background = 0
+    for level, count in enumerate(histogram):
+        background += count
+        if background == 0:
+            continue
+        foreground = total - background
+        if foreground == 0:
+            break
+        weighted_background += level * count
+        mean_background = weighted_background / background
+        mean_foreground = (weighted_total - weighted_background) / foreground
+        variance = background * foreground * (mean_background - mean_foreground) ** 2
+        if variance > best_variance:
+            best_level, best_variance = level, variance
+    return best_level
+
+
+def contrast_lut(low, high, threshold=None):
+    """
+    Tabla de 256 bytes para bytes.translate: estira [low, high] a [0, 255] o,
+    con threshold, binariza a negro/blanco (el estirado no mueve el umbral de Otsu).
+    """
+    if threshold is not None:
+        return bytes(0 if level <= threshold else 255 for level in range(256))
+    span = max(high - low, 1)
+    return bytes(min(255, max(0, round((level - low) * 255 / span))) for level in range(256))
+
+
+def estimate_skew(samples, width, threshold):
+    """
+    Inclinación (grados) de las líneas del plano con perfiles de proyección:
+    se buscan los ángulos cuya proyección horizontal de los píxeles oscuros
+    es más concentrada (suma de cuadrados máxima). Retorna el ángulo de giro
+    que endereza la imagen (convención de fitz.Matrix, y hacia abajo).
+    """
+    mask = samples.translate(bytes(1 if level <= threshold else 0 for level in range(256)))
+    dark = mask.count(1)
+    if dark < 50:
+        return 0.0
+    # Muestreo con un corte de paso fijo (en C): quedan unos SCAN_MAX_SAMPLES píxeles oscuros
+    step = max(1, dark // SCAN_MAX_SAMPLES)
+    sampled = mask[::step]
+    points = []
+    index = sampled.find(1)
+    while index != -1:
+        points.append(divmod(index * step, width))
+        index = sampled.find(1, index + 1)
+    
+    def score(angle):
+        slope = math.tan(math.radians(angle))
+        return sum(count * count for count in Counter(round(y - x * slope) for y, x in points).values())
+    
+    def best_between(low, high, step):
+        steps = int(round((high - low) / step))
+        return max((low + i * step for i in range(steps + 1)), key=score)
+    
+    coarse = best_between(-SCAN_MAX_SKEW, SCAN_MAX_SKEW, SCAN_COARSE_STEP)
+    fine = best_between(coarse - SCAN_COARSE_STEP, coarse + SCAN_COARSE_STEP, SCAN_FINE_STEP)
+    # Las líneas bajan con pendiente tan(fine): se gira en sentido contrario
+    return -round(fine, 2) if abs(fine) >= SCAN_MIN_SKEW else 0.0
+
+
+def deskew_matrix(zoom, angle, width, height):
+    """Matriz de render: zoom y giro de angle grados alrededor del centro del lienzo"""
+    matrix = fitz.Matrix(zoom, zoom)
+    if angle:
+        cx, cy = width / 2, height / 2
+        matrix = matrix * fitz.Matrix(1, 0, 0, 1, -cx, -cy) * fitz.Matrix(angle) * fitz.Matrix(1, 0, 0, 1, cx, cy)
+    return matrix
+
+
+def preprocess_scanned_page(pdf_path, page_num, zoom, rotation, binarize=True):
+    """
+    Tarea de un proceso de trabajo: render de la página en escala de grises,
+    enderezado, contraste automático y binarizado. Sin anotaciones: el proceso
+    abre el archivo en disco, que puede traer los globos exportados como anotaciones.
+    Retorna el blob de la caché 'raw' (1 componente) con SCAN_TRAILER al final.
+    """
+    page = worker_document(pdf_path)[page_num]
+    # La rotación puede haberse cambiado en la interfaz sin guardar el PDF
+    original_rotation = page.rotation
+    if rotation != original_rotation:
+        page.set_rotation(rotation)
+    try:
+        # Render de baja resolución: histograma e inclinación
+        preview_zoom = min(zoom, SCAN_ESTIMATE_WIDTH / max(page.rect.width, 1))
+        preview = page.get_pixmap(matrix=fitz.Matrix(preview_zoom, preview_zoom), colorspace=fitz.csGRAY,
+                                  annots=False)
+        histogram = gray_histogram(preview.samples)
+        low, high = contrast_range(histogram)
+        threshold = otsu_threshold(histogram)
+        angle = estimate_skew(preview.samples, preview.width, threshold)
+        
+        # Render final en el mismo lienzo que el render normal, girado alrededor del centro
+        rect = page.rect * fitz.Matrix(zoom, zoom)
+        pix = fitz.Pixmap(fitz.csGRAY, rect.irect, False)
+        pix.clear_with(255)
+        device = fitz.Device(pix, None)
+        page.get_displaylist(annots=False).run(device, deskew_matrix(zoom, angle, rect.width, rect.height), rect)
+        del device
+    finally:
+        if rotation != original_rotation:
+            page.set_rotation(original_rotation)
+    
+    samples = pix.samples.translate(contrast_lut(low, high, threshold if binarize else None))
+    header = RAW_HEADER.pack(RAW_MAGIC, pix.width, pix.height, pix.stride, 1)
+    return header + samples + SCAN_TRAILER.pack(SCAN_MAGIC, angle)
+
+
+def scan_render_angle(data, stride, height):
+    """Ángulo de enderezado guardado al final de un blob preprocesado (None si no lo tiene)"""
+    offset = RAW_HEADER.size + stride * height
+    if len(data) < offset + SCAN_TRAILER.size:
+        return None
+    magic, angle = SCAN_TRAILER.unpack_from(data, offset)
+    return angle if magic == SCAN_MAGIC else None
+
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Búsqueda de características en todas las hojas (índice invertido)
+"""
+
+import bisect
+import functools
+import itertools
+import re
+import unicodedata
+from collections import defaultdict
+
+from .units import parse_fraction_or_decimal
+
+
+# Campos de texto indexados de cada fila
+SEARCH_FIELDS = ('nombre', 'notas', 'instrumento')
+# Números (12.5, 3/4), palabras y símbolos sueltos (Ø, R, ±) como términos
+SEARCH_TOKEN_RE = re.compile(r'\d+(?:[.,/]\d+)*|[^\W\d_]+|[^\w\s]')
+# campo:texto restringe el término a un campo
+SEARCH_FIELD_RE = re.compile(r'^(nombre|notas|instrumento):(.*)$')
+# a..b filtra por nominal (cualquiera de los extremos puede faltar)
+SEARCH_RANGE_RE = re.compile(r'^([-+]?[\d./]*)\.\.([-+]?[\d./]*)$')
+# Resultados que se muestran en la lista (la búsqueda los cuenta todos)
+SEARCH_RESULT_LIMIT = 500
+
+
+@functools.lru_cache(maxsize=4096)
+def search_tokens(text):
+    """Términos de búsqueda de un texto: minúsculas y sin acentos (los valores se repiten mucho)"""
+    text = text.lower()
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text)
+        text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return tuple(SEARCH_TOKEN_RE.findall(text))
+
+
+class CharacteristicIndex:
+    """
+    Índice invertido de las características de todas las hojas.
+    
+    Cada fila (el mismo dict que usa la tabla) se identifica por id(); los términos
+    de nombre, notas e instrumento apuntan a conjuntos de filas y los nominales se
+    guardan ordenados para filtrar rangos con bisect. Se actualiza fila a fila.
+    """
+    
+    def __init__(self):
+        self.entries = {}                 # id(fila) -> (hoja, fila, claves, nominal)
+        self.page_lists = {}              # hoja -> lista de filas (orden de la tabla)
+        self.page_ids = defaultdict(set)  # hoja -> ids indexados
+        self.postings = defaultdict(set)  # 'campo:término' y '*:término' -> ids
+        self.sorted_keys = []             # claves de postings ordenadas (prefijos)
+        self.nominals = []                # (nominal, id) ordenados
+        self.bulk = False                 # Reconstrucción: ordenar al final
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    def rebuild(self, balloons_by_page):
+        """Indexar de cero todas las hojas (las listas ordenadas se ordenan una sola vez)"""
+        self.__init__()
+        self.bulk = True
+        for page_num, page_data in balloons_by_page.items():
+            self.set_page(page_num, page_data['table'])
+        self.bulk = False
+        self.sorted_keys.sort()
+        self.nominals.sort()
+    
+    def set_page(self, page_num, rows):
+        """Reemplazar las filas indexadas de una hoja"""
+        if self.page_lists.get(page_num) is rows and len(rows) == len(self.page_ids[page_num]):
+            return
+        for row_id in list(self.page_ids.get(page_num, ())):
+            self._remove_id(row_id)
+        self.page_lists[page_num] = rows
+        for row in rows:
+            self.add_row(page_num, row)
+    
+    def add_row(self, page_num, row):
+        row_id = id(row)
+        keys = set()
+        for field in SEARCH_FIELDS:
+            for token in search_tokens(str(row.get(field, ''))):
+                keys.add(f'{field}:{token}')
+                keys.add(f'*:{token}')
+        
+        entry = self.entries.get(row_id)
+        if entry and entry[0] == page_num and entry[2] == keys:
+            # Solo cambiaron valores numéricos: mover el nominal en la lista ordenada
+            nominal = parse_fraction_or_decimal(str(row.get('nominal', '')))
+            if nominal != entry[3]:
+                del self.nominals[bisect.bisect_left(self.nominals, (entry[3], row_id))]
+                bisect.insort(self.nominals, (nominal, row_id))
+                self.entries[row_id] = (page_num, row, keys, nominal)
+            return
+        if entry:
+            self._remove_id(row_id)
+        
+        insert = list.append if self.bulk else bisect.insort
+        for key in keys:
+            if key not in self.postings:
+                insert(self.sorted_keys, key)
+            self.postings[key].add(row_id)
+        nominal = parse_fraction_or_decimal(str(row.get('nominal', '')))
+        insert(self.nominals, (nominal, row_id))
+        self.entries[row_id] = (page_num, row, keys, nominal)
+        self.page_ids[page_num].add(row_id)
+    
+    def update_row(self, row):
+        """Volver a indexar una fila editada (se ignoran filas no indexadas)"""
+        entry = self.entries.get(id(row))
+        if entry:
+            self.add_row(entry[0], row)
+    
+    def remove_row(self, row):
+        self._remove_id(id(row))
+    
+    def _remove_id(self, row_id):
+        entry = self.entries.pop(row_id, None)
+        if entry is None:
+            return
+        page_num, _, keys, nominal = entry
+        for key in keys:
+            ids = self.postings[key]
+            ids.discard(row_id)
+            if not ids:
+                del self.postings[key]
+                del self.sorted_keys[bisect.bisect_left(self.sorted_keys, key)]
+        del self.nominals[bisect.bisect_left(self.nominals, (nominal, row_id))]
+        self.page_ids[page_num].discard(row_id)
+    
+    def _prefix_ids(self, prefix):
+        """Filas con algún término que empieza por prefix ('campo:texto')"""
+        start = bisect.bisect_left(self.sorted_keys, prefix)
+        ids = set()
+        for key in itertools.islice(self.sorted_keys, start, None):
+            if not key.startswith(prefix):
+                break
+            ids |= self.postings[key]
+        return ids
+    
+    def _range_ids(self, low, high):
+        start = 0 if low is None else bisect.bisect_left(self.nominals, (low, -1))
+        end = len(self.nominals) if high is None else bisect.bisect_right(self.nominals, (high, float('inf')))
+        return {row_id for _, row_id in self.nominals[start:end]}
+    
+    def search(self, query):
+        """
+        Buscar filas que cumplen todos los términos de la consulta.
+        Términos: texto (prefijo en cualquier campo), campo:texto y nominal a..b.
+        Retorna [(hoja, posición en la tabla, fila)] en orden de hoja y fila.
+        """
+        result = None
+        for term in query.split():
+            range_match = SEARCH_RANGE_RE.match(term)
+            field_match = SEARCH_FIELD_RE.match(term.lower())
+            if range_match and any(range_match.groups()):
+                low, high = (parse_fraction_or_decimal(value) if value else None
+                             for value in range_match.groups())
+                term_sets = [self._range_ids(low, high)]
+            elif field_match:
+                field, text = field_match.groups()
+                term_sets = [self._prefix_ids(f'{field}:{token}') for token in search_tokens(text)]
+            else:
+                term_sets = [self._prefix_ids(f'*:{token}') for token in search_tokens(term)]
+            for ids in term_sets:
+                result = ids if result is None else result & ids
+            if result is not None and not result:
+                return []
+        if not result:
+            return []
+        
+        matches = []
+        by_page = defaultdict(set)
+        for row_id in result:
+            by_page[self.entries[row_id][0]].add(row_id)
+        for page_num in sorted(by_page):
+            ids = by_page[page_num]
+            for position, row in enumerate(self.page_lists.get(page_num, ())):
+                if id(row) in ids:
+                    matches.append((page_num, position, row))
+        return matches
@@ -0,0 +1,469 @@
+# -*- coding: utf-8 -*-
+"""
+Servicio HTTP local de exportación con globos (para el MES u otros programas)
+
+Servidor asyncio sin dependencias externas. Los trabajos se ejecutan en el
+pool de procesos compartido; cuando todos los procesos están ocupados las
+peticiones esperan en una cola acotada y, si la cola se llena, se responde 503.
+
+    python -m baloneo_core.service --port 8765
+
+    POST /documentos   cuerpo: el PDF original
+                       -> {"documento": "<sha1>", "paginas": N}
+    POST /globos       cuerpo JSON: {"documento": "<sha1>" | "pdf": "<base64>",
+                                     "paginas": {"0": {"balloons": [...], "table": [...]}},
+                                     "perfil": "rapido", "anotaciones": false}
+                       -> {"documento": ..., "pdf": "<base64>", "dimensiones": {...}}
+    GET  /metrics      peticiones, rechazos, rendimiento y latencias
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import statistics
+import time
+import uuid
+from collections import Counter, OrderedDict, deque
+from datetime import datetime
+
+from .cache import CACHE_DIR
+from .model import collect_dimensions, new_dimension_row
+from .pdfwriter import EXPORT_PROFILES, DEFAULT_EXPORT_PROFILE, build_balloon_pdf
+from .lazy import fitz
+from .transforms import BALLOON_SIZE
+from .workers import (
+    SHARED_POOL_WORKERS, WORKER_DOCUMENT_LIMIT, shared_render_pool, shutdown_shared_render_pool,
+)
+
+
+SERVICE_HOST = '127.0.0.1'
+SERVICE_PORT = 8765
+# Peticiones que pueden esperar a un proceso libre antes de responder 503
+SERVICE_QUEUE_LIMIT = 16
+# Tamaño máximo del cuerpo de una petición (PDF en base64 incluido)
+SERVICE_MAX_BODY = 256 * 1024 * 1024
+# Documentos originales que se conservan entre peticiones
+SERVICE_DOCUMENT_LIMIT = 32
+# Ventana (s) para el rendimiento y número de latencias que se conservan
+METRICS_WINDOW = 60.0
+METRICS_SAMPLES = 1000
+
+HTTP_REASONS = {
+    200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+    413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable',
+}
+
+
+class ServiceError(Exception):
+    """Error de la petición que se devuelve al cliente con su código HTTP"""
+    
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# === TAREAS DE LOS PROCESOS DE TRABAJO ===
+
+# Contenido de los originales leído por cada proceso de trabajo (se reutiliza entre peticiones)
+_WORKER_SOURCES = OrderedDict()
+
+
+def worker_source_bytes(pdf_path):
+    """
+    Bytes del PDF original, leídos del disco una sola vez por proceso de trabajo.
+    La clave incluye fecha de modificación y tamaño, como en worker_document.
+    """
+    stat = os.stat(pdf_path)
+    key = (pdf_path, stat.st_mtime_ns, stat.st_size)
+    pdf_bytes = _WORKER_SOURCES.get(key)
+    if pdf_bytes is None:
+        with open(pdf_path, 'rb') as f:
+            pdf_bytes = f.read()
+        _WORKER_SOURCES[key] = pdf_bytes
+        while len(_WORKER_SOURCES) > WORKER_DOCUMENT_LIMIT:
+            _WORKER_SOURCES.popitem(last=False)
+    else:
+        _WORKER_SOURCES.move_to_end(key)
+    return pdf_bytes
+
+
+def inspect_source_document(pdf_path):
+    """Tarea de un proceso de trabajo: validar el PDF (aún en su temporal) y contar sus páginas"""
+    with fitz.open(pdf_path) as doc:
+        return len(doc)
+
+
+def export_balloon_job(pdf_path, balloons_by_page, profile_key, annotations):
+    """
+    Tarea de un proceso de trabajo: PDF con globos a partir del original.
+    El dibujo modifica el documento, así que cada petición analiza una copia
+    nueva desde los bytes en memoria del proceso (copiar las páginas de un
+    documento ya abierto con insert_pdf resulta más lento que volver a analizarlo).
+    """
+    return build_balloon_pdf(worker_source_bytes(pdf_path), balloons_by_page, profile_key, annotations)
+
+
+# === DOCUMENTOS Y MÉTRICAS ===
+
+class SourceDocumentCache:
+    """
+    Documentos originales ya recibidos, por hash del contenido. Se guardan en
+    disco una vez y las peticiones siguientes pueden referirse solo al hash.
+    Un documento descartado mientras algún trabajo lo usa se borra al terminar el último.
+    """
+    
+    def __init__(self, directory, limit=SERVICE_DOCUMENT_LIMIT):
+        self.directory = directory
+        self.limit = limit
+        self.items = OrderedDict()  # sha1 -> (ruta, páginas)
+        self.in_use = Counter()  # sha1 -> trabajos en curso
+        self.pending_removal = {}  # sha1 -> ruta descartada con trabajos en curso
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+    
+    def get(self, digest):
+        entry = self.items.get(digest)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.items.move_to_end(digest)
+        return entry
+    
+    def put(self, digest, path, page_count):
+        self.items[digest] = (path, page_count)
+        self.items.move_to_end(digest)
+        # Si se había descartado, el archivo se acaba de volver a escribir
+        self.pending_removal.pop(digest, None)
+        while len(self.items) > self.limit:
+            old_digest, (old_path, _) = self.items.popitem(last=False)
+            if self.in_use[old_digest]:
+                self.pending_removal[old_digest] = old_path
+            else:
+                remove_file(old_path)
+    
+    def acquire(self, digest):
+        """Marcar el documento como en uso por un trabajo (no se borra hasta release)"""
+        self.in_use[digest] += 1
+    
+    def release(self, digest):
+        self.in_use[digest] -= 1
+        if self.in_use[digest] <= 0:
+            del self.in_use[digest]
+            path = self.pending_removal.pop(digest, None)
+            if path is not None:
+                remove_file(path)
+
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def write_source_file(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+class ServiceMetrics:
+    """Contadores, rendimiento en la última ventana y percentiles de latencia"""
+    
+    def __init__(self):
+        self.started = time.monotonic()
+        self.counters = {'peticiones': 0, 'completadas': 0, 'rechazadas': 0, 'errores': 0}
+        self.finished = deque()  # instantes de fin dentro de la ventana
+        self.latencies = deque(maxlen=METRICS_SAMPLES)
+        self.queue_waits = deque(maxlen=METRICS_SAMPLES)
+    
+    def record(self, latency, queue_wait):
+        now = time.monotonic()
+        self.counters['completadas'] += 1
+        self.finished.append(now)
+        self.latencies.append(latency)
+        self.queue_waits.append(queue_wait)
+    
+    def snapshot(self, in_flight, queued, documents):
+        now = time.monotonic()
+        while self.finished and now - self.finished[0] > METRICS_WINDOW:
+            self.finished.popleft()
+        window = min(METRICS_WINDOW, now - self.started) or 1.0
+        return {
+            **self.counters,
+            'en_curso': in_flight,
+            'en_cola': queued,
+            'procesos': SHARED_POOL_WORKERS,
+            'rendimiento_por_s': round(len(self.finished) / window, 3),
+            'latencia_ms': percentiles_ms(self.latencies),
+            'espera_cola_ms': percentiles_ms(self.queue_waits),
+            'documentos': {'en_cache': len(documents.items), 'aciertos': documents.hits,
+                           'fallos': documents.misses},
+            'activo_s': round(now - self.started, 1),
+        }
+
+
+def percentiles_ms(samples):
+    """p50, p95 y máximo (ms) de una serie de duraciones en segundos"""
+    if not samples:
+        return {'p50': None, 'p95': None, 'max': None}
+    values = sorted(samples)
+    p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+    return {
+        'p50': round(statistics.median(values) * 1000, 1),
+        'p95': round(p95 * 1000, 1),
+        'max': round(values[-1] * 1000, 1),
+    }
+
+
+def parse_balloon_pages(pages, page_count):
+    """Validar las páginas de la petición y llevarlas al formato de balloons_by_page"""
+    if not isinstance(pages, dict):
+        raise ServiceError(400, "'paginas' debe ser un objeto {número de página: datos}")
+    balloons_by_page = {}
+    for key, page_data in pages.items():
+        try:
+            page_num = int(key)
+        except ValueError:
+            raise ServiceError(400, f'Número de página no válido: {key}')
+        if not 0 <= page_num < page_count:
+            raise ServiceError(400, f'La página {page_num} no existe (el PDF tiene {page_count})')
+        try:
+            balloons = [
+                {
+                    'x': float(balloon['x']),
+                    'y': float(balloon['y']),
+                    'number': str(balloon['number']),
+                    'size': float(balloon.get('size', BALLOON_SIZE)),
+                    'sub': bool(balloon.get('sub', False)),
+                }
+                for balloon in page_data.get('balloons', [])
+            ]
+            # Las columnas que falten toman los valores por defecto de la tabla
+            table = [
+                {**new_dimension_row(f'D{i + 1}'), **row}
+                for i, row in enumerate(page_data.get('table', []))
+            ]
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            raise ServiceError(400, f'Globos no válidos en la página {page_num}: {e}')
+        balloons_by_page[page_num] = {'balloons': balloons, 'table': table}
+    return balloons_by_page
+
+
+# === SERVIDOR ===
+
+class BalloonExportService:
+    """Servidor HTTP/1.1 mínimo (una petición por conexión) sobre asyncio"""
+    
+    def __init__(self, pool=None, workers=SHARED_POOL_WORKERS, queue_limit=SERVICE_QUEUE_LIMIT,
+                 directory=CACHE_DIR / 'servicio'):
+        self.pool = pool or shared_render_pool()
+        self.slots = asyncio.Semaphore(workers)
+        self.queue_limit = queue_limit
+        self.in_flight = 0
+        self.queued = 0
+        self.documents = SourceDocumentCache(str(directory))
+        self.metrics = ServiceMetrics()
+    
+    async def run_job(self, func, *args):
+        """Ejecutar en el pool esperando turno; 503 si la cola de espera está llena"""
+        if self.queued >= self.queue_limit and self.slots.locked():
+            self.metrics.counters['rechazadas'] += 1
+            raise ServiceError(503, 'Servicio ocupado, reintente más tarde')
+        self.queued += 1
+        waited = time.perf_counter()
+        try:
+            await self.slots.acquire()
+        finally:
+            self.queued -= 1
+        queue_wait = time.perf_counter() - waited
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.pool, func, *args), queue_wait
+        finally:
+            self.in_flight -= 1
+            self.slots.release()
+    
+    async def store_document(self, pdf_bytes):
+        """Guardar (o reutilizar) el PDF original; retorna (hash, ruta, páginas)"""
+        digest = hashlib.sha1(pdf_bytes).hexdigest()
+        entry = self.documents.get(digest)
+        if entry is not None:
+            return (digest,) + entry
+        path = os.path.join(self.documents.directory, f'{digest}.pdf')
+        # Temporal propio de la petición: otra subida del mismo PDF puede estar
+        # escribiendo o usando {digest}.pdf a la vez
+        temp_path = os.path.join(self.documents.directory, f'{digest}.{uuid.uuid4().hex}.part')
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, write_source_file, temp_path, pdf_bytes)
+            page_count, _ = await self.run_job(inspect_source_document, temp_path)
+        except (ServiceError, asyncio.CancelledError):
+            remove_file(temp_path)
+            raise
+        except Exception as e:
+            remove_file(temp_path)
+            raise ServiceError(400, f'El PDF no se pudo abrir: {e}')
+        
+        entry = self.documents.items.get(digest)
+        if entry is not None:
+            # Otra petición guardó el mismo PDF mientras se validaba este
+            remove_file(temp_path)
+            return (digest,) + entry
+        os.replace(temp_path, path)
+        self.documents.put(digest, path, page_count)
+        return digest, path, page_count
+    
+    async def handle_documents(self, body):
+        if not body:
+            raise ServiceError(400, 'El cuerpo debe contener el PDF')
+        digest, _, page_count = await self.store_document(body)
+        return {'documento': digest, 'paginas': page_count}
+    
+    async def handle_balloons(self, body):
+        started = time.perf_counter()
+        try:
+            request = json.loads(body)
+        except ValueError as e:
+            raise ServiceError(400, f'JSON no válido: {e}')
+        if not isinstance(request, dict):
+            raise ServiceError(400, 'Se esperaba un objeto JSON')
+        
+        profile_key = request.get('perfil', DEFAULT_EXPORT_PROFILE)
+        if profile_key not in EXPORT_PROFILES:
+            raise ServiceError(400, f'Perfil desconocido: {profile_key} ({", ".join(EXPORT_PROFILES)})')
+        
+        if 'pdf' in request:
+            try:
+                pdf_bytes = base64.b64decode(request['pdf'], validate=True)
+            except (TypeError, ValueError) as e:
+                raise ServiceError(400, f"'pdf' no es base64 válido: {e}")
+            digest, path, page_count = await self.store_document(pdf_bytes)
+        else:
+            digest = request.get('documento')
+            entry = self.documents.get(digest)
+            if entry is None:
+                raise ServiceError(404, f'Documento no encontrado: {digest} (envíelo en "pdf" o a /documentos)')
+            path, page_count = entry
+        
+        # Sin await desde store_document/get: el documento no puede haberse descartado aún
+        self.documents.acquire(digest)
+        try:
+            balloons_by_page = parse_balloon_pages(request.get('paginas', {}), page_count)
+            pdf_bytes, queue_wait = await self.run_job(
+                export_balloon_job, path, balloons_by_page, profile_key, bool(request.get('anotaciones'))
+            )
+        except (ServiceError, asyncio.CancelledError):
+            raise
+        except Exception as e:
+            raise ServiceError(500, f'Error al generar el PDF: {e}')
+        finally:
+            self.documents.release(digest)
+        
+        self.metrics.record(time.perf_counter() - started, queue_wait)
+        return {
+            'documento': digest,
+            'pdf': base64.b64encode(pdf_bytes).decode('ascii'),
+            # Mismo contenido que el JSON de dimensiones de la aplicación, por página
+            'dimensiones': {
+                str(page_num): collect_dimensions(page_data['table'])
+                for page_num, page_data in sorted(balloons_by_page.items())
+            },
+            'version': 1,
+            'fecha_creacion': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        }
+    
+    async def dispatch(self, method, path, body):
+        routes = {
+            '/documentos': ('POST', self.handle_documents),
+            '/globos': ('POST', self.handle_balloons),
+        }
+        if path == '/metrics':
+            if method != 'GET':
+                raise ServiceError(405, 'Use GET')
+            return self.metrics.snapshot(self.in_flight, self.queued, self.documents)
+        if path not in routes:
+            raise ServiceError(404, f'Ruta desconocida: {path}')
+        expected, handler = routes[path]
+        if method != expected:
+            raise ServiceError(405, f'Use {expected}')
+        self.metrics.counters['peticiones'] += 1
+        return await handler(body)
+    
+    async def handle_connection(self, reader, writer):
+        status, payload = 200, None
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            if len(request_line) != 3:
+                raise ServiceError(400, 'Línea de petición no válida')
+            method, target, _ = request_line
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode('latin-1').strip()
+                if not line:
+                    break
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get('content-length', 0) or 0)
+            if length > SERVICE_MAX_BODY:
+                raise ServiceError(413, f'El cuerpo supera {SERVICE_MAX_BODY} bytes')
+            body = await reader.readexactly(length) if length else b''
+            payload = await self.dispatch(method, target.split('?', 1)[0], body)
+        except ServiceError as e:
+            status, payload = e.status, {'error': str(e)}
+            if e.status >= 500 and e.status != 503:
+                self.metrics.counters['errores'] += 1
+        except (ValueError, asyncio.IncompleteReadError) as e:
+            status, payload = 400, {'error': f'Petición no válida: {e}'}
+        except Exception as e:
+            self.metrics.counters['errores'] += 1
+            status, payload = 500, {'error': str(e)}
+        
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        head = [
+            f'HTTP/1.1 {status} {HTTP_REASONS.get(status, "")}',
+            'Content-Type: application/json; charset=utf-8',
+            f'Content-Length: {len(data)}',
+            'Connection: close',
+        ]
+        if status == 503:
+            head.append('Retry-After: 1')
+        try:
+            writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + data)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+    
+    async def serve(self, host=SERVICE_HOST, port=SERVICE_PORT):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f'Servicio de globos en http://{host}:{port} '
+              f'({SHARED_POOL_WORKERS} procesos, cola de {self.queue_limit})')
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servicio HTTP local de exportación con globos')
+    parser.add_argument('--host', default=SERVICE_HOST, help='Dirección de escucha (solo local por defecto)')
+    parser.add_argument('--port', type=int, default=SERVICE_PORT, help='Puerto de escucha')
+    parser.add_argument('--queue', type=int, default=SERVICE_QUEUE_LIMIT,
+                        help='Peticiones en espera antes de responder 503')
+    args = parser.parse_args()
+    
+    service = BalloonExportService(queue_limit=args.queue)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        shutdown_shared_render_pool()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Estadística de tolerancias y apilamiento (peor caso y RSS)
+"""
+
+import bisect
+import math
+import re
+from array import array
+from collections import defaultdict
+
+from .units import row_value
+
+
+MM_PER_INCH = 25.4
+# Límite superior (mm) de cada banda de tolerancia total (tol+ más tol-)
+TOLERANCE_BANDS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, float('inf'))
+# Término de una cadena de apilamiento: [+|-][hoja:]globo
+STACKUP_TERM_RE = re.compile(r'^([+-]?)(?:(\d+):)?(\w+)$')
+
+
+def to_mm(value, unit):
+    return value * MM_PER_INCH if unit == 'in' else value
+
+
+def from_mm(value, unit):
+    return value / MM_PER_INCH if unit == 'in' else value
+
+
+def tolerance_band_labels():
+    """Etiquetas de TOLERANCE_BANDS en mm"""
+    labels = []
+    for i, limit in enumerate(TOLERANCE_BANDS):
+        if math.isinf(limit):
+            labels.append(f'> {TOLERANCE_BANDS[i - 1]:g}')
+        else:
+            labels.append(f'≤ {limit:g}')
+    return labels
+
+
+class ToleranceStats:
+    """
+    Nominal y tolerancias de todas las características en arreglos por columna
+    (array('d'), en mm), con una posición fija por fila.
+    
+    Editar una celda reescribe solo su posición y ajusta el conteo de su banda;
+    los límites, las bandas y los apilamientos se leen de los arreglos sin
+    recorrer las hojas. Las posiciones libres guardan NaN y se reutilizan.
+    """
+    
+    def __init__(self):
+        self.nominal = array('d')
+        self.tol_pos = array('d')
+        self.tol_neg = array('d')
+        self.band = array('b')
+        self.rows = []                    # fila de cada posición (None = libre)
+        self.slot_pages = []              # hoja de cada posición
+        self.slots = {}                   # id(fila) -> posición
+        self.page_slots = defaultdict(set)
+        self.free = []
+        self.band_counts = [0] * len(TOLERANCE_BANDS)
+    
+    def __len__(self):
+        return len(self.slots)
+    
+    def rebuild(self, balloons_by_page):
+        self.__init__()
+        for page_num, page_data in balloons_by_page.items():
+            self.set_page(page_num, page_data['table'])
+    
+    def set_page(self, page_num, rows):
+        """Reemplazar las filas de una hoja"""
+        slots = self.page_slots[page_num]
+        if len(rows) == len(slots) and all(self.slots.get(id(row)) in slots for row in rows):
+            return
+        for slot in list(slots):
+            self._release(slot)
+        for row in rows:
+            self.add_row(page_num, row)
+    
+    def add_row(self, page_num, row):
+        slot = self.slots.get(id(row))
+        if slot is None:
+            if self.free:
+                slot = self.free.pop()
+            else:
+                slot = len(self.rows)
+                self.rows.append(None)
+                self.slot_pages.append(None)
+                for column in (self.nominal, self.tol_pos, self.tol_neg):
+                    column.append(math.nan)
+                self.band.append(-1)
+            self.rows[slot] = row
+            self.slot_pages[slot] = page_num
+            self.slots[id(row)] = slot
+            self.page_slots[page_num].add(slot)
+        self._write(slot, row)
+    
+    def update_row(self, row):
+        """Volver a leer una fila editada (se ignoran filas no registradas)"""
+        slot = self.slots.get(id(row))
+        if slot is not None:
+            self._write(slot, row)
+    
+    def remove_row(self, row):
+        slot = self.slots.get(id(row))
+        if slot is not None:
+            self._release(slot)
+    
+    def _write(self, slot, row):
+        unit = row.get('unidad', 'mm')
+        nominal = to_mm(row_value(row, 'nominal'), unit)
+        tol_pos = to_mm(row_value(row, 'tol_pos'), unit)
+        # Tol - se guarda como magnitud, se haya escrito 0.1 o -0.1
+        tol_neg = to_mm(abs(row_value(row, 'tol_neg')), unit)
+        self.nominal[slot] = nominal
+        self.tol_pos[slot] = tol_pos
+        self.tol_neg[slot] = tol_neg
+        
+        if self.band[slot] >= 0:
+            self.band_counts[self.band[slot]] -= 1
+        band = min(bisect.bisect_left(TOLERANCE_BANDS, tol_pos + tol_neg), len(TOLERANCE_BANDS) - 1)
+        self.band[slot] = band
+        self.band_counts[band] += 1
+    
+    def _release(self, slot):
+        row = self.rows[slot]
+        del self.slots[id(row)]
+        self.page_slots[self.slot_pages[slot]].discard(slot)
+        self.band_counts[self.band[slot]] -= 1
+        self.band[slot] = -1
+        self.nominal[slot] = self.tol_pos[slot] = self.tol_neg[slot] = math.nan
+        self.rows[slot] = None
+        self.free.append(slot)
+    
+    def limits(self, row, unit='mm'):
+        """Límites (inferior, superior) de una fila"""
+        slot = self.slots[id(row)]
+        return (from_mm(self.nominal[slot] - self.tol_neg[slot], unit),
+                from_mm(self.nominal[slot] + self.tol_pos[slot], unit))
+    
+    def limit_arrays(self, unit='mm'):
+        """Límites inferior y superior de todas las posiciones (NaN en las libres)"""
+        scale = from_mm(1.0, unit)
+        lower = array('d', [(n - t) * scale for n, t in zip(self.nominal, self.tol_neg)])
+        upper = array('d', [(n + t) * scale for n, t in zip(self.nominal, self.tol_pos)])
+        return lower, upper
+    
+    def distribution(self):
+        """[(banda, filas)] de la tolerancia total en mm"""
+        return list(zip(tolerance_band_labels(), self.band_counts))
+    
+    def stackup(self, chain, unit='mm'):
+        """
+        Apilamiento de una cadena [(fila, signo)] con signo +1 o -1.
+        Peor caso: se suman las tolerancias del lado que corresponde a cada signo.
+        RSS: cada cota se centra en su zona de tolerancia y se suman en cuadratura
+        las semi-bandas.
+        """
+        nominal = lower = upper = center = 0.0
+        squares = 0.0
+        for row, sign in chain:
+            slot = self.slots[id(row)]
+            n, tp, tn = self.nominal[slot], self.tol_pos[slot], self.tol_neg[slot]
+            nominal += sign * n
+            if sign > 0:
+                lower += n - tn
+                upper += n + tp
+            else:
+                lower -= n + tp
+                upper -= n - tn
+            center += sign * (n + (tp - tn) / 2)
+            squares += ((tp + tn) / 2) ** 2
+        rss = math.sqrt(squares)
+        return {
+            'nominal': from_mm(nominal, unit),
+            'peor_caso': (from_mm(lower, unit), from_mm(upper, unit)),
+            'rss': (from_mm(center - rss, unit), from_mm(center + rss, unit)),
+        }
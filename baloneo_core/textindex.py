@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+Índice espacial de las cotas de la capa de texto (ajuste de globos a cotas)
+"""
+
+import math
+import re
+from collections import defaultdict
+
+
+# Distancia máxima (en puntos PDF) para ajustar un clic a una cota
+SNAP_DISTANCE = 15.0
+
+# Cota: prefijo opcional (diámetro, radio, rosca), número decimal o fracción
+# y tolerancia simétrica opcional pegada al número
+DIMENSION_TOKEN_RE = re.compile(
+    r'^(?P<prefix>SØ|S⌀|Ø|⌀|ø|∅|SR|R|M)?'
+    r'(?P<value>\d+(?:[.,]\d+)?(?:/\d+)?|[.,]\d+)'
+    r'(?P<suffix>°|mm|"|in)?'
+    r'(?:±(?P<sym>\d*[.,]?\d+))?$'
+)
+FRACTION_TOKEN_RE = re.compile(r'^\d+/\d+$')
+# Tolerancias que siguen a la cota: ±0.1  +0.05  -0.02  +0.05/-0.02
+TOLERANCE_TOKEN_RE = re.compile(
+    r'^(?:(?P<sym>±)(?P<sym_value>\d*[.,]?\d+)|'
+    r'(?P<pos_sign>\+)(?P<pos>\d*[.,]?\d+)(?:/-(?P<neg_after>\d*[.,]?\d+))?|'
+    r'(?P<neg_sign>[-−])(?P<neg>\d*[.,]?\d+))$'
+)
+
+
+def _normalize_number(text):
+    """Aceptar coma decimal y valores sin cero inicial (.5)"""
+    text = text.replace(',', '.')
+    if text.startswith('.'):
+        text = '0' + text
+    return text
+
+
+def parse_dimension_words(words, start):
+    """
+    Interpretar la cota que empieza en words[start] junto con las tolerancias
+    que la siguen en la misma línea.
+    Retorna (nominal, tol_pos, tol_neg, texto, rect) o None.
+    """
+    word = words[start]
+    match = DIMENSION_TOKEN_RE.match(word[4])
+    if not match:
+        return None
+    
+    nominal = _normalize_number(match.group('value'))
+    tol_pos = tol_neg = None
+    if match.group('sym'):
+        tol_pos = tol_neg = _normalize_number(match.group('sym'))
+    
+    parts = [word[4]]
+    x0, y0, x1, y1 = word[:4]
+    index = start + 1
+    
+    # Número mixto: "1 1/2"
+    if (index < len(words) and '/' not in nominal and '.' not in nominal and
+            FRACTION_TOKEN_RE.match(words[index][4])):
+        nominal = f'{nominal} {words[index][4]}'
+        parts.append(words[index][4])
+        x1, y1 = max(x1, words[index][2]), max(y1, words[index][3])
+        index += 1
+    
+    # Tolerancias a continuación (como máximo dos palabras)
+    while tol_pos is None or tol_neg is None:
+        if index >= len(words):
+            break
+        tol_match = TOLERANCE_TOKEN_RE.match(words[index][4])
+        if not tol_match:
+            break
+        if tol_match.group('sym'):
+            if tol_pos is not None or tol_neg is not None:
+                break
+            tol_pos = tol_neg = _normalize_number(tol_match.group('sym_value'))
+        elif tol_match.group('pos_sign'):
+            if tol_pos is not None:
+                break
+            tol_pos = _normalize_number(tol_match.group('pos'))
+            if tol_match.group('neg_after'):
+                tol_neg = _normalize_number(tol_match.group('neg_after'))
+        else:
+            if tol_neg is not None:
+                break
+            tol_neg = _normalize_number(tol_match.group('neg'))
+        parts.append(words[index][4])
+        x1, y1 = max(x1, words[index][2]), max(y1, words[index][3])
+        index += 1
+    
+    return nominal, tol_pos, tol_neg, ' '.join(parts), (x0, y0, x1, y1)
+
+
+class WordIndex:
+    """
+    Índice espacial (rejilla uniforme) de las palabras de una página.
+    Solo se indexan las palabras con aspecto de cota; la consulta del
+    vecino más cercano revisa únicamente las celdas alrededor del punto.
+    """
+    
+    def __init__(self, words, cell_size=None):
+        # Palabras agrupadas por línea en orden de lectura
+        lines = defaultdict(list)
+        for word in words:
+            lines[(word[5], word[6])].append(word)
+        self.lines = {key: sorted(line, key=lambda w: w[7]) for key, line in lines.items()}
+        
+        candidates = [
+            (key, i) for key, line in self.lines.items()
+            for i, word in enumerate(line) if DIMENSION_TOKEN_RE.match(word[4])
+        ]
+        
+        if cell_size is None:
+            # Celda proporcional a la altura típica del texto
+            heights = sorted(self.lines[key][i][3] - self.lines[key][i][1] for key, i in candidates)
+            cell_size = max(heights[len(heights) // 2] * 4, 10.0) if heights else 50.0
+        self.cell_size = cell_size
+        
+        self.grid = defaultdict(list)
+        for key, i in candidates:
+            x0, y0, x1, y1 = self.lines[key][i][:4]
+            for cx in range(int(x0 // cell_size), int(x1 // cell_size) + 1):
+                for cy in range(int(y0 // cell_size), int(y1 // cell_size) + 1):
+                    self.grid[(cx, cy)].append((key, i))
+    
+    @classmethod
+    def from_page(cls, page):
+        """Construir el índice a partir de la capa de texto de una página"""
+        return cls(page.get_text("words"))
+    
+    def __len__(self):
+        return sum(len(line) for line in self.lines.values())
+    
+    def nearest(self, x, y, max_distance=SNAP_DISTANCE):
+        """
+        Buscar la cota más cercana al punto (coordenadas PDF sin rotar).
+        Retorna (nominal, tol_pos, tol_neg, texto, rect) o None.
+        """
+        size = self.cell_size
+        cx, cy = int(x // size), int(y // size)
+        rings = int(math.ceil(max_distance / size))
+        best = None
+        best_distance = max_distance
+        
+        for ring in range(rings + 1):
+            # Ninguna celda de este anillo puede mejorar la mejor distancia
+            if best is not None and (ring - 1) * size > best_distance:
+                break
+            for gx in range(cx - ring, cx + ring + 1):
+                for gy in range(cy - ring, cy + ring + 1):
+                    if max(abs(gx - cx), abs(gy - cy)) != ring:
+                        continue
+                    for key, i in self.grid.get((gx, gy), ()):
+                        x0, y0, x1, y1 = self.lines[key][i][:4]
+                        dx = max(x0 - x, 0.0, x - x1)
+                        dy = max(y0 - y, 0.0, y - y1)
+                        distance = math.hypot(dx, dy)
+                        if distance <= best_distance:
+                            best_distance = distance
+                            best = (key, i)
+        
+        if best is None:
+            return None
+        key, i = best
+        return parse_dimension_words(self.lines[key], i)
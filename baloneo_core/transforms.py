@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Zoom de render y transformación de coordenadas entre la escena y la página PDF
+"""
+
+import math
+
+
+# Factor de zoom de referencia (pantalla de 96 DPI) y del modo vectorial
+RENDER_ZOOM = 2.0
+# Límites de la política de resolución del render
+MIN_RENDER_ZOOM = 0.5
+MAX_RENDER_ZOOM = 8.0
+# Lado mayor mínimo del render en píxeles: las hojas pequeñas ganan detalle
+MIN_RENDER_LONG_SIDE = 1600
+# Lado máximo de un render (QPixmap admite hasta 32767)
+MAX_RENDER_SIDE = 16000
+# Memoria máxima de un render de página (RGBA en la vista)
+RENDER_MEMORY_BUDGET = 64 * 1024 * 1024
+# Diámetro de los globos en puntos PDF
+BALLOON_SIZE = 17.5
+
+
+def scene_to_pdf_point(x, y, rotation, page_width, page_height, zoom=RENDER_ZOOM):
+    """
+    Convertir coordenadas de la escena (imagen rotada renderizada a `zoom`)
+    a coordenadas de la página PDF sin rotar.
+    page_width y page_height son las dimensiones de la página SIN rotación.
+    """
+    screen_x = x / zoom
+    screen_y = y / zoom
+    
+    if rotation == 90:
+        return screen_y, page_height - screen_x
+    elif rotation == 180:
+        return page_width - screen_x, page_height - screen_y
+    elif rotation == 270:
+        return page_width - screen_y, screen_x
+    return screen_x, screen_y
+
+
+def choose_render_zoom(page_width, page_height, screen_dpi=96.0, budget_bytes=RENDER_MEMORY_BUDGET):
+    """
+    Política de resolución del render de una página.
+    Parte del zoom de referencia escalado a los DPI de la pantalla, sube hasta
+    que el lado mayor tenga MIN_RENDER_LONG_SIDE píxeles (hojas pequeñas) y
+    baja para que el render quepa en el presupuesto de memoria (hojas A0).
+    """
+    long_side = max(page_width, page_height, 1.0)
+    zoom = RENDER_ZOOM * screen_dpi / 96.0
+    zoom = max(zoom, MIN_RENDER_LONG_SIDE / long_side)
+    zoom = min(
+        zoom,
+        math.sqrt(budget_bytes / (4.0 * max(page_width * page_height, 1.0))),
+        MAX_RENDER_SIDE / long_side
+    )
+    return round(min(max(zoom, MIN_RENDER_ZOOM), MAX_RENDER_ZOOM), 2)
+
+
+def pdf_to_scene_point(pdf_x, pdf_y, rotation, page_width, page_height, zoom=RENDER_ZOOM):
+    """Inversa de scene_to_pdf_point: de la página PDF sin rotar a la escena"""
+    if rotation == 90:
+        screen_x, screen_y = page_height - pdf_y, pdf_x
+    elif rotation == 180:
+        screen_x, screen_y = page_width - pdf_x, page_height - pdf_y
+    elif rotation == 270:
+        screen_x, screen_y = pdf_y, page_width - pdf_x
+    else:
+        screen_x, screen_y = pdf_x, pdf_y
+    return screen_x * zoom, screen_y * zoom
+
+
+def rotate_about_center(x, y, angle, width, height):
+    """
+    Girar un punto angle grados alrededor del centro de una imagen de width x height
+    (misma convención que fitz.Matrix(angle), con y hacia abajo). Con -angle se deshace.
+    """
+    radians = math.radians(angle)
+    cos, sin = math.cos(radians), math.sin(radians)
+    dx, dy = x - width / 2, y - height / 2
+    return width / 2 + dx * cos - dy * sin, height / 2 + dx * sin + dy * cos
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Valores de cota: fracciones, decimales y conversión exacta entre mm y pulgadas
+"""
+
+import functools
+from fractions import Fraction
+
+
+def parse_fraction_or_decimal(value_str):
+    """
+    Convertir string a decimal, aceptando fracciones (1/2, 3/4, etc.) o decimales (0.5, 1.25)
+    Retorna el valor como float
+    """
+    if not value_str or value_str.strip() == '':
+        return 0.0
+    
+    value_str = value_str.strip()
+    
+    try:
+        # Intentar como fracción primero (puede tener números mixtos como "1 1/2")
+        if '/' in value_str:
+            # Manejar números mixtos (ej: "1 1/2" = 1.5)
+            if ' ' in value_str:
+                parts = value_str.split()
+                whole = float(parts[0])
+                frac = Fraction(parts[1])
+                return whole + float(frac)
+            else:
+                # Fracción simple (ej: "1/2" = 0.5)
+                return float(Fraction(value_str))
+        else:
+            # Número decimal normal
+            return float(value_str)
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+
+
+MM_PER_INCH_EXACT = Fraction(254, 10)
+# Las pulgadas con denominador potencia de 2 hasta 1/64 se muestran como fracción
+INCH_FRACTION_DENOMINATOR = 64
+# Decimales al mostrar valores que no son fracciones exactas
+UNIT_DECIMALS = {'mm': 3, 'in': 4}
+# Columnas de la fila que llevan magnitudes
+UNIT_VALUE_KEYS = ('nominal', 'tol_pos', 'tol_neg')
+
+
+def parse_exact(value_str):
+    """Valor exacto (Fraction) de un texto de cota (12.5, 3/4, 1 1/2) o None si no es numérico"""
+    text = value_str.strip()
+    if not text:
+        return None
+    try:
+        if ' ' in text and '/' in text:
+            whole, fraction = text.split(None, 1)
+            whole_value, fraction_value = Fraction(whole), Fraction(fraction.strip())
+            return whole_value - fraction_value if whole.startswith('-') else whole_value + fraction_value
+        return Fraction(text)
+    except (ValueError, ZeroDivisionError):
+        return None
+
+
+def format_exact(value, unit):
+    """Texto de un valor: fracción en pulgadas si es diádica, si no decimal redondeado"""
+    denominator = value.denominator
+    if unit == 'in' and denominator & (denominator - 1) == 0 and denominator <= INCH_FRACTION_DENOMINATOR:
+        if denominator == 1:
+            return f'{value.numerator}.0'
+        whole, rest = divmod(abs(value.numerator), denominator)
+        sign = '-' if value < 0 else ''
+        return f'{sign}{whole} {rest}/{denominator}' if whole else f'{sign}{rest}/{denominator}'
+    text = f'{float(value):.{UNIT_DECIMALS.get(unit, 3)}f}'.rstrip('0')
+    if text.endswith('.'):
+        text += '0'
+    return '0.0' if text == '-0.0' else text
+
+
+@functools.lru_cache(maxsize=8192)
+def convert_value_text(text, unit):
+    """
+    Convertir un valor escrito en la otra unidad a unit.
+    Retorna (texto, exacto) donde exacto es 'num/den' si el texto es un redondeo
+    (o None si el texto ya es exacto), o None si el texto no es numérico.
+    Las tolerancias se repiten mucho, así que el resultado se memoriza.
+    """
+    value = parse_exact(text)
+    if value is None:
+        return None
+    converted = value * (MM_PER_INCH_EXACT if unit == 'mm' else 1 / MM_PER_INCH_EXACT)
+    shown = format_exact(converted, unit)
+    return shown, (None if parse_exact(shown) == converted else str(converted))
+
+
+def convert_row_unit(row, unit):
+    """
+    Convertir nominal y tolerancias de una fila a unit con aritmética exacta.
+    
+    Si el texto mostrado es un redondeo, el valor exacto queda en row['_exact']
+    como (texto, 'num/den'); mientras el texto no se edite, la siguiente conversión
+    parte del valor exacto y mm -> in -> mm vuelve al valor original.
+    Retorna False si la fila ya estaba en unit.
+    """
+    if row.get('unidad', 'mm') == unit:
+        return False
+    shadow = row.get('_exact') or {}
+    new_shadow = {}
+    for key in UNIT_VALUE_KEYS:
+        text = str(row.get(key, ''))
+        saved = shadow.get(key)
+        result = convert_value_text(saved[1] if saved and saved[0] == text else text, unit)
+        if result is None:
+            continue  # Texto no numérico: se deja como está
+        row[key], exact = result
+        if exact:
+            new_shadow[key] = (row[key], exact)
+    if new_shadow:
+        row['_exact'] = new_shadow
+    else:
+        row.pop('_exact', None)
+    row['unidad'] = unit
+    return True
+
+
+def row_value(row, key):
+    """Valor numérico de una columna; exacto si el texto mostrado es un redondeo de conversión"""
+    text = str(row.get(key, ''))
+    saved = (row.get('_exact') or {}).get(key)
+    if saved and saved[0] == text:
+        return float(Fraction(saved[1]))
+    return parse_fraction_or_decimal(text)
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Pool de procesos compartido y documentos abiertos por cada proceso de trabajo
+"""
+
+import multiprocessing
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from .lazy import fitz
+
+
+# Procesos de trabajo para renders y detección (uno por núcleo, dejando uno libre)
+SHARED_POOL_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+
+_shared_pool = None
+
+
+def shared_render_pool():
+    """Pool de procesos único y acotado para todos los documentos abiertos"""
+    global _shared_pool
+    if _shared_pool is None:
+        # 'spawn': no duplicar el proceso con hilos de Qt en ejecución
+        _shared_pool = ProcessPoolExecutor(
+            max_workers=SHARED_POOL_WORKERS, mp_context=multiprocessing.get_context('spawn')
+        )
+    return _shared_pool
+
+
+def shutdown_shared_render_pool():
+    """Cerrar el pool: se cancelan las tareas pendientes y se espera a las que están en curso"""
+    global _shared_pool
+    if _shared_pool is not None:
+        _shared_pool.shutdown(wait=True, cancel_futures=True)
+        _shared_pool = None
+
+
+# Documentos abiertos por cada proceso de trabajo (se reutilizan entre páginas)
+_WORKER_DOCUMENTS = OrderedDict()
+# Documentos que cada proceso mantiene abiertos a la vez
+WORKER_DOCUMENT_LIMIT = 4
+
+
+def worker_document(pdf_path):
+    """
+    Abrir el PDF una sola vez por proceso de trabajo (cerrando los menos usados).
+    La clave incluye fecha de modificación y tamaño: un archivo sobrescrito se vuelve a abrir.
+    """
+    stat = os.stat(pdf_path)
+    key = (pdf_path, stat.st_mtime_ns, stat.st_size)
+    document = _WORKER_DOCUMENTS.get(key)
+    if document is None:
+        # Versiones anteriores del mismo archivo ya no sirven
+        for old_key in [k for k in _WORKER_DOCUMENTS if k[0] == pdf_path]:
+            _WORKER_DOCUMENTS.pop(old_key).close()
+        document = fitz.open(pdf_path)
+        _WORKER_DOCUMENTS[key] = document
+        while len(_WORKER_DOCUMENTS) > WORKER_DOCUMENT_LIMIT:
+            _WORKER_DOCUMENTS.popitem(last=False)[1].close()
+    else:
+        _WORKER_DOCUMENTS.move_to_end(key)
+    return document
@@ -5,23 +5,778 @@
 Aplicación simplificada para baloneado manual sin IA
 """
 
+import re
 import sys
-import fitz
-import json
-import base64
-from datetime import datetime
+import bisect
+import functools
+import logging
+import math
+import os
+import tempfile
+import time
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from fractions import Fraction
 
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QLabel, QPushButton, QFileDialog,
-                             QTableWidget, QTableWidgetItem, QLineEdit, QComboBox,
+                             QTableView, QStyledItemDelegate, QLineEdit, QComboBox,
                              QMessageBox, QSplitter, QHeaderView, QGroupBox, 
                              QFormLayout, QGraphicsView, QGraphicsScene, 
-                             QGraphicsEllipseItem, QGraphicsTextItem, QGraphicsPixmapItem,
-                             QDialog, QListWidget, QListWidgetItem, QDialogButtonBox, QInputDialog)
-from PyQt5.QtCore import Qt, QPointF, QRectF
-from PyQt5.QtGui import QPixmap, QImage, QPainter, QPen, QColor, QFont, QBrush, QTransform
+                             QGraphicsEllipseItem, QGraphicsPixmapItem,
+                             QDialog, QListWidget, QListWidgetItem, QDialogButtonBox, QInputDialog,
+                             QGraphicsRectItem, QCheckBox, QListView,
+                             QGraphicsPathItem, QGraphicsSimpleTextItem, QGraphicsItem, QTabBar)
+from PyQt5.QtCore import (Qt, QPointF, QRectF, QThread, QObject, QSize, QPoint, QTimer, pyqtSignal,
+                          QAbstractTableModel, QModelIndex)
+from PyQt5.QtGui import (QPixmap, QImage, QPainter, QPen, QColor, QFont, QBrush, QTransform, QIcon,
+                         QPainterPath, QPolygonF, QFontMetricsF, QPixmapCache)
+
+from baloneo_core.lazy import fitz
+from baloneo_core.transforms import (RENDER_ZOOM, BALLOON_SIZE, scene_to_pdf_point, pdf_to_scene_point,
+                                     choose_render_zoom, rotate_about_center)
+from baloneo_core.diff import diff_pages, point_in_rects
+from baloneo_core.textindex import WordIndex
+from baloneo_core.model import (NUMBERING_DOCUMENT, NUMBERING_PAGE, INSTRUMENTS, BalloonNumbering,
+                                new_dimension_row, snapshot_balloons, dimensions_json)
+from baloneo_core.units import parse_fraction_or_decimal, convert_row_unit
+from baloneo_core.workers import shared_render_pool, shutdown_shared_render_pool
+from baloneo_core.detect import detect_page_candidates
+from baloneo_core.cache import (CACHE_DIR, RAW_HEADER, THUMBNAIL_CACHE_MAX_BYTES, MemoryRenderCache,
+                                RenderCache, file_digest)
+from baloneo_core.raster import (THUMBNAIL_WIDTH, IMAGE_EXPORT_DPI, IMAGE_EXPORT_MIN_DPI,
+                                 IMAGE_EXPORT_MAX_DPI, render_thumbnail_png, export_pdf_as_images)
+from baloneo_core.report import REPORT_WRITERS, iter_report_rows, write_report_pdf
+from baloneo_core.pdfwriter import (EXPORT_PROFILES, DEFAULT_EXPORT_PROFILE, ExportCancelled,
+                                    write_file_atomic, build_balloon_pdf, read_balloon_annotations)
+from baloneo_core.search import SEARCH_RESULT_LIMIT, CharacteristicIndex
+from baloneo_core.scan import SCAN_CACHE_VARIANT, preprocess_scanned_page, scan_render_angle
+from baloneo_core.stats import STACKUP_TERM_RE, ToleranceStats
+
+
+logger = logging.getLogger(__name__)
+
+
+# === HILOS DE TRABAJO ===
+
+class RevisionDiffWorker(QThread):
+    """Hilo de fondo que compara dos revisiones de un plano página por página"""
+    
+    progress = pyqtSignal(int, int)        # (página actual, total)
+    finished_diff = pyqtSignal(dict, str)  # ({página: None | [rects]}, hash de la nueva revisión)
+    failed = pyqtSignal(str)
+    diff_cancelled = pyqtSignal()
+    
+    def __init__(self, old_path, new_path, parent=None):
+        super().__init__(parent)
+        self.old_path = old_path
+        self.new_path = new_path
+    
+    def run(self):
+        try:
+            # Documentos propios del hilo: fitz no es seguro entre hilos
+            with fitz.open(self.old_path) as old_doc, fitz.open(self.new_path) as new_doc:
+                # Un PDF exportado con anotaciones las lleva en el archivo: se quitan
+                # (solo en memoria) para que los globos no cuenten como cambios
+                read_balloon_annotations(old_doc, strip=True)
+                total = len(new_doc)
+                result = {}
+                
+                for page_num in range(total):
+                    if self.isInterruptionRequested():
+                        # Un resultado parcial daría por iguales las páginas sin comparar
+                        self.diff_cancelled.emit()
+                        return
+                    if page_num < len(old_doc):
+                        result[page_num] = diff_pages(old_doc[page_num], new_doc[page_num])
+                    else:
+                        # Página nueva: todo es cambio
+                        result[page_num] = [tuple(new_doc[page_num].cropbox)]
+                    self.progress.emit(page_num + 1, total)
+            
+            # El hash de la nueva revisión lee todo el archivo: también fuera de la interfaz
+            pdf_hash = file_digest(self.new_path)
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.finished_diff.emit(result, pdf_hash)
+
+
+class CandidateDetectionWorker(QThread):
+    """
+    Hilo que reparte la detección de candidatos entre procesos de trabajo
+    y entrega los resultados de cada página a medida que terminan.
+    """
+    
+    page_ready = pyqtSignal(int, list)     # (página, candidatos)
+    progress = pyqtSignal(int, int)        # (páginas terminadas, total)
+    failed = pyqtSignal(str)
+    
+    def __init__(self, pdf_path, page_numbers, parent=None):
+        super().__init__(parent)
+        self.pdf_path = pdf_path
+        self.page_numbers = list(page_numbers)
+    
+    def run(self):
+        total = len(self.page_numbers)
+        done = 0
+        futures = []
+        try:
+            executor = shared_render_pool()
+            futures = [executor.submit(detect_page_candidates, self.pdf_path, page_num)
+                       for page_num in self.page_numbers]
+            for future in as_completed(futures):
+                if self.isInterruptionRequested():
+                    break
+                page_num, candidates = future.result()
+                done += 1
+                self.page_ready.emit(page_num, candidates)
+                self.progress.emit(done, total)
+        except Exception as e:
+            self.failed.emit(str(e))
+        finally:
+            # El pool es compartido: solo se cancelan las tareas propias
+            for future in futures:
+                future.cancel()
+
+
+class ThumbnailLoader(QObject):
+    """
+    Carga perezosa de miniaturas: primero la caché en disco (clave: hash del
+    PDF y página), si no un proceso de trabajo renderiza la página.
+    """
+    
+    thumbnail_ready = pyqtSignal(int, bytes)  # (página, PNG)
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.cache = RenderCache(CACHE_DIR / 'thumbs', THUMBNAIL_CACHE_MAX_BYTES, fmt='png')
+        self.pending = set()  # Tareas en el pool compartido
+        self.pdf_path = None
+        self.pdf_hash = None
+        self.requested = set()
+        self.generation = 0  # Descarta resultados de un documento anterior
+    
+    def set_document(self, pdf_path, pdf_hash):
+        """Cambiar de documento: se cancelan las solicitudes pendientes"""
+        self.shutdown()
+        self.pdf_path = pdf_path
+        self.pdf_hash = pdf_hash
+        self.requested = set()
+        self.generation += 1
+    
+    def request(self, page_num):
+        """Solicitar la miniatura de una página (una sola vez por documento)"""
+        if not self.pdf_path or page_num in self.requested:
+            return
+        self.requested.add(page_num)
+        
+        cached = self.cache.get(self.pdf_hash, page_num, THUMBNAIL_WIDTH, variant='thumb')
+        if cached is not None:
+            self.thumbnail_ready.emit(page_num, cached.data)
+            return
+        
+        generation, pdf_hash = self.generation, self.pdf_hash
+        future = shared_render_pool().submit(render_thumbnail_png, self.pdf_path, page_num)
+        self.pending.add(future)
+        future.add_done_callback(
+            lambda f: self._on_rendered(f, generation, pdf_hash)
+        )
+    
+    def _on_rendered(self, future, generation, pdf_hash):
+        """Se ejecuta en un hilo del ejecutor: guardar en disco y avisar a la interfaz"""
+        self.pending.discard(future)
+        if future.cancelled() or future.exception() or generation != self.generation:
+            return
+        page_num, png = future.result()
+        self.cache.put_bytes(pdf_hash, page_num, THUMBNAIL_WIDTH, png, variant='thumb')
+        self.thumbnail_ready.emit(page_num, png)
+    
+    def shutdown(self):
+        """Cancelar las miniaturas que aún no empezaron a renderizarse"""
+        for future in list(self.pending):
+            future.cancel()
+        self.pending = set()
+
+
+class ScanPreprocessor(QObject):
+    """
+    Preprocesado de planos escaneados en el pool compartido (enderezado,
+    contraste y binarizado). El resultado se guarda en la caché en disco junto
+    a los renders, con la variante SCAN_CACHE_VARIANT.
+    """
+    
+    scan_ready = pyqtSignal(object, bytes)  # ((hash, página, zoom, rotación), blob 'raw')
+    
+    def __init__(self, cache, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self.pending = {}  # clave -> futuro en el pool compartido
+    
+    def request(self, pdf_path, pdf_hash, page_num, zoom, rotation):
+        """Solicitar el preprocesado de una página (una sola tarea por clave)"""
+        key = (pdf_hash, page_num, zoom, rotation)
+        if key in self.pending:
+            return
+        future = shared_render_pool().submit(preprocess_scanned_page, pdf_path, page_num, zoom, rotation)
+        self.pending[key] = future
+        future.add_done_callback(lambda f: self._on_processed(f, key))
+    
+    def _on_processed(self, future, key):
+        """Se ejecuta en un hilo del ejecutor: guardar en disco y avisar a la interfaz"""
+        self.pending.pop(key, None)
+        if future.cancelled() or future.exception():
+            return
+        blob = future.result()
+        pdf_hash, page_num, zoom, rotation = key
+        if pdf_hash:
+            self.cache.put_bytes(pdf_hash, page_num, zoom, blob, rotation, SCAN_CACHE_VARIANT)
+        self.scan_ready.emit(key, blob)
+    
+    def shutdown(self):
+        """Cancelar los preprocesados que aún no empezaron"""
+        for future in list(self.pending.values()):
+            future.cancel()
+        self.pending = {}
+
+
+# === MODO VECTORIAL ===
+
+# Tamaño de referencia de las fuentes del modo vectorial (se escala por span)
+VECTOR_FONT_PIXEL_SIZE = 100
+
+
+def scene_transform_for_page(rotation, page_width, page_height, zoom=RENDER_ZOOM):
+    """QTransform equivalente a pdf_to_scene_point (PDF sin rotar -> escena)"""
+    ox, oy = pdf_to_scene_point(0, 0, rotation, page_width, page_height, zoom)
+    ex, ey = pdf_to_scene_point(1, 0, rotation, page_width, page_height, zoom)
+    fx, fy = pdf_to_scene_point(0, 1, rotation, page_width, page_height, zoom)
+    return QTransform(ex - ox, ey - oy, fx - ox, fy - oy, ox, oy)
+
+
+def _fitz_color(color, opacity=None):
+    """Convertir un color de fitz (tupla 0..1) a QColor"""
+    if color is None:
+        return None
+    if len(color) == 1:
+        color = (color[0],) * 3
+    elif len(color) == 4:
+        # CMYK aproximado
+        c, m, y, k = color
+        color = ((1 - c) * (1 - k), (1 - m) * (1 - k), (1 - y) * (1 - k))
+    qcolor = QColor.fromRgbF(*[min(max(v, 0.0), 1.0) for v in color[:3]])
+    if opacity is not None:
+        qcolor.setAlphaF(min(max(opacity, 0.0), 1.0))
+    return qcolor
+
+
+def build_vector_page(page):
+    """
+    Convertir los dibujos y el texto de una página en primitivas de Qt
+    (coordenadas PDF sin rotar). El resultado se puede cachear: son tipos
+    de valor y se reutilizan para crear los items cada vez que se muestra.
+    Retorna dict con 'paths' [(QPainterPath, QPen|None, QBrush|None)],
+    'texts' [(texto, QFont, escala, x, y, ángulo, QColor)] e 'images' [(QImage, QRectF)].
+    """
+    paths = []
+    for drawing in page.get_drawings():
+        path = QPainterPath()
+        if drawing.get('even_odd'):
+            path.setFillRule(Qt.OddEvenFill)
+        else:
+            path.setFillRule(Qt.WindingFill)
+        
+        current = None
+        for item in drawing['items']:
+            kind = item[0]
+            if kind == 'l':
+                p1, p2 = item[1], item[2]
+                if current is None or current != p1:
+                    path.moveTo(p1.x, p1.y)
+                path.lineTo(p2.x, p2.y)
+                current = p2
+            elif kind == 'c':
+                p1, c1, c2, p2 = item[1], item[2], item[3], item[4]
+                if current is None or current != p1:
+                    path.moveTo(p1.x, p1.y)
+                path.cubicTo(c1.x, c1.y, c2.x, c2.y, p2.x, p2.y)
+                current = p2
+            elif kind == 're':
+                rect = item[1]
+                path.addRect(QRectF(rect.x0, rect.y0, rect.width, rect.height))
+                current = None
+            elif kind == 'qu':
+                quad = item[1]
+                path.addPolygon(QPolygonF([QPointF(p.x, p.y) for p in (quad.ul, quad.ur, quad.lr, quad.ll)]))
+                path.closeSubpath()
+                current = None
+        if drawing.get('closePath'):
+            path.closeSubpath()
+        
+        pen = None
+        stroke = _fitz_color(drawing.get('color'), drawing.get('stroke_opacity'))
+        if stroke is not None and drawing.get('type') in ('s', 'fs'):
+            pen = QPen(stroke, drawing.get('width') or 1.0)
+            pen.setCapStyle(Qt.FlatCap)
+        brush = None
+        fill = _fitz_color(drawing.get('fill'), drawing.get('fill_opacity'))
+        if fill is not None and drawing.get('type') in ('f', 'fs'):
+            brush = QBrush(fill)
+        paths.append((path, pen, brush))
+    
+    texts = []
+    images = []
+    fonts = {}
+    text_dict = page.get_text("dict")
+    for block in text_dict.get('blocks', []):
+        if block.get('type') == 1:
+            # Imagen incrustada
+            image = QImage.fromData(block.get('image', b''))
+            if not image.isNull():
+                x0, y0, x1, y1 = block['bbox']
+                images.append((image, QRectF(x0, y0, x1 - x0, y1 - y0)))
+            continue
+        for line in block.get('lines', []):
+            dx, dy = line.get('dir', (1, 0))
+            angle = math.degrees(math.atan2(dy, dx))
+            for span in line.get('spans', []):
+                text = span['text']
+                if not text.strip():
+                    continue
+                flags = span.get('flags', 0)
+                font_key = (span.get('font', ''), bool(flags & 16), bool(flags & 2))
+                font = fonts.get(font_key)
+                if font is None:
+                    family = 'Courier New' if flags & 8 else ('Times New Roman' if flags & 4 else 'Arial')
+                    font = QFont(family)
+                    font.setPixelSize(VECTOR_FONT_PIXEL_SIZE)
+                    font.setBold(font_key[1])
+                    font.setItalic(font_key[2])
+                    fonts[font_key] = font
+                origin = span['origin']
+                texts.append((text, font, span['size'] / VECTOR_FONT_PIXEL_SIZE,
+                              origin[0], origin[1], angle, QColor(span.get('color', 0))))
+    
+    return {'paths': paths, 'texts': texts, 'images': images}
+
+
+# === EXPORTACIÓN EN SEGUNDO PLANO ===
+
+class ExportWorker(QThread):
+    """
+    Hilo de fondo para un trabajo de exportación.
+    El trabajo es job(progress, cancelled) y trabaja sobre una instantánea,
+    así la interfaz puede seguir navegando y editando mientras exporta.
+    """
+    
+    progress = pyqtSignal(int, int)        # (hechas, total)
+    finished_export = pyqtSignal(object)   # resultado del trabajo
+    failed = pyqtSignal(str)
+    export_cancelled = pyqtSignal()
+    
+    def __init__(self, job, parent=None):
+        super().__init__(parent)
+        self.job = job
+    
+    def run(self):
+        try:
+            result = self.job(self.progress.emit, self.isInterruptionRequested)
+        except ExportCancelled:
+            self.export_cancelled.emit()
+        except Exception as e:
+            logger.debug('Exportación fallida', exc_info=True)
+            self.failed.emit(str(e))
+        else:
+            self.finished_export.emit(result)
+
+
+# === TABLA DE DIMENSIONES ===
+
+# Columnas de la tabla (clave en la fila, encabezado, ancho inicial; 0 = ocupa el resto)
+DIMENSION_COLUMNS = (
+    ('nombre', 'Nombre', 60),
+    ('nominal', 'Nominal', 80),
+    ('tol_pos', 'Tol +', 60),
+    ('tol_neg', 'Tol -', 60),
+    ('instrumento', 'Instrumento', 100),
+    ('unidad', 'Unidad', 60),
+    ('notas', 'Notas', 0),
+)
+# Filas que agrega cada fetchMore de la vista de todas las hojas
+ALL_PAGES_FETCH_ROWS = 200
+# Alto fijo de fila: la vista no mide el contenido de cada fila
+TABLE_ROW_HEIGHT = 26
+READ_ONLY_CELL_COLOR = QColor(60, 60, 60)
+
+
+class DimensionTableModel(QAbstractTableModel):
+    """
+    Tabla de dimensiones de una hoja sobre la misma lista de filas (dicts) que se
+    guarda en balloons_by_page: cambiar de hoja no copia filas y la vista solo
+    consulta las celdas visibles.
+    """
+    
+    columns = DIMENSION_COLUMNS
+    read_only = frozenset({'unidad'})
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rows = []
+    
+    def column_key(self, column):
+        return self.columns[column][0]
+    
+    def column_of(self, key):
+        return next(i for i, column in enumerate(self.columns) if column[0] == key)
+    
+    def row_at(self, row):
+        return self.rows[row]
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+    
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        key = self.column_key(index.column())
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            return str(self.row_at(index.row()).get(key, ''))
+        if role == Qt.BackgroundRole and key in self.read_only:
+            return READ_ONLY_CELL_COLOR
+        return None
+    
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.columns[section][1]
+        return str(section + 1)
+    
+    def flags(self, index):
+        flags = Qt.ItemIsEnabled | Qt.ItemIsSelectable
+        if index.isValid() and self.column_key(index.column()) not in self.read_only:
+            flags |= Qt.ItemIsEditable
+        return flags
+    
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.EditRole or not index.isValid():
+            return False
+        self.row_at(index.row())[self.column_key(index.column())] = value
+        self.dataChanged.emit(index, index, [Qt.DisplayRole, Qt.EditRole])
+        return True
+    
+    def set_rows(self, rows):
+        """Mostrar otra lista de filas (se usa la lista tal cual, sin copiarla)"""
+        self.beginResetModel()
+        self.rows = rows
+        self.endResetModel()
+    
+    def insert_row(self, row, values):
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.rows.insert(row, values)
+        self.endInsertRows()
+    
+    def remove_row(self, row):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.rows[row]
+        self.endRemoveRows()
+    
+    def set_value(self, row, key, value):
+        """Cambiar una celda desde el código (p. ej. al renumerar)"""
+        self.rows[row][key] = value
+        index = self.index(row, self.column_of(key))
+        self.dataChanged.emit(index, index, [Qt.DisplayRole, Qt.EditRole])
+    
+    def refresh(self):
+        """Avisar con una sola notificación de que cambiaron todas las celdas"""
+        if self.rowCount():
+            self.dataChanged.emit(self.index(0, 0), self.index(self.rowCount() - 1, self.columnCount() - 1))
+
+
+class AllPagesTableModel(DimensionTableModel):
+    """
+    Todas las características del documento. Las filas se exponen por hojas
+    completas a medida que la vista se desplaza (canFetchMore/fetchMore); las
+    celdas son las mismas filas de cada hoja, así que editar aquí edita la hoja.
+    """
+    
+    columns = (('pagina', 'Hoja', 45),) + DIMENSION_COLUMNS
+    read_only = frozenset({'pagina', 'unidad'})
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pages = []
+        # Primera fila de cada hoja ya cargada (offsets[-1] = filas cargadas)
+        self.offsets = [0]
+    
+    def set_pages(self, pages):
+        """Recibir la lista (hoja, filas) en orden de hoja sin cargar ninguna fila"""
+        self.beginResetModel()
+        self.pages = [(page_num, rows) for page_num, rows in pages if rows]
+        self.offsets = [0]
+        self.endResetModel()
+    
+    def locate(self, row):
+        """Índice de hoja en self.pages y fila dentro de esa hoja"""
+        page_index = bisect.bisect_right(self.offsets, row) - 1
+        return page_index, row - self.offsets[page_index]
+    
+    def row_at(self, row):
+        page_index, page_row = self.locate(row)
+        return self.pages[page_index][1][page_row]
+    
+    def page_of(self, row):
+        return self.pages[self.locate(row)[0]][0]
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.offsets[-1]
+    
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and len(self.offsets) <= len(self.pages)
+    
+    def fetchMore(self, parent=QModelIndex()):
+        start = end = self.offsets[-1]
+        new_offsets = []
+        next_page = len(self.offsets) - 1
+        while next_page < len(self.pages) and end - start < ALL_PAGES_FETCH_ROWS:
+            end += len(self.pages[next_page][1])
+            new_offsets.append(end)
+            next_page += 1
+        if not new_offsets:
+            return
+        self.beginInsertRows(QModelIndex(), start, end - 1)
+        self.offsets.extend(new_offsets)
+        self.endInsertRows()
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if (index.isValid() and role in (Qt.DisplayRole, Qt.EditRole)
+                and self.column_key(index.column()) == 'pagina'):
+            return str(self.page_of(index.row()) + 1)
+        return super().data(index, role)
+
+
+class InstrumentDelegate(QStyledItemDelegate):
+    """Combo de instrumentos creado solo mientras se edita la celda"""
+    
+    def createEditor(self, parent, option, index):
+        if index.model().column_key(index.column()) != 'instrumento':
+            return super().createEditor(parent, option, index)
+        editor = QComboBox(parent)
+        editor.addItems(INSTRUMENTS)
+        editor.activated.connect(lambda: self.commitData.emit(editor))
+        return editor
+    
+    def setEditorData(self, editor, index):
+        if isinstance(editor, QComboBox):
+            editor.setCurrentText(index.data(Qt.EditRole))
+        else:
+            super().setEditorData(editor, index)
+    
+    def setModelData(self, editor, model, index):
+        if isinstance(editor, QComboBox):
+            model.setData(index, editor.currentText())
+        else:
+            super().setModelData(editor, model, index)
+
+# === ESTILO Y RECURSOS COMPARTIDOS ===
+
+# Colores (r, g, b[, a]) de los elementos de la escena
+BALLOON_PEN_COLOR = (0, 120, 215)
+BALLOON_FILL_COLOR = (0, 120, 215, 100)
+BALLOON_TEXT_COLOR = (255, 255, 255)
+FOCUS_COLOR = (255, 140, 0)
+HIGHLIGHT_COLOR = (231, 76, 60)
+HIGHLIGHT_FILL_COLOR = (231, 76, 60, 60)
+CANDIDATE_COLOR = (230, 126, 34)
+CANDIDATE_FILL_COLOR = (230, 126, 34, 50)
+BALLOON_FONT_FAMILY = 'Arial'
+
+# Hoja de estilo única de la aplicación: se aplica una vez en QApplication en
+# lugar de llamar a setStyleSheet en cada widget (cada llamada vuelve a
+# analizar la hoja y a recalcular el estilo del widget y de sus hijos).
+# Los widgets con estilo propio se seleccionan por objectName.
+APP_STYLESHEET = """
+    QMainWindow {
+        background-color: #1e1e1e;
+    }
+    QLabel {
+        color: #ffffff;
+    }
+    QLabel[monospace="true"] {
+        font-family: monospace;
+    }
+    QCheckBox {
+        color: #ffffff;
+    }
+    QPushButton {
+        background-color: #0e639c;
+        color: white;
+        border: none;
+        padding: 8px 15px;
+        font-size: 12px;
+        border-radius: 4px;
+        font-weight: bold;
+    }
+    QPushButton:hover {
+        background-color: #1177bb;
+    }
+    QPushButton:pressed {
+        background-color: #0d5488;
+    }
+    QTableView {
+        background-color: #252526;
+        color: #ffffff;
+        gridline-color: #3e3e42;
+        border: 1px solid #3e3e42;
+    }
+    QTableView::item {
+        padding: 5px;
+    }
+    QTableView::item:selected {
+        background-color: #094771;
+    }
+    QHeaderView::section {
+        background-color: #2d2d30;
+        color: #ffffff;
+        padding: 5px;
+        border: 1px solid #3e3e42;
+        font-weight: bold;
+    }
+    QListWidget {
+        background-color: #252526;
+        color: #ffffff;
+        border: 1px solid #3e3e42;
+    }
+    QListWidget::item:selected {
+        background-color: #094771;
+    }
+    QLineEdit, QComboBox {
+        background-color: #3c3c3c;
+        color: #ffffff;
+        border: 1px solid #555;
+        padding: 5px;
+        border-radius: 3px;
+    }
+    QLineEdit:focus, QComboBox:focus {
+        border: 1px solid #0e639c;
+    }
+    QGroupBox {
+        color: #ffffff;
+        border: 2px solid #3e3e42;
+        border-radius: 5px;
+        margin-top: 10px;
+        font-weight: bold;
+    }
+    QGroupBox::title {
+        subcontrol-origin: margin;
+        left: 10px;
+        padding: 0 5px;
+    }
+    BalloonGraphicsView, BalloonGraphicsView QWidget {
+        background-color: #2b2b2b;
+        border: 2px solid #444;
+    }
+    ToleranceStatsDialog {
+        background-color: #1e1e1e;
+    }
+    QMessageBox {
+        background-color: #000000;
+    }
+    QMessageBox QLabel {
+        color: #ffffff;
+        font-size: 12px;
+    }
+    QMessageBox QPushButton {
+        min-width: 80px;
+    }
+    QTabBar#document_tabs::tab {
+        background: #2d2d30;
+        color: #aaa;
+        padding: 6px 14px;
+    }
+    QTabBar#document_tabs::tab:selected {
+        background: #0e639c;
+        color: #ffffff;
+    }
+    QLabel#lbl_file_info {
+        font-size: 13px;
+        color: #aaa;
+    }
+    QLabel#lbl_page_info {
+        font-size: 12px;
+        padding: 0 15px;
+    }
+    QLabel#lbl_view_title {
+        font-size: 16px;
+        font-weight: bold;
+        padding: 5px;
+    }
+    QLabel#lbl_table_title {
+        font-size: 14px;
+        font-weight: bold;
+        padding: 5px;
+    }
+    QLabel#lbl_balloon_count {
+        font-size: 28px;
+        font-weight: bold;
+        color: #4ec9b0;
+        padding: 5px 15px;
+        background-color: #2d2d30;
+        border-radius: 5px;
+    }
+    QPushButton#btn_load {
+        font-size: 14px;
+        padding: 10px 20px;
+    }
+    QPushButton#btn_compare_profiles {
+        padding: 4px 10px;
+    }
+    QPushButton#btn_export_pdf, QPushButton#btn_export_report, QPushButton#btn_export_image {
+        font-size: 16px;
+        padding: 12px 30px;
+    }
+    QPushButton#btn_export_pdf {
+        background-color: #2980b9;
+    }
+    QPushButton#btn_export_report {
+        background-color: #16a085;
+    }
+    QPushButton#btn_export_image {
+        background-color: #8e44ad;
+    }
+    QPushButton#btn_cancel_export {
+        background-color: #c0392b;
+    }
+"""
+
+
+@functools.lru_cache(maxsize=None)
+def shared_font(family, point_size, bold=False):
+    """Fuente compartida por todos los items que usan la misma combinación"""
+    return QFont(family, max(int(point_size), 1), QFont.Bold if bold else QFont.Normal)
+
+
+@functools.lru_cache(maxsize=None)
+def shared_pen(color, width=1, style=Qt.SolidLine):
+    """Pluma compartida (QPen es implícitamente compartido: copiarla no duplica datos)"""
+    return QPen(QColor(*color), width, style)
+
+
+@functools.lru_cache(maxsize=None)
+def shared_brush(color):
+    """Brocha compartida de un color (r, g, b[, a])"""
+    return QBrush(QColor(*color))
+
+# === RENDIMIENTO DE LA VISTA ===
+
+# Tiempo sin desplazar ni hacer zoom tras el cual se restaura la calidad alta (ms)
+INTERACTION_IDLE_MS = 150
+# Límite de QPixmapCache (KB): debe caber la caché de dispositivo del plano
+PIXMAP_CACHE_LIMIT_KB = 256 * 1024
+
 
 class BalloonGraphicsView(QGraphicsView):
     """Vista de gráficos personalizada para el baloneo"""
@@ -37,57 +792,154 @@ class BalloonGraphicsView(QGraphicsView):
         self.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
         self.setResizeAnchor(QGraphicsView.AnchorUnderMouse)
         
+        # Repintar solo las zonas afectadas y no guardar el estado del painter por item
+        self.setViewportUpdateMode(QGraphicsView.SmartViewportUpdate)
+        self.setOptimizationFlag(QGraphicsView.DontSavePainterState, True)
+        self.setCacheMode(QGraphicsView.CacheBackground)
+        if QPixmapCache.cacheLimit() < PIXMAP_CACHE_LIMIT_KB:
+            QPixmapCache.setCacheLimit(PIXMAP_CACHE_LIMIT_KB)
+        
+        # Calidad reducida mientras se desplaza o hace zoom; alta al quedar quieta
+        self.interacting = False
+        self.idle_timer = QTimer(self)
+        self.idle_timer.setSingleShot(True)
+        self.idle_timer.setInterval(INTERACTION_IDLE_MS)
+        self.idle_timer.timeout.connect(self.end_interaction)
+        
         # Configurar escena
         self.scene = QGraphicsScene()
         self.setScene(self.scene)
         
         # Variables de estado
         self.balloon_items = []  # Lista de (ellipse, text, data)
+        self.balloons_dirty = False  # Globos cambiados desde la última captura de la página
+        self.highlight_items = []  # Rectángulos de zonas cambiadas entre revisiones
+        self.focused_balloon = None  # Globo marcado por la búsqueda
+        self.candidate_items = []  # Globos propuestos por la detección automática
+        self.balloon_size = BALLOON_SIZE * RENDER_ZOOM  # Diámetro de los globos en la escena
         self.pixmap_item = None
         self.dragging_balloon = None
         self.drag_offset = None
         self.panning = False
         self.pan_start_pos = None
         self.zoom_factor = 1.0
-        
-        # Estilo
-        self.setStyleSheet("background-color: #2b2b2b; border: 2px solid #444;")
     
     def load_image(self, pixmap):
         """Cargar imagen en la escena"""
-        self.scene.clear()
-        self.balloon_items = []
-        self.zoom_factor = 1.0
+        self.clear_scene()
         
         if pixmap:
             self.pixmap_item = QGraphicsPixmapItem(pixmap)
+            self.pixmap_item.setTransformationMode(Qt.SmoothTransformation)
+            # Caché en coordenadas de dispositivo: al desplazar se reutiliza lo ya pintado
+            self.pixmap_item.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
             self.scene.addItem(self.pixmap_item)
-            # Expandir la escena para permitir espacio de navegación
-            rect = self.pixmap_item.boundingRect()
-            margin = max(rect.width(), rect.height()) * 0.6
-            self.scene.setSceneRect(
-                rect.x() - margin,
-                rect.y() - margin,
-                rect.width() + margin * 2,
-                rect.height() + margin * 2
-            )
-            self.fitInView(self.pixmap_item, Qt.KeepAspectRatio)
+            self.fit_scene_to_page()
+    
+    def load_vector_page(self, vector_page, page_width, page_height, transform):
+        """
+        Cargar una página en modo vectorial: un item de fondo con la
+        transformación PDF -> escena y, como hijos, los trazos y textos.
+        El índice de la escena descarta los hijos fuera de la vista.
+        """
+        self.clear_scene()
+        
+        page_item = QGraphicsRectItem(0, 0, page_width, page_height)
+        page_item.setPen(QPen(Qt.NoPen))
+        page_item.setBrush(QBrush(QColor(255, 255, 255)))
+        page_item.setTransform(transform)
+        
+        for image, rect in vector_page['images']:
+            image_item = QGraphicsPixmapItem(QPixmap.fromImage(image), page_item)
+            image_item.setTransformationMode(Qt.SmoothTransformation)
+            image_item.setPos(rect.topLeft())
+            image_item.setTransform(QTransform.fromScale(
+                rect.width() / max(image.width(), 1), rect.height() / max(image.height(), 1)
+            ))
+        
+        no_pen = QPen(Qt.NoPen)
+        no_brush = QBrush(Qt.NoBrush)
+        for path, pen, brush in vector_page['paths']:
+            path_item = QGraphicsPathItem(path, page_item)
+            path_item.setPen(pen or no_pen)
+            path_item.setBrush(brush or no_brush)
+        
+        for text, font, scale, x, y, angle, color in vector_page['texts']:
+            text_item = QGraphicsSimpleTextItem(text, page_item)
+            text_item.setFont(font)
+            text_item.setBrush(QBrush(color))
+            # El origen del span es la línea base: subir la altura del ascendente
+            ascent = QFontMetricsF(font).ascent()
+            text_item.setTransformOriginPoint(0, ascent)
+            text_item.setScale(scale)
+            text_item.setRotation(angle)
+            text_item.setPos(x, y - ascent)
+        
+        self.pixmap_item = page_item
+        self.scene.addItem(page_item)
+        self.fit_scene_to_page()
+    
+    def clear_scene(self):
+        """Vaciar la escena antes de cargar otra página"""
+        self.scene.clear()
+        self.pixmap_item = None
+        self.balloon_items = []
+        self.highlight_items = []
+        self.candidate_items = []
+        self.zoom_factor = 1.0
+    
+    def fit_scene_to_page(self):
+        """Expandir la escena alrededor de la página y ajustar la vista"""
+        # Expandir la escena para permitir espacio de navegación
+        rect = self.pixmap_item.sceneBoundingRect()
+        margin = max(rect.width(), rect.height()) * 0.6
+        self.scene.setSceneRect(
+            rect.x() - margin,
+            rect.y() - margin,
+            rect.width() + margin * 2,
+            rect.height() + margin * 2
+        )
+        self.fitInView(self.pixmap_item, Qt.KeepAspectRatio)
     
-    def add_balloon(self, x, y, number, size=35):
-        """Agregar globo en la posición especificada"""
+    def begin_interaction(self):
+        """Bajar la calidad de pintado mientras dura el desplazamiento o el zoom"""
+        if not self.interacting:
+            self.interacting = True
+            self.setRenderHint(QPainter.Antialiasing, False)
+            self.setRenderHint(QPainter.SmoothPixmapTransform, False)
+            if isinstance(self.pixmap_item, QGraphicsPixmapItem):
+                self.pixmap_item.setTransformationMode(Qt.FastTransformation)
+        self.idle_timer.start()
+    
+    def end_interaction(self):
+        """Restaurar la calidad alta cuando la vista queda quieta"""
+        if self.panning or self.dragging_balloon:
+            # Sigue la interacción: volver a comprobar más tarde
+            self.idle_timer.start()
+            return
+        if self.interacting:
+            self.interacting = False
+            self.setRenderHint(QPainter.Antialiasing, True)
+            self.setRenderHint(QPainter.SmoothPixmapTransform, True)
+            if isinstance(self.pixmap_item, QGraphicsPixmapItem):
+                self.pixmap_item.setTransformationMode(Qt.SmoothTransformation)
+            self.viewport().update()
+    
+    def add_balloon(self, x, y, number, size=None, index=None, sub=False):
+        """Agregar globo en la posición especificada (al final o en la posición index)"""
+        size = size or self.balloon_size
         # Crear círculo
         ellipse = QGraphicsEllipseItem(x - size/2, y - size/2, size, size)
-        ellipse.setPen(QPen(QColor(0, 120, 215), 2))
-        ellipse.setBrush(QBrush(QColor(0, 120, 215, 100)))
+        ellipse.setPen(shared_pen(BALLOON_PEN_COLOR, 2))
+        ellipse.setBrush(shared_brush(BALLOON_FILL_COLOR))
         
-        # Crear texto
-        text = QGraphicsTextItem(str(number))
-        text.setDefaultTextColor(QColor(255, 255, 255))
-        font = QFont('Arial', int(size * 0.4), QFont.Bold)
-        text.setFont(font)
+        # Crear texto (item simple: sin QTextDocument propio por globo)
+        text = QGraphicsSimpleTextItem(str(number))
+        text.setBrush(shared_brush(BALLOON_TEXT_COLOR))
+        text.setFont(shared_font(BALLOON_FONT_FAMILY, size * 0.4, True))
         
         # Hacer que el texto no intercepte eventos del mouse
-        text.setFlag(QGraphicsTextItem.ItemIsSelectable, False)
+        text.setAcceptedMouseButtons(Qt.NoButton)
         text.setAcceptHoverEvents(False)
         
         # Centrar texto en el círculo
@@ -96,6 +948,10 @@ class BalloonGraphicsView(QGraphicsView):
         text_y = y - text_rect.height() / 2
         text.setPos(text_x, text_y)
         
+        # Los globos siempre por encima del plano y del resaltado
+        ellipse.setZValue(1)
+        text.setZValue(1)
+        
         # Agregar a la escena
         self.scene.addItem(ellipse)
         self.scene.addItem(text)
@@ -108,12 +964,27 @@ class BalloonGraphicsView(QGraphicsView):
             'size': size,
             'ellipse': ellipse,
             'text': text,
+            'sub': sub,  # Globo intercalado (12A) que no desplaza la numeración
             'rotation': self.parent_app.current_rotation if hasattr(self.parent_app, 'current_rotation') else 0
         }
-        self.balloon_items.append(balloon_data)
+        if index is None:
+            self.balloon_items.append(balloon_data)
+        else:
+            self.balloon_items.insert(index, balloon_data)
+        self.balloons_dirty = True
         
         return balloon_data
     
+    def set_balloon_number(self, index, number):
+        """Cambiar la etiqueta de un globo existente manteniéndola centrada"""
+        balloon = self.balloon_items[index]
+        balloon['number'] = number
+        self.balloons_dirty = True
+        text = balloon['text']
+        text.setText(str(number))
+        text_rect = text.boundingRect()
+        text.setPos(balloon['x'] - text_rect.width() / 2, balloon['y'] - text_rect.height() / 2)
+    
     def remove_balloon(self, index):
         """Eliminar globo por índice"""
         if 0 <= index < len(self.balloon_items):
@@ -121,14 +992,62 @@ class BalloonGraphicsView(QGraphicsView):
             self.scene.removeItem(balloon['ellipse'])
             self.scene.removeItem(balloon['text'])
             self.balloon_items.pop(index)
+            self.balloons_dirty = True
     
     def clear_balloons(self):
         """Limpiar todos los globos"""
         for balloon in self.balloon_items:
             self.scene.removeItem(balloon['ellipse'])
             self.scene.removeItem(balloon['text'])
+        if self.balloon_items:
+            self.balloons_dirty = True
         self.balloon_items = []
     
+    def focus_balloon(self, index):
+        """Centrar la vista en un globo y marcarlo hasta que se enfoque otro"""
+        if self.focused_balloon is not None and self.focused_balloon.scene() is self.scene:
+            self.focused_balloon.setPen(shared_pen(BALLOON_PEN_COLOR, 2))
+        self.focused_balloon = None
+        if not 0 <= index < len(self.balloon_items):
+            return
+        ellipse = self.balloon_items[index]['ellipse']
+        ellipse.setPen(shared_pen(FOCUS_COLOR, 4))
+        self.focused_balloon = ellipse
+        self.centerOn(ellipse)
+    
+    def set_highlights(self, rects):
+        """Resaltar zonas (en coordenadas de escena) que cambiaron entre revisiones"""
+        for item in self.highlight_items:
+            self.scene.removeItem(item)
+        self.highlight_items = []
+        
+        for rect in rects:
+            item = QGraphicsRectItem(rect)
+            item.setPen(shared_pen(HIGHLIGHT_COLOR, 2))
+            item.setBrush(shared_brush(HIGHLIGHT_FILL_COLOR))
+            item.setZValue(0.5)  # Encima del plano, debajo de los globos
+            item.setAcceptedMouseButtons(Qt.NoButton)
+            self.scene.addItem(item)
+            self.highlight_items.append(item)
+    
+    def set_candidates(self, candidates, size=None):
+        """Mostrar globos candidatos: lista de (x, y, índice) en coordenadas de escena"""
+        size = size or self.balloon_size
+        for candidate in self.candidate_items:
+            self.scene.removeItem(candidate['ellipse'])
+        self.candidate_items = []
+        
+        pen = shared_pen(CANDIDATE_COLOR, 2, Qt.DashLine)
+        brush = shared_brush(CANDIDATE_FILL_COLOR)
+        for x, y, index in candidates:
+            ellipse = QGraphicsEllipseItem(x - size/2, y - size/2, size, size)
+            ellipse.setPen(pen)
+            ellipse.setBrush(brush)
+            ellipse.setZValue(0.8)
+            ellipse.setToolTip('Clic: aceptar | Clic derecho: rechazar')
+            self.scene.addItem(ellipse)
+            self.candidate_items.append({'ellipse': ellipse, 'index': index})
+    
     def mousePressEvent(self, event):
         """Manejar clic en la vista"""
         pos_scene = self.mapToScene(event.pos())
@@ -137,6 +1056,7 @@ class BalloonGraphicsView(QGraphicsView):
         if event.button() == Qt.LeftButton and QApplication.keyboardModifiers() == Qt.ShiftModifier:
             self.panning = True
             self.pan_start_pos = event.pos()
+            self.begin_interaction()
             self.setCursor(Qt.ClosedHandCursor)
             event.accept()
             return
@@ -153,10 +1073,21 @@ class BalloonGraphicsView(QGraphicsView):
                     event.accept()
                     return
         
+        # Clic sobre un candidato: izquierdo acepta, derecho rechaza
+        if event.button() in (Qt.LeftButton, Qt.RightButton):
+            for candidate in self.candidate_items:
+                if candidate['ellipse'].contains(pos_scene):
+                    if event.button() == Qt.LeftButton:
+                        self.parent_app.accept_candidate(candidate['index'])
+                    else:
+                        self.parent_app.reject_candidate(candidate['index'])
+                    event.accept()
+                    return
+        
         # Agregar globo con clic izquierdo normal
         if event.button() == Qt.LeftButton and self.pixmap_item:
             # Verificar que está dentro de la imagen
-            if self.pixmap_item.contains(pos_scene):
+            if self.pixmap_item.contains(self.pixmap_item.mapFromScene(pos_scene)):
                 # Notificar al padre
                 if hasattr(self.parent_app, 'on_image_click'):
                     self.parent_app.on_image_click(pos_scene.x(), pos_scene.y())
@@ -187,12 +1118,14 @@ class BalloonGraphicsView(QGraphicsView):
             # Actualizar coordenadas guardadas
             balloon['x'] = new_x
             balloon['y'] = new_y
+            self.balloons_dirty = True
             
             event.accept()
             return
         
         # Pan con Shift
         if self.panning and self.pan_start_pos:
+            self.begin_interaction()
             # Calcular el desplazamiento en la escena
             new_pos = self.mapToScene(event.pos())
             old_pos = self.mapToScene(self.pan_start_pos)
@@ -234,6 +1167,8 @@ class BalloonGraphicsView(QGraphicsView):
     
     def wheelEvent(self, event):
         """Zoom con rueda del mouse"""
+        self.begin_interaction()
+        
         # Factor de zoom
         zoom_in_factor = 1.15
         zoom_out_factor = 1 / zoom_in_factor
@@ -270,6 +1205,106 @@ class BalloonGraphicsView(QGraphicsView):
         self.translate(delta.x(), delta.y())
 
 
+class ToleranceStatsDialog(QDialog):
+    """Distribución de bandas de tolerancia y apilamiento de una cadena de globos"""
+    
+    def __init__(self, app, chain_text=''):
+        super().__init__(app)
+        self.app = app
+        self.setWindowTitle('Estadística de Tolerancias')
+        self.setMinimumWidth(460)
+        layout = QVBoxLayout(self)
+        
+        stats = app.tolerance_stats
+        unit = app.unidad_global
+        lines = [f'{len(stats)} características (banda = tol+ + tol-, en mm)']
+        for label, count in stats.distribution():
+            bar = '█' * round(30 * count / max(len(stats), 1))
+            lines.append(f'{label:>8}  {count:6d}  {bar}')
+        distribution = QLabel('\n'.join(lines))
+        distribution.setProperty('monospace', True)
+        layout.addWidget(distribution)
+        
+        form = QFormLayout()
+        self.txt_chain = QLineEdit(chain_text)
+        self.txt_chain.setPlaceholderText('1 +2 -5 3:4A   (signo, hoja:globo opcional)')
+        self.txt_chain.textChanged.connect(self.update_stackup)
+        form.addRow('Cadena:', self.txt_chain)
+        layout.addLayout(form)
+        
+        self.lbl_stackup = QLabel('')
+        self.lbl_stackup.setProperty('monospace', True)
+        layout.addWidget(self.lbl_stackup)
+        
+        buttons = QDialogButtonBox(QDialogButtonBox.Close)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+        
+        self.unit = unit
+        self.update_stackup()
+    
+    def update_stackup(self):
+        """Recalcular el apilamiento de la cadena escrita"""
+        try:
+            chain = self.app.resolve_stackup_chain(self.txt_chain.text())
+        except KeyError as e:
+            self.lbl_stackup.setText(f'Globo no encontrado: {e.args[0]}')
+            return
+        if not chain:
+            self.lbl_stackup.setText('Escriba los globos de la cadena')
+            return
+        
+        stats = self.app.tolerance_stats
+        lines = []
+        for (row, sign), term in zip(chain, self.txt_chain.text().split()):
+            lower, upper = stats.limits(row, self.unit)
+            lines.append(f'{"+" if sign > 0 else "-"} {term.lstrip("+-"):<8} {row["nombre"]:<10} '
+                         f'[{lower:.4f}, {upper:.4f}]')
+        result = stats.stackup(chain, self.unit)
+        lines.append('')
+        lines.append(f'Nominal:    {result["nominal"]:.4f} {self.unit}')
+        lines.append('Peor caso:  [{:.4f}, {:.4f}]'.format(*result['peor_caso']))
+        lines.append('RSS:        [{:.4f}, {:.4f}]'.format(*result['rss']))
+        self.lbl_stackup.setText('\n'.join(lines))
+
+
+class DocumentSession:
+    """Estado de un documento abierto en el espacio de trabajo (una pestaña)"""
+    
+    # Atributos de BaloneaSimpleApp que pertenecen a cada documento
+    STATE_ATTRS = (
+        'current_pdf_path', 'pdf_document', 'pdf_hash', 'current_page', 'total_pages',
+        'balloon_counter', 'current_rotation', 'original_pixmap', 'balloons_by_page',
+        'rotation_by_page', 'revision_changes_by_page', 'word_index_by_page',
+        'candidates_by_page', 'numbering', 'characteristic_index', 'tolerance_stats'
+    )
+    
+    def __init__(self):
+        self.state = self.default_state()
+    
+    @staticmethod
+    def default_state():
+        """Estado de un espacio de trabajo sin documento"""
+        return {
+            'current_pdf_path': None,
+            'pdf_document': None,
+            'pdf_hash': None,
+            'current_page': 0,
+            'total_pages': 0,
+            'balloon_counter': 0,
+            'current_rotation': 0,
+            'original_pixmap': None,
+            'balloons_by_page': {},
+            'rotation_by_page': {},
+            'revision_changes_by_page': {},
+            'word_index_by_page': {},
+            'candidates_by_page': {},
+            'numbering': BalloonNumbering(),
+            'characteristic_index': CharacteristicIndex(),
+            'tolerance_stats': ToleranceStats(),
+        }
+
+
 class BaloneaSimpleApp(QMainWindow):
     """Aplicación principal de baloneo simple"""
     
@@ -281,132 +1316,69 @@ class BaloneaSimpleApp(QMainWindow):
         self.pdf_document = None
         self.unidad_global = "mm"
         self.balloon_counter = 0
+        self.numbering = BalloonNumbering()  # Numeración de globos del documento
         self.current_rotation = 0  # Rotación actual en grados (0, 90, 180, 270)
+        self.render_zoom = RENDER_ZOOM  # Escala escena/PDF de la página mostrada
+        self.original_rotation = 0  # Rotación con la que se renderizó original_pixmap
         self.original_pixmap = None  # Pixmap original sin rotar
         self.balloons_by_page = {}  # Diccionario para almacenar globos por página
         self.rotation_by_page = {}  # Diccionario para almacenar rotación por página
-        
-        # Aplicar estilo para QMessageBox directamente
-        QApplication.instance().setStyleSheet("""
-            QMessageBox {
-                background-color: #000000;
-            }
-            QMessageBox QLabel {
-                color: #000000 !important;
-                font-size: 12px;
-            }
-            QMessageBox QPushButton {
-                background-color: #0e639c;
-                color: white;
-                border: none;
-                padding: 8px 20px;
-                border-radius: 4px;
-                font-weight: bold;
-                min-width: 80px;
-            }
-            QMessageBox QPushButton:hover {
-                background-color: #1177bb;
-            }
-        """)
-        
+        self.revision_changes_by_page = {}  # Zonas cambiadas respecto a la revisión anterior
+        self.diff_worker = None  # Hilo de comparación de revisiones en curso
+        self.word_index_by_page = {}  # Índice de la capa de texto por página (se construye al usarlo)
+        self.candidates_by_page = {}  # Globos propuestos por la detección automática
+        self.characteristic_index = CharacteristicIndex()  # Búsqueda en todas las hojas
+        self.tolerance_stats = ToleranceStats()  # Límites, bandas y apilamientos
+        self.candidate_worker = None  # Hilo de detección de candidatos en curso
+        self.export_worker = None  # Hilo de exportación en curso (uno a la vez)
+        self.export_title = ''  # Qué se está exportando (para los mensajes)
+        self.pdf_hash = None  # Hash del contenido del PDF (clave de las cachés)
+        self.memory_cache = MemoryRenderCache()  # Renders en memoria compartidos por todos los documentos
+        self.render_cache = RenderCache(CACHE_DIR / 'render')  # Renders persistentes en disco
+        self.cache_writer = ThreadPoolExecutor(max_workers=1)  # Escrituras a disco fuera de la interfaz
+        self.vector_mode = False  # Mostrar trazos vectoriales en lugar del render
+        self.scan_mode = False  # Enderezar y binarizar los planos escaneados
+        self.deskew_angle = 0.0  # Giro de enderezado del render mostrado (grados)
+        self.sessions = []  # Documentos abiertos (una pestaña por documento)
+        self.active_session = None  # Documento mostrado actualmente
+        self.diff_session = None  # Documento sobre el que corre la comparación de revisiones
+        self.candidate_session = None  # Documento sobre el que corre la detección de candidatos
+        self.thumbnail_loader = ThumbnailLoader(self)
+        self.thumbnail_loader.thumbnail_ready.connect(self.on_thumbnail_ready)
+        self.scan_preprocessor = ScanPreprocessor(self.render_cache, self)
+        self.scan_preprocessor.scan_ready.connect(self.on_scan_ready)
+        self.search_timer = QTimer(self)  # Agrupa las ediciones antes de repetir la búsqueda
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(50)
+        self.search_timer.timeout.connect(self.run_search)
+        
+        # Hoja de estilo única para toda la aplicación (ver APP_STYLESHEET)
+        QApplication.instance().setStyleSheet(APP_STYLESHEET)
+        
+        self.dimensions_panel_built = False
         self.init_ui()
+        QTimer.singleShot(0, self.ensure_dimensions_panel)
+    
+    def closeEvent(self, event):
+        """Detener los hilos en segundo plano antes de cerrar"""
+        for worker in (self.diff_worker, self.candidate_worker, self.export_worker):
+            if worker is not None:
+                worker.requestInterruption()
+                worker.wait()
+        self.thumbnail_loader.shutdown()
+        self.scan_preprocessor.shutdown()
+        self.cache_writer.shutdown(wait=True)
+        shutdown_shared_render_pool()
+        super().closeEvent(event)
     
     def parse_fraction_or_decimal(self, value_str):
-        """
-        Convertir string a decimal, aceptando fracciones (1/2, 3/4, etc.) o decimales (0.5, 1.25)
-        Retorna el valor como float
-        """
-        if not value_str or value_str.strip() == '':
-            return 0.0
-        
-        value_str = value_str.strip()
-        
-        try:
-            # Intentar como fracción primero (puede tener números mixtos como "1 1/2")
-            if '/' in value_str:
-                # Manejar números mixtos (ej: "1 1/2" = 1.5)
-                if ' ' in value_str:
-                    parts = value_str.split()
-                    whole = float(parts[0])
-                    frac = Fraction(parts[1])
-                    return whole + float(frac)
-                else:
-                    # Fracción simple (ej: "1/2" = 0.5)
-                    return float(Fraction(value_str))
-            else:
-                # Número decimal normal
-                return float(value_str)
-        except (ValueError, ZeroDivisionError):
-            return 0.0
+        """Convertir string a decimal (ver parse_fraction_or_decimal del módulo)"""
+        return parse_fraction_or_decimal(value_str)
         
     def init_ui(self):
         """Inicializar interfaz de usuario"""
         self.setWindowTitle('BALONEO SIMPLE')
         self.setGeometry(100, 100, 1600, 900)
-        self.setStyleSheet("""
-            QMainWindow {
-                background-color: #1e1e1e;
-            }
-            QLabel {
-                color: #ffffff;
-            }
-            QPushButton {
-                background-color: #0e639c;
-                color: white;
-                border: none;
-                padding: 8px 15px;
-                font-size: 12px;
-                border-radius: 4px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #1177bb;
-            }
-            QPushButton:pressed {
-                background-color: #0d5488;
-            }
-            QTableWidget {
-                background-color: #252526;
-                color: #ffffff;
-                gridline-color: #3e3e42;
-                border: 1px solid #3e3e42;
-            }
-            QTableWidget::item {
-                padding: 5px;
-            }
-            QTableWidget::item:selected {
-                background-color: #094771;
-            }
-            QHeaderView::section {
-                background-color: #2d2d30;
-                color: #ffffff;
-                padding: 5px;
-                border: 1px solid #3e3e42;
-                font-weight: bold;
-            }
-            QLineEdit, QComboBox {
-                background-color: #3c3c3c;
-                color: #ffffff;
-                border: 1px solid #555;
-                padding: 5px;
-                border-radius: 3px;
-            }
-            QLineEdit:focus, QComboBox:focus {
-                border: 1px solid #0e639c;
-            }
-            QGroupBox {
-                color: #ffffff;
-                border: 2px solid #3e3e42;
-                border-radius: 5px;
-                margin-top: 10px;
-                font-weight: bold;
-            }
-            QGroupBox::title {
-                subcontrol-origin: margin;
-                left: 10px;
-                padding: 0 5px;
-            }
-        """)
         
         # Widget central
         central_widget = QWidget()
@@ -420,16 +1392,22 @@ class BaloneaSimpleApp(QMainWindow):
         # === CONTENIDO PRINCIPAL (Splitter) ===
         splitter = QSplitter(Qt.Horizontal)
         
+        # Panel de miniaturas de página
+        thumbnails_panel = self.create_thumbnails_panel()
+        splitter.addWidget(thumbnails_panel)
+        
         # Panel izquierdo: Imagen con baloneo
         left_panel = self.create_image_panel()
         splitter.addWidget(left_panel)
         
-        # Panel derecho: Tabla de dimensiones
-        right_panel = self.create_dimensions_panel()
-        splitter.addWidget(right_panel)
+        # Panel derecho: Tabla de dimensiones (contenedor vacío, se llena al
+        # arrancar el bucle de eventos: ver ensure_dimensions_panel)
+        self.dimensions_panel = QWidget()
+        QVBoxLayout(self.dimensions_panel)
+        splitter.addWidget(self.dimensions_panel)
         
-        # Configurar tamaños del splitter (70% imagen, 30% tabla)
-        splitter.setSizes([1120, 480])
+        # Configurar tamaños del splitter (miniaturas, 70% imagen, 30% tabla)
+        splitter.setSizes([170, 1000, 430])
         main_layout.addWidget(splitter)
         
         # === BARRA INFERIOR ===
@@ -443,12 +1421,12 @@ class BaloneaSimpleApp(QMainWindow):
         # Botón cargar PDF
         btn_load = QPushButton('CARGAR PDF')
         btn_load.clicked.connect(self.load_pdf)
-        btn_load.setStyleSheet("font-size: 14px; padding: 10px 20px;")
+        btn_load.setObjectName('btn_load')
         layout.addWidget(btn_load)
         
         # Info del archivo
         self.lbl_file_info = QLabel('No hay archivo cargado')
-        self.lbl_file_info.setStyleSheet("font-size: 13px; color: #aaa;")
+        self.lbl_file_info.setObjectName('lbl_file_info')
         layout.addWidget(self.lbl_file_info)
         
         layout.addStretch()
@@ -460,7 +1438,7 @@ class BaloneaSimpleApp(QMainWindow):
         layout.addWidget(self.btn_prev_page)
         
         self.lbl_page_info = QLabel('Página: 0/0')
-        self.lbl_page_info.setStyleSheet("font-size: 12px; padding: 0 15px;")
+        self.lbl_page_info.setObjectName('lbl_page_info')
         layout.addWidget(self.lbl_page_info)
         
         self.btn_next_page = QPushButton('Siguiente ▶')
@@ -468,8 +1446,37 @@ class BaloneaSimpleApp(QMainWindow):
         self.btn_next_page.setEnabled(False)
         layout.addWidget(self.btn_next_page)
         
+        # Comparar con una nueva revisión del plano
+        self.btn_compare_revision = QPushButton('NUEVA REVISIÓN')
+        self.btn_compare_revision.setToolTip('Abrir una nueva revisión del plano conservando los globos de las zonas sin cambios')
+        self.btn_compare_revision.clicked.connect(self.compare_revision)
+        self.btn_compare_revision.setEnabled(False)
+        layout.addWidget(self.btn_compare_revision)
+        
+        # Detección automática de candidatos en todas las páginas
+        self.btn_detect_candidates = QPushButton('DETECTAR CANDIDATOS')
+        self.btn_detect_candidates.setToolTip('Proponer globos sobre cotas, tolerancias y símbolos GD&T')
+        self.btn_detect_candidates.clicked.connect(self.detect_candidates)
+        self.btn_detect_candidates.setEnabled(False)
+        layout.addWidget(self.btn_detect_candidates)
+        
         return layout
     
+    def create_thumbnails_panel(self):
+        """Crear barra lateral de miniaturas de página"""
+        self.thumbnail_list = QListWidget()
+        self.thumbnail_list.setViewMode(QListView.ListMode)
+        self.thumbnail_list.setFlow(QListView.TopToBottom)
+        self.thumbnail_list.setIconSize(QSize(THUMBNAIL_WIDTH, int(THUMBNAIL_WIDTH * 1.5)))
+        self.thumbnail_list.setUniformItemSizes(True)
+        self.thumbnail_list.setMinimumWidth(THUMBNAIL_WIDTH + 30)
+        self.thumbnail_list.itemClicked.connect(
+            lambda item: self.go_to_page(self.thumbnail_list.row(item))
+        )
+        # Renderizar solo las miniaturas visibles
+        self.thumbnail_list.verticalScrollBar().valueChanged.connect(self.request_visible_thumbnails)
+        return self.thumbnail_list
+    
     def create_image_panel(self):
         """Crear panel de visualización de imagen"""
         panel = QWidget()
@@ -477,10 +1484,20 @@ class BaloneaSimpleApp(QMainWindow):
         
         # Título
         title = QLabel('PLANO TÉCNICO - Clic: Agregar globo | Shift+Clic: Mover vista | Ctrl+Arrastrar: Mover globo')
-        title.setStyleSheet("font-size: 16px; font-weight: bold; padding: 5px;")
+        title.setObjectName('lbl_view_title')
         title.setAlignment(Qt.AlignCenter)
         layout.addWidget(title)
         
+        # Pestañas de documentos abiertos
+        self.document_tabs = QTabBar()
+        self.document_tabs.setTabsClosable(True)
+        self.document_tabs.setExpanding(False)
+        self.document_tabs.setDocumentMode(True)
+        self.document_tabs.setObjectName('document_tabs')
+        self.document_tabs.currentChanged.connect(self.switch_document)
+        self.document_tabs.tabCloseRequested.connect(self.close_document)
+        layout.addWidget(self.document_tabs)
+        
         # Vista de gráficos para baloneo
         self.graphics_view = BalloonGraphicsView(self)
         layout.addWidget(self.graphics_view)
@@ -504,14 +1521,45 @@ class BaloneaSimpleApp(QMainWindow):
         btn_zoom_fit.clicked.connect(self.zoom_fit)
         action_layout.addWidget(btn_zoom_fit)
         
+        self.btn_vector_mode = QPushButton('Modo Vectorial')
+        self.btn_vector_mode.setCheckable(True)
+        self.btn_vector_mode.setToolTip('Dibujar los trazos del PDF en lugar de la imagen renderizada (nítido con cualquier zoom)')
+        self.btn_vector_mode.toggled.connect(self.toggle_vector_mode)
+        action_layout.addWidget(self.btn_vector_mode)
+        
+        self.btn_scan_mode = QPushButton('Escaneado')
+        self.btn_scan_mode.setCheckable(True)
+        self.btn_scan_mode.setToolTip('Enderezar, contrastar y binarizar planos escaneados (se procesa en segundo plano)')
+        self.btn_scan_mode.toggled.connect(self.toggle_scan_mode)
+        action_layout.addWidget(self.btn_scan_mode)
+        
+        btn_accept_candidates = QPushButton('Aceptar Candidatos')
+        btn_accept_candidates.clicked.connect(self.accept_all_candidates)
+        action_layout.addWidget(btn_accept_candidates)
+        
+        btn_reject_candidates = QPushButton('Rechazar Candidatos')
+        btn_reject_candidates.clicked.connect(self.reject_all_candidates)
+        action_layout.addWidget(btn_reject_candidates)
+        
         layout.addLayout(action_layout)
         
         return panel
     
+    def ensure_dimensions_panel(self):
+        """
+        Construir el panel de dimensiones si aún no existe. La ventana se muestra
+        antes sin él; se construye en la primera vuelta del bucle de eventos o
+        antes si lo necesita un punto de entrada (abrir documento, exportar).
+        """
+        if self.dimensions_panel_built:
+            return
+        self.dimensions_panel_built = True
+        self.create_dimensions_panel()
+    
     def create_dimensions_panel(self):
-        """Crear panel de tabla de dimensiones"""
-        panel = QWidget()
-        layout = QVBoxLayout(panel)
+        """Crear panel de tabla de dimensiones dentro de su contenedor del splitter"""
+        panel = self.dimensions_panel
+        layout = panel.layout()
         
         # === Configuración Global ===
         config_group = QGroupBox('CONFIGURACIÓN GLOBAL')
@@ -521,68 +1569,116 @@ class BaloneaSimpleApp(QMainWindow):
         self.cmb_unidad = QComboBox()
         self.cmb_unidad.addItems(['mm', 'in'])
         self.cmb_unidad.currentTextChanged.connect(self.update_global_unit)
-        self.cmb_unidad.setStyleSheet("background-color: #3c3c3c; color: #ffffff;")
         config_layout.addRow('Unidad:', self.cmb_unidad)
         
+        # Ajustar globos a las cotas de la capa de texto
+        self.chk_snap = QCheckBox('Ajustar globo a la cota más cercana')
+        self.chk_snap.setChecked(True)
+        config_layout.addRow('Cotas:', self.chk_snap)
+        
+        # Política de numeración de globos
+        self.cmb_numbering = QComboBox()
+        self.cmb_numbering.addItem('Continua en el documento', NUMBERING_DOCUMENT)
+        self.cmb_numbering.addItem('Reiniciar en cada página', NUMBERING_PAGE)
+        self.cmb_numbering.currentIndexChanged.connect(self.update_numbering_policy)
+        config_layout.addRow('Numeración:', self.cmb_numbering)
+        
+        # Intercalar globos (12A, 12B) después de la fila seleccionada
+        self.chk_insert_between = QCheckBox('Intercalar tras la fila seleccionada')
+        config_layout.addRow('Insertar:', self.chk_insert_between)
+        
+        # Exportar globos como anotaciones editables y recuperables
+        self.chk_annotations = QCheckBox('Globos como anotaciones editables')
+        config_layout.addRow('Exportar:', self.chk_annotations)
+        
+        # Perfil de exportación PDF (velocidad o tamaño) y comparación entre perfiles
+        profile_layout = QHBoxLayout()
+        self.cmb_export_profile = QComboBox()
+        for key, profile in EXPORT_PROFILES.items():
+            self.cmb_export_profile.addItem(profile['titulo'], key)
+        self.cmb_export_profile.setCurrentIndex(self.cmb_export_profile.findData(DEFAULT_EXPORT_PROFILE))
+        profile_layout.addWidget(self.cmb_export_profile, 1)
+        btn_compare_profiles = QPushButton('Comparar')
+        btn_compare_profiles.setObjectName('btn_compare_profiles')
+        btn_compare_profiles.clicked.connect(self.compare_export_profiles)
+        profile_layout.addWidget(btn_compare_profiles)
+        config_layout.addRow('Perfil PDF:', profile_layout)
+        
         config_group.setLayout(config_layout)
         layout.addWidget(config_group)
         
+        # === Búsqueda en todas las hojas ===
+        search_group = QGroupBox('BUSCAR CARACTERÍSTICAS')
+        search_layout = QVBoxLayout()
+        self.txt_search = QLineEdit()
+        self.txt_search.setPlaceholderText('Ø cmm   instrumento:cmm   notas:crítica   10..20')
+        self.txt_search.setClearButtonEnabled(True)
+        self.txt_search.textChanged.connect(self.run_search)
+        search_layout.addWidget(self.txt_search)
+        self.lbl_search_info = QLabel('')
+        search_layout.addWidget(self.lbl_search_info)
+        self.search_results = QListWidget()
+        self.search_results.setUniformItemSizes(True)
+        self.search_results.setMaximumHeight(140)
+        self.search_results.itemClicked.connect(self.jump_to_search_result)
+        search_layout.addWidget(self.search_results)
+        search_group.setLayout(search_layout)
+        layout.addWidget(search_group)
+        
         # === Contador de Baloneo ===
         counter_layout = QHBoxLayout()
         counter_layout.addWidget(QLabel('Globos:'))
         self.lbl_balloon_count = QLabel('0')
-        self.lbl_balloon_count.setStyleSheet("""
-            font-size: 28px; 
-            font-weight: bold; 
-            color: #4ec9b0;
-            padding: 5px 15px;
-            background-color: #2d2d30;
-            border-radius: 5px;
-        """)
+        self.lbl_balloon_count.setObjectName('lbl_balloon_count')
         counter_layout.addWidget(self.lbl_balloon_count)
         counter_layout.addStretch()
         layout.addLayout(counter_layout)
         
         # === Tabla de Dimensiones ===
+        table_header = QHBoxLayout()
         table_label = QLabel('TABLA DE DIMENSIONES')
-        table_label.setStyleSheet("font-size: 14px; font-weight: bold; padding: 5px;")
-        layout.addWidget(table_label)
-        
-        self.table = QTableWidget()
-        self.table.setColumnCount(7)
-        self.table.setHorizontalHeaderLabels([
-            'Nombre', 'Nominal', 'Tol +', 'Tol -', 'Instrumento', 'Unidad', 'Notas'
-        ])
-        
-        # Configurar tamaño de columnas
-        header = self.table.horizontalHeader()
-        header.setSectionResizeMode(0, QHeaderView.Fixed)        # Nombre
-        header.setSectionResizeMode(1, QHeaderView.Interactive)  # Nominal
-        header.setSectionResizeMode(2, QHeaderView.Interactive)  # Tol +
-        header.setSectionResizeMode(3, QHeaderView.Interactive)  # Tol -
-        header.setSectionResizeMode(4, QHeaderView.Interactive)  # Instrumento
-        header.setSectionResizeMode(5, QHeaderView.Fixed)        # Unidad
-        header.setSectionResizeMode(6, QHeaderView.Stretch)      # Notas
-        
-        self.table.setColumnWidth(0, 60)   # Nombre
-        self.table.setColumnWidth(1, 80)   # Nominal
-        self.table.setColumnWidth(2, 60)   # Tol +
-        self.table.setColumnWidth(3, 60)   # Tol -
-        self.table.setColumnWidth(4, 100)  # Instrumento
-        self.table.setColumnWidth(5, 60)   # Unidad
+        table_label.setObjectName('lbl_table_title')
+        table_header.addWidget(table_label)
+        table_header.addStretch()
+        
+        # Hoja actual o todas las características del documento
+        self.cmb_table_scope = QComboBox()
+        self.cmb_table_scope.addItems(['Hoja actual', 'Todas las hojas'])
+        self.cmb_table_scope.currentIndexChanged.connect(self.set_table_scope)
+        table_header.addWidget(self.cmb_table_scope)
+        layout.addLayout(table_header)
+        
+        # Vista virtual: solo se crean las filas visibles y el editor de la celda en edición
+        self.table_model = DimensionTableModel(self)
+        self.all_pages_model = AllPagesTableModel(self)
+        # El índice de búsqueda sigue cada cambio de la tabla
+        self.table_model.modelReset.connect(self.on_table_reset)
+        self.table_model.rowsInserted.connect(self.on_table_rows_inserted)
+        self.table_model.rowsAboutToBeRemoved.connect(self.on_table_rows_removed)
+        self.table_model.dataChanged.connect(self.on_table_data_changed)
+        self.all_pages_model.dataChanged.connect(self.on_table_data_changed)
+        self.table = QTableView()
+        self.table.setItemDelegate(InstrumentDelegate(self.table))
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.table.verticalHeader().setDefaultSectionSize(TABLE_ROW_HEIGHT)
+        self.set_table_model(self.table_model)
         
         layout.addWidget(self.table)
         
         # Botones de tabla
         table_buttons = QHBoxLayout()
         
-        btn_delete_row = QPushButton('Eliminar Fila Seleccionada')
-        btn_delete_row.clicked.connect(self.delete_dimension_row)
-        table_buttons.addWidget(btn_delete_row)
+        self.btn_delete_row = QPushButton('Eliminar Fila Seleccionada')
+        self.btn_delete_row.clicked.connect(self.delete_dimension_row)
+        table_buttons.addWidget(self.btn_delete_row)
         
-        btn_clear_table = QPushButton('Limpiar Tabla')
-        btn_clear_table.clicked.connect(self.clear_table)
-        table_buttons.addWidget(btn_clear_table)
+        self.btn_clear_table = QPushButton('Limpiar Tabla')
+        self.btn_clear_table.clicked.connect(self.clear_table)
+        table_buttons.addWidget(self.btn_clear_table)
+        
+        btn_tolerances = QPushButton('Tolerancias')
+        btn_tolerances.clicked.connect(self.show_tolerance_stats)
+        table_buttons.addWidget(btn_tolerances)
         
         layout.addLayout(table_buttons)
         
@@ -596,86 +1692,206 @@ class BaloneaSimpleApp(QMainWindow):
         
         # Botón exportar PDF con globos
         btn_export_pdf = QPushButton('EXPORTAR PDF CON GLOBOS')
-        btn_export_pdf.setStyleSheet("""
-            font-size: 16px; 
-            padding: 12px 30px;
-            background-color: #2980b9;
-        """)
+        btn_export_pdf.setObjectName('btn_export_pdf')
         btn_export_pdf.clicked.connect(self.export_pdf_with_balloons)
         layout.addWidget(btn_export_pdf)
-
+        
+        # Botón reporte de inspección (todas las hojas)
+        btn_export_report = QPushButton('REPORTE DE INSPECCIÓN')
+        btn_export_report.setObjectName('btn_export_report')
+        btn_export_report.clicked.connect(self.export_inspection_report)
+        layout.addWidget(btn_export_report)
+        
+        # Botón exportar hojas como imagen
+        btn_export_image = QPushButton('EXPORTAR IMAGEN')
+        btn_export_image.setObjectName('btn_export_image')
+        btn_export_image.clicked.connect(self.export_images)
+        layout.addWidget(btn_export_image)
+        
         layout.addStretch()
         
+        # Progreso y cancelación de la exportación en segundo plano
+        self.lbl_export_status = QLabel('')
+        self.lbl_export_status.hide()
+        layout.addWidget(self.lbl_export_status)
+        self.btn_cancel_export = QPushButton('CANCELAR')
+        self.btn_cancel_export.setObjectName('btn_cancel_export')
+        self.btn_cancel_export.clicked.connect(self.cancel_export)
+        self.btn_cancel_export.hide()
+        layout.addWidget(self.btn_cancel_export)
+        
         return layout
     
     # === FUNCIONES DE CARGA DE PDF ===
     
     def load_pdf(self):
         """Cargar archivo PDF"""
+        self.ensure_dimensions_panel()
         
         file_path, _ = QFileDialog.getOpenFileName(
             self, 'Seleccionar PDF', '', 'PDF Files (*.pdf);;All Files (*.*)'
         )
         
         if file_path:
+            # Si ya está abierto, cambiar a su pestaña
+            for index, session in enumerate(self.sessions):
+                if session is not self.active_session and session.state['current_pdf_path'] == file_path:
+                    self.document_tabs.setCurrentIndex(index)
+                    return
+                if session is self.active_session and self.current_pdf_path == file_path:
+                    return
+            
             try:
-                self.pdf_document = fitz.open(file_path)
-                self.current_pdf_path = file_path
-                self.total_pages = len(self.pdf_document)
-                self.current_page = 0
-                
-                # Resetear rotación al cargar nuevo PDF
-                self.current_rotation = 0
-                self.original_pixmap = None
-                
-                # Actualizar info
-                file_name = Path(file_path).name
-                self.lbl_file_info.setText(f'{file_name}')
-                
-                # Habilitar navegación
-                self.btn_next_page.setEnabled(self.total_pages > 1)
-                self.btn_prev_page.setEnabled(False)
-                
-                # Mostrar primera página
-                self.show_current_page()
-                
+                pdf_document = fitz.open(file_path)
+                pdf_hash = file_digest(file_path)
+                # PDF exportado con globos como anotaciones: recuperar globos y tabla
+                balloons_by_page = read_balloon_annotations(pdf_document, strip=True)
             except Exception as e:
                 QMessageBox.critical(self, 'Error', f'Error al cargar PDF:\n{e}')
+                return
+            
+            # Guardar el documento actual y abrir el nuevo en su propia pestaña
+            self.stash_active_session()
+            
+            session = DocumentSession()
+            session.state.update({
+                'current_pdf_path': file_path,
+                'pdf_document': pdf_document,
+                'pdf_hash': pdf_hash,
+                'total_pages': len(pdf_document),
+                'numbering': BalloonNumbering(len(pdf_document), self.cmb_numbering.currentData()),
+                'balloons_by_page': balloons_by_page,
+            })
+            session.state['numbering'].rebuild(balloons_by_page, len(pdf_document))
+            session.state['characteristic_index'].rebuild(balloons_by_page)
+            session.state['tolerance_stats'].rebuild(balloons_by_page)
+            self.sessions.append(session)
+            
+            self.document_tabs.blockSignals(True)
+            index = self.document_tabs.addTab(Path(file_path).name)
+            self.document_tabs.setTabToolTip(index, file_path)
+            self.document_tabs.setCurrentIndex(index)
+            self.document_tabs.blockSignals(False)
+            
+            self.activate_session(session)
+            
+            if balloons_by_page:
+                total = sum(len(page_data['balloons']) for page_data in balloons_by_page.values())
+                QMessageBox.information(self, 'Globos Recuperados',
+                                      f'{total} globos recuperados de las anotaciones del PDF '
+                                      f'en {len(balloons_by_page)} páginas')
     
-    def show_current_page(self):
-        """Mostrar página actual del PDF"""
-        if not self.pdf_document:
+    # === ESPACIO DE TRABAJO (VARIOS DOCUMENTOS) ===
+    
+    def stash_active_session(self):
+        """Guardar el estado del documento activo en su sesión"""
+        if self.active_session is None:
             return
+        if self.pdf_document:
+            self.save_balloons_for_current_page()
+        for attr in DocumentSession.STATE_ATTRS:
+            self.active_session.state[attr] = getattr(self, attr)
+    
+    def activate_session(self, session):
+        """Mostrar un documento: su estado pasa a ser el estado activo de la aplicación"""
+        self.ensure_dimensions_panel()
+        self.active_session = session
+        state = session.state if session is not None else DocumentSession.default_state()
+        for attr in DocumentSession.STATE_ATTRS:
+            setattr(self, attr, state[attr])
+        
+        has_document = self.pdf_document is not None
+        self.lbl_file_info.setText(
+            Path(self.current_pdf_path).name if has_document else 'No hay archivo cargado'
+        )
+        self.btn_compare_revision.setEnabled(has_document and self.diff_worker is None)
+        self.btn_detect_candidates.setEnabled(has_document and self.candidate_worker is None)
         
-        try:
-            # Obtener página
-            page = self.pdf_document[self.current_page]
-            
-            # Renderizar a imagen con alta resolución
-            zoom = 2.0  # Factor de zoom para mejor calidad
-            mat = fitz.Matrix(zoom, zoom)
-            pix = page.get_pixmap(matrix=mat)
-            
-            # Convertir a QImage
-            img_data = pix.samples
-            img = QImage(img_data, pix.width, pix.height, pix.stride, QImage.Format_RGB888)
-            
-            # Convertir a QPixmap y cargar en vista
-            pixmap = QPixmap.fromImage(img)
-            self.graphics_view.load_image(pixmap)
+        self.cmb_numbering.blockSignals(True)
+        self.cmb_numbering.setCurrentIndex(self.cmb_numbering.findData(self.numbering.policy))
+        self.cmb_numbering.blockSignals(False)
+        
+        if has_document:
+            self.show_current_page()
+            self.reset_thumbnails()
+        else:
+            self.graphics_view.clear_scene()
+            self.table_model.set_rows([])
+            self.thumbnail_list.clear()
+            self.thumbnail_loader.set_document(None, None)
+            self.lbl_page_info.setText('Página: 0/0')
+            self.btn_prev_page.setEnabled(False)
+            self.btn_next_page.setEnabled(False)
+            self.update_balloon_counter()
+    
+    def session_state(self, session, attr):
+        """Leer un atributo de una sesión, esté activa o no"""
+        if session is self.active_session:
+            return getattr(self, attr)
+        return session.state[attr]
+    
+    def switch_document(self, index):
+        """Cambiar a la pestaña seleccionada"""
+        if not 0 <= index < len(self.sessions) or self.sessions[index] is self.active_session:
+            return
+        self.stash_active_session()
+        self.activate_session(self.sessions[index])
+    
+    def close_document(self, index):
+        """Cerrar el documento de una pestaña"""
+        if not 0 <= index < len(self.sessions):
+            return
+        session = self.sessions[index]
+        if session in (self.diff_session, self.candidate_session):
+            QMessageBox.warning(self, 'Documento Ocupado',
+                              'Espere a que termine el proceso en segundo plano de este documento.')
+            return
+        
+        reply = QMessageBox.question(
+            self, '¿Cerrar Documento?',
+            f'¿Cerrar {self.document_tabs.tabText(index)}?\n'
+            'Los globos no exportados se perderán.',
+            QMessageBox.Yes | QMessageBox.No
+        )
+        if reply != QMessageBox.Yes:
+            return
+        
+        pdf_document = self.session_state(session, 'pdf_document')
+        if pdf_document:
+            pdf_document.close()
+        
+        was_active = session is self.active_session
+        self.sessions.pop(index)
+        self.document_tabs.blockSignals(True)
+        self.document_tabs.removeTab(index)
+        self.document_tabs.blockSignals(False)
+        
+        if was_active:
+            self.active_session = None
+            next_session = self.sessions[min(index, len(self.sessions) - 1)] if self.sessions else None
+            if next_session is not None:
+                self.document_tabs.setCurrentIndex(self.sessions.index(next_session))
+            self.activate_session(next_session)
+    
+    def show_current_page(self):
+        """Mostrar página actual del PDF"""
+        if not self.pdf_document:
+            return
+        
+        try:
+            # Obtener página
+            page = self.pdf_document[self.current_page]
             
-            # Restaurar rotación de esta página (si existe)
-            self.current_rotation = self.rotation_by_page.get(self.current_page, 0)
-            self.original_pixmap = None
+            if self.vector_mode:
+                self.show_current_page_vector(page)
+            else:
+                self.show_current_page_raster(page)
+            
+            # Resaltar zonas cambiadas respecto a la revisión anterior
+            self.update_revision_highlights()
             
-            # Si hay rotación guardada, aplicarla
-            if self.current_rotation != 0:
-                self.original_pixmap = pixmap
-                transform = QTransform()
-                transform.rotate(self.current_rotation)
-                rotated_pixmap = self.original_pixmap.transformed(transform, Qt.SmoothTransformation)
-                self.graphics_view.pixmap_item.setPixmap(rotated_pixmap)
-                self.graphics_view.fitInView(self.graphics_view.pixmap_item, Qt.KeepAspectRatio)
+            # Mostrar candidatos pendientes de esta página
+            self.update_candidate_items()
             
             # Actualizar info de página
             self.lbl_page_info.setText(f'Página: {self.current_page + 1}/{self.total_pages}')
@@ -684,12 +1900,200 @@ class BaloneaSimpleApp(QMainWindow):
             self.btn_prev_page.setEnabled(self.current_page > 0)
             self.btn_next_page.setEnabled(self.current_page < self.total_pages - 1)
             
+            # Seleccionar la miniatura de la página actual
+            if self.current_page < self.thumbnail_list.count():
+                self.thumbnail_list.setCurrentRow(self.current_page)
+            
             # Restaurar globos de esta página
             self.restore_balloons_for_current_page()
             
         except Exception as e:
             QMessageBox.critical(self, 'Error', f'Error al mostrar página:\n{e}')
     
+    def screen_dpi(self):
+        """DPI físicos de la pantalla donde está la ventana"""
+        handle = self.windowHandle()
+        screen = handle.screen() if handle else QApplication.primaryScreen()
+        if screen is None:
+            return 96.0
+        return screen.logicalDotsPerInch() * screen.devicePixelRatio()
+    
+    def show_current_page_raster(self, page):
+        """Mostrar la página actual como imagen renderizada"""
+        # Resolución según tamaño de hoja, pantalla y presupuesto de memoria
+        box = page.cropbox
+        zoom = choose_render_zoom(box.width, box.height, self.screen_dpi())
+        self.render_zoom = zoom
+        self.graphics_view.balloon_size = BALLOON_SIZE * zoom
+        
+        # Plano escaneado ya preprocesado: se muestra en lugar del render normal
+        self.deskew_angle = 0.0
+        scanned = self.load_scan_render(page, zoom) if self.scan_mode else None
+        if scanned is not None:
+            pixmap, self.deskew_angle = scanned
+        else:
+            pixmap = self.load_raster_render(page, zoom)
+        
+        # Cargar en vista
+        self.graphics_view.load_image(pixmap)
+        
+        # Restaurar rotación de esta página (por defecto la propia del PDF)
+        self.current_rotation = self.rotation_by_page.get(self.current_page, page.rotation)
+        self.original_pixmap = pixmap
+        self.original_rotation = page.rotation
+        
+        # MuPDF ya renderiza con la rotación de la página: Qt solo gira la diferencia
+        self.apply_view_rotation()
+    
+    def load_raster_render(self, page, zoom):
+        """Render normal de la página (caché en memoria, en disco o MuPDF)"""
+        # Reutilizar el render si la página está en la caché en memoria compartida
+        cache_key = ('raster', self.pdf_hash, self.current_page, zoom, page.rotation)
+        pixmap = self.memory_cache.get(cache_key)
+        if pixmap is None:            
+            # Render persistente de una sesión anterior: sin pasar por MuPDF
+            pixmap = self.load_cached_render(self.current_page, zoom, page.rotation)
+            if pixmap is None:
+                # Renderizar a imagen con alta resolución
+                mat = fitz.Matrix(zoom, zoom)
+                pix = page.get_pixmap(matrix=mat)
+                
+                # Convertir a QImage
+                img_data = pix.samples
+                img = QImage(img_data, pix.width, pix.height, pix.stride, QImage.Format_RGB888)
+                pixmap = QPixmap.fromImage(img)
+                
+                if self.pdf_hash:
+                    self.cache_writer.submit(
+                        self.render_cache.put_bytes, self.pdf_hash, self.current_page,
+                        zoom, self.render_cache.encode(pix), page.rotation
+                    )
+            
+            # Guardar en la caché en memoria
+            self.memory_cache.put(cache_key, pixmap, pixmap.width() * pixmap.height() * 4)
+        return pixmap
+    
+    def load_scan_render(self, page, zoom):
+        """
+        Render preprocesado (pixmap, ángulo de enderezado) desde la caché en memoria
+        o en disco. Si no existe se encarga al pool y se retorna None: mientras
+        tanto se muestra el render normal y on_scan_ready cambia la imagen.
+        """
+        cache_key = ('scan', self.pdf_hash, self.current_page, zoom, page.rotation)
+        scanned = self.memory_cache.get(cache_key)
+        if scanned is not None:
+            return scanned
+        
+        cached = self.render_cache.get(
+            self.pdf_hash, self.current_page, zoom, page.rotation, SCAN_CACHE_VARIANT
+        ) if self.pdf_hash else None
+        if cached is not None:
+            try:
+                scanned = self.scan_pixmap(cached.data, cached.width, cached.height, cached.stride)
+            finally:
+                cached.data.close()
+        if scanned is None:
+            self.scan_preprocessor.request(
+                self.current_pdf_path, self.pdf_hash, self.current_page, zoom, page.rotation
+            )
+            return None
+        
+        self.memory_cache.put(cache_key, scanned, scanned[0].width() * scanned[0].height() * 4)
+        return scanned
+    
+    def scan_pixmap(self, data, width, height, stride):
+        """QPixmap en escala de grises y ángulo de un blob preprocesado (None si no es válido)"""
+        angle = scan_render_angle(data, stride, height)
+        if angle is None:
+            return None
+        samples = memoryview(data)[RAW_HEADER.size:RAW_HEADER.size + stride * height]
+        try:
+            img = QImage(samples, width, height, stride, QImage.Format_Grayscale8)
+            # fromImage copia los píxeles: después se puede liberar el búfer
+            pixmap = QPixmap.fromImage(img)
+            del img
+        finally:
+            samples.release()
+        return pixmap, angle
+    
+    def on_scan_ready(self, key, blob):
+        """Mostrar el plano preprocesado si sigue siendo la página y el modo actuales"""
+        pdf_hash, page_num, zoom, rotation = key
+        if not self.pdf_document or not self.scan_mode or self.vector_mode:
+            return
+        page = self.pdf_document[self.current_page]
+        if (pdf_hash, page_num, zoom, rotation) != (self.pdf_hash, self.current_page, self.render_zoom, page.rotation):
+            return
+        _, width, height, stride, _ = RAW_HEADER.unpack_from(blob)
+        scanned = self.scan_pixmap(blob, width, height, stride)
+        if scanned is None:
+            return
+        self.memory_cache.put(('scan',) + key, scanned, width * height * 4)
+        # Los globos se guardan en coordenadas PDF y se reubican sobre la imagen enderezada
+        self.save_balloons_for_current_page()
+        self.show_current_page()
+    
+    def toggle_scan_mode(self, enabled):
+        """Activar o desactivar el preprocesado de planos escaneados"""
+        self.scan_mode = enabled
+        if self.pdf_document and not self.vector_mode:
+            self.save_balloons_for_current_page()
+            self.show_current_page()
+    
+    def render_size(self, box):
+        """Ancho y alto en la escena del render de la página actual (con su rotación)"""
+        if self.current_rotation in (90, 270):
+            return box.height * self.render_zoom, box.width * self.render_zoom
+        return box.width * self.render_zoom, box.height * self.render_zoom
+    
+    def scene_to_pdf(self, x, y, box):
+        """Escena -> página PDF sin rotar, deshaciendo el enderezado del plano escaneado"""
+        if self.deskew_angle:
+            x, y = rotate_about_center(x, y, -self.deskew_angle, *self.render_size(box))
+        return scene_to_pdf_point(x, y, self.current_rotation, box.width, box.height, self.render_zoom)
+    
+    def pdf_to_scene(self, x, y, box):
+        """Página PDF sin rotar -> escena, aplicando el enderezado del plano escaneado"""
+        x, y = pdf_to_scene_point(x, y, self.current_rotation, box.width, box.height, self.render_zoom)
+        if self.deskew_angle:
+            x, y = rotate_about_center(x, y, self.deskew_angle, *self.render_size(box))
+        return x, y
+    
+    def pdf_rect_to_scene(self, rect, box):
+        """Rectángulo PDF (x0, y0, x1, y1) -> QRectF de la escena que contiene sus cuatro esquinas"""
+        x0, y0, x1, y1 = rect
+        points = [QPointF(*self.pdf_to_scene(x, y, box)) for x, y in ((x0, y0), (x1, y0), (x1, y1), (x0, y1))]
+        return QPolygonF(points).boundingRect()
+    
+    def show_current_page_vector(self, page):
+        """Mostrar la página actual con trazos vectoriales (independiente del zoom)"""
+        cache_key = ('vector', self.pdf_hash, self.current_page)
+        vector_page = self.memory_cache.get(cache_key)
+        if vector_page is None:
+            vector_page = build_vector_page(page)
+            # Coste aproximado: trazos, textos y píxeles de las imágenes
+            cost = (len(vector_page['paths']) * 512 + len(vector_page['texts']) * 256 +
+                    sum(image.sizeInBytes() for image, _ in vector_page['images']))
+            self.memory_cache.put(cache_key, vector_page, cost)
+        
+        # Restaurar rotación de esta página (por defecto la propia del PDF)
+        self.current_rotation = self.rotation_by_page.get(self.current_page, page.rotation)
+        self.original_pixmap = None
+        self.render_zoom = RENDER_ZOOM
+        self.deskew_angle = 0.0
+        self.graphics_view.balloon_size = BALLOON_SIZE * RENDER_ZOOM
+        
+        box = page.cropbox
+        transform = scene_transform_for_page(self.current_rotation, box.width, box.height)
+        self.graphics_view.load_vector_page(vector_page, box.width, box.height, transform)
+    
+    def toggle_vector_mode(self, enabled):
+        """Cambiar entre el render rasterizado y el modo vectorial"""
+        self.vector_mode = enabled
+        if self.pdf_document:
+            self.save_balloons_for_current_page()
+            self.show_current_page()
+    
     def prev_page(self):
         """Página anterior"""
         if self.current_page > 0:
@@ -704,48 +2108,137 @@ class BaloneaSimpleApp(QMainWindow):
             self.current_page += 1
             self.show_current_page()
     
+    def load_cached_render(self, page_num, zoom, rotation):
+        """Cargar un render de la caché en disco como QPixmap (None si no existe)"""
+        if not self.pdf_hash:
+            return None
+        cached = self.render_cache.get(self.pdf_hash, page_num, zoom, rotation)
+        if cached is None:
+            return None
+        
+        data = cached.data
+        if cached.components != 3:
+            data.close()
+            return None
+        try:
+            samples = memoryview(data)[RAW_HEADER.size:]
+            img = QImage(samples, cached.width, cached.height, cached.stride, QImage.Format_RGB888)
+            # fromImage copia los píxeles: después se puede liberar el mapeo
+            pixmap = QPixmap.fromImage(img)
+            del img
+            samples.release()
+        finally:
+            data.close()
+        return pixmap
+    
+    def go_to_page(self, page_num):
+        """Saltar directamente a una página"""
+        if not self.pdf_document or page_num == self.current_page or not 0 <= page_num < self.total_pages:
+            return
+        self.save_balloons_for_current_page()
+        self.current_page = page_num
+        self.show_current_page()
+    
+    # === MINIATURAS ===
+    
+    def reset_thumbnails(self):
+        """Crear las entradas de miniatura del documento actual (sin renderizar)"""
+        self.thumbnail_loader.set_document(self.current_pdf_path, self.pdf_hash)
+        self.thumbnail_list.clear()
+        
+        placeholder = QPixmap(self.thumbnail_list.iconSize())
+        placeholder.fill(QColor(60, 60, 60))
+        icon = QIcon(placeholder)
+        for page_num in range(self.total_pages):
+            item = QListWidgetItem(icon, '')
+            item.setTextAlignment(Qt.AlignCenter)
+            self.thumbnail_list.addItem(item)
+            self.update_thumbnail_mark(page_num)
+        
+        self.thumbnail_list.setCurrentRow(self.current_page)
+        self.request_visible_thumbnails()
+    
+    def request_visible_thumbnails(self):
+        """Solicitar el render de las miniaturas visibles (y una de margen)"""
+        if self.thumbnail_list.count() == 0:
+            return
+        viewport = self.thumbnail_list.viewport()
+        first = self.thumbnail_list.indexAt(QPoint(5, 5)).row()
+        last = self.thumbnail_list.indexAt(QPoint(5, viewport.height() - 5)).row()
+        first = max(first, 0)
+        last = self.thumbnail_list.count() - 1 if last < 0 else last
+        for page_num in range(max(first - 1, 0), min(last + 2, self.thumbnail_list.count())):
+            self.thumbnail_loader.request(page_num)
+    
+    def on_thumbnail_ready(self, page_num, png):
+        """Colocar la miniatura renderizada en su entrada"""
+        item = self.thumbnail_list.item(page_num)
+        if item is None:
+            return
+        pixmap = QPixmap()
+        if pixmap.loadFromData(png, 'PNG'):
+            item.setIcon(QIcon(pixmap))
+    
+    def update_thumbnail_mark(self, page_num):
+        """Marcar en la miniatura si la página tiene globos"""
+        item = self.thumbnail_list.item(page_num)
+        if item is None:
+            return
+        if page_num == self.current_page:
+            count = len(self.graphics_view.balloon_items)
+        else:
+            count = len(self.balloons_by_page.get(page_num, {}).get('balloons', []))
+        if count:
+            item.setText(f'{page_num + 1}  ● {count}')
+            item.setForeground(QColor(78, 201, 176))
+        else:
+            item.setText(f'{page_num + 1}')
+            item.setForeground(QColor(255, 255, 255))
+    
+    def resizeEvent(self, event):
+        """Al cambiar el tamaño pueden quedar visibles nuevas miniaturas"""
+        super().resizeEvent(event)
+        if hasattr(self, 'thumbnail_list'):
+            self.request_visible_thumbnails()
+    
     def save_balloons_for_current_page(self):
-        """Guardar globos y tabla de la página actual"""
-        # Guardar globos visuales
+        """
+        Guardar globos y tabla de la página actual.
+        Si los globos no cambiaron desde que se restauraron (o se guardaron),
+        la instantánea guardada sigue valiendo y no se vuelve a capturar.
+        """
+        page_data = self.balloons_by_page.get(self.current_page)
+        if page_data is not None and not self.graphics_view.balloons_dirty:
+            # La tabla es la lista del modelo: basta con volver a enlazarla
+            page_data['table'] = self.table_model.rows
+            page_data['counter'] = self.balloon_counter
+            self.rotation_by_page[self.current_page] = self.current_rotation
+            return
+        
+        # Guardar globos visuales en coordenadas PDF (independientes del zoom del render)
         balloons_data = []
+        if self.graphics_view.balloon_items:
+            box = self.pdf_document[self.current_page].cropbox
         for balloon in self.graphics_view.balloon_items:
+            pdf_x, pdf_y = self.scene_to_pdf(balloon['x'], balloon['y'], box)
             balloons_data.append({
-                'x': balloon['x'],
-                'y': balloon['y'],
+                'x': pdf_x,
+                'y': pdf_y,
                 'number': balloon['number'],
-                'size': balloon['size'],
+                'size': balloon['size'] / self.render_zoom,
+                'sub': balloon.get('sub', False),
                 'rotation': balloon.get('rotation', 0)
             })
         
-        # Guardar datos de la tabla
-        table_data = []
-        for i in range(self.table.rowCount()):
-            nombre = self.table.item(i, 0).text() if self.table.item(i, 0) else f'D{i+1}'
-            nominal = self.table.item(i, 1).text() if self.table.item(i, 1) else '0.0'
-            tol_pos = self.table.item(i, 2).text() if self.table.item(i, 2) else '0.0'
-            tol_neg = self.table.item(i, 3).text() if self.table.item(i, 3) else '0.0'
-            cmb_widget = self.table.cellWidget(i, 4)
-            instrumento = cmb_widget.currentText() if cmb_widget else 'Vernier'
-            unidad = self.table.item(i, 5).text() if self.table.item(i, 5) else 'mm'
-            notas = self.table.item(i, 6).text() if self.table.item(i, 6) else ''
-            
-            table_data.append({
-                'nombre': nombre,
-                'nominal': nominal,
-                'tol_pos': tol_pos,
-                'tol_neg': tol_neg,
-                'instrumento': instrumento,
-                'unidad': unidad,
-                'notas': notas
-            })
-        
-        # Guardar en el diccionario
+        # Guardar en el diccionario (la tabla ya es la lista de filas del modelo)
         self.balloons_by_page[self.current_page] = {
             'balloons': balloons_data,
-            'table': table_data,
+            'table': self.table_model.rows,
             'counter': self.balloon_counter
         }
         
+        self.graphics_view.balloons_dirty = False
+        
         # Guardar rotación
         self.rotation_by_page[self.current_page] = self.current_rotation
     
@@ -753,50 +2246,38 @@ class BaloneaSimpleApp(QMainWindow):
         """Restaurar globos y tabla de la página actual"""
         # Limpiar vista actual
         self.graphics_view.clear_balloons()
-        self.table.setRowCount(0)
         
         # Verificar si hay datos guardados para esta página
         if self.current_page in self.balloons_by_page:
             page_data = self.balloons_by_page[self.current_page]
             
-            # Restaurar globos visuales
+            # Restaurar globos visuales (de coordenadas PDF a la escena)
+            box = self.pdf_document[self.current_page].cropbox
             for balloon_data in page_data['balloons']:
+                x, y = self.pdf_to_scene(balloon_data['x'], balloon_data['y'], box)
                 self.graphics_view.add_balloon(
-                    balloon_data['x'],
-                    balloon_data['y'],
+                    x,
+                    y,
                     balloon_data['number'],
-                    balloon_data['size']
+                    balloon_data['size'] * self.render_zoom,
+                    sub=balloon_data.get('sub', False)
                 )
             
-            # Restaurar tabla
-            for row_data in page_data['table']:
-                row_count = self.table.rowCount()
-                self.table.insertRow(row_count)
-                
-                self.table.setItem(row_count, 0, QTableWidgetItem(row_data['nombre']))
-                self.table.setItem(row_count, 1, QTableWidgetItem(row_data['nominal']))
-                self.table.setItem(row_count, 2, QTableWidgetItem(row_data['tol_pos']))
-                self.table.setItem(row_count, 3, QTableWidgetItem(row_data['tol_neg']))
-                
-                cmb_instrumento = QComboBox()
-                cmb_instrumento.addItems(['Vernier', 'Micrómetro', 'Calibrador', 'Probador', 'CMM', 'Comparador', 'Otro'])
-                cmb_instrumento.setCurrentText(row_data['instrumento'])
-                cmb_instrumento.setStyleSheet("background-color: #3c3c3c; color: #ffffff;")
-                self.table.setCellWidget(row_count, 4, cmb_instrumento)
-                
-                unidad_item = QTableWidgetItem(row_data['unidad'])
-                unidad_item.setFlags(Qt.ItemIsEnabled | Qt.ItemIsSelectable)
-                unidad_item.setBackground(QColor(60, 60, 60))
-                self.table.setItem(row_count, 5, unidad_item)
-                
-                self.table.setItem(row_count, 6, QTableWidgetItem(row_data['notas']))
+            # Los globos en pantalla coinciden con la instantánea guardada
+            self.graphics_view.balloons_dirty = False
+            
+            # Restaurar tabla: el modelo usa la lista guardada sin crear filas
+            self.table_model.set_rows(page_data['table'])
             
             # Restaurar contador
-            self.balloon_counter = page_data['counter']
+            self.balloon_counter = len(page_data['balloons'])
         else:
             # Página nueva, resetear contador
+            self.table_model.set_rows([])
             self.balloon_counter = 0
         
+        # Las páginas anteriores pudieron cambiar de número de globos
+        self.renumber_current_page()
         self.update_balloon_counter()
     
     def rotate_pdf(self):
@@ -805,52 +2286,341 @@ class BaloneaSimpleApp(QMainWindow):
             return
         
         try:
-            # Guardar el pixmap original si no existe
-            if self.original_pixmap is None:
-                self.original_pixmap = self.graphics_view.pixmap_item.pixmap()
-            
-            # Incrementar rotación (0 -> 90 -> 180 -> 270 -> 0)
-            self.current_rotation = (self.current_rotation + 90) % 360
-            
-            # Crear transformación de rotación con el ángulo total acumulado
-            transform = QTransform()
-            transform.rotate(self.current_rotation)
-            
-            # Aplicar rotación al pixmap original
-            rotated_pixmap = self.original_pixmap.transformed(transform, Qt.SmoothTransformation)
-            
-            # Actualizar la vista con el pixmap rotado
-            self.graphics_view.pixmap_item.setPixmap(rotated_pixmap)
+            # Los globos se guardan en coordenadas PDF y se vuelven a ubicar tras girar
+            self.save_balloons_for_current_page()
             
-            # Ajustar la vista para mostrar toda la imagen rotada
-            self.graphics_view.fitInView(self.graphics_view.pixmap_item, Qt.KeepAspectRatio)
+            # Modo vectorial: basta con cambiar la transformación de la página
+            if self.vector_mode:
+                self.current_rotation = (self.current_rotation + 90) % 360
+                box = self.pdf_document[self.current_page].cropbox
+                self.graphics_view.pixmap_item.setTransform(
+                    scene_transform_for_page(self.current_rotation, box.width, box.height)
+                )
+                self.graphics_view.fit_scene_to_page()
+            else:
+                # Guardar el pixmap original si no existe
+                if self.original_pixmap is None:
+                    self.original_pixmap = self.graphics_view.pixmap_item.pixmap()
+                    self.original_rotation = self.current_rotation
+                
+                # Incrementar rotación (0 -> 90 -> 180 -> 270 -> 0)
+                self.current_rotation = (self.current_rotation + 90) % 360
+                
+                # Girar el render original solo lo que falta hasta la rotación actual
+                self.apply_view_rotation()
             
             # Rotar también la página del PDF para que se guarde rotado
             page = self.pdf_document[self.current_page]
             page.set_rotation(self.current_rotation)
+            self.rotation_by_page[self.current_page] = self.current_rotation
+            
+            # Reubicar globos, resaltado de cambios y candidatos según la nueva rotación
+            self.restore_balloons_for_current_page()
+            self.update_revision_highlights()
+            self.update_candidate_items()
             
         except Exception as e:
             QMessageBox.critical(self, 'Error', f'Error al rotar PDF:\n{e}')
     
+    def apply_view_rotation(self):
+        """Mostrar original_pixmap girado por la diferencia con la rotación con que se renderizó"""
+        delta = (self.current_rotation - self.original_rotation) % 360
+        if delta:
+            transform = QTransform()
+            transform.rotate(delta)
+            pixmap = self.original_pixmap.transformed(transform, Qt.SmoothTransformation)
+        else:
+            pixmap = self.original_pixmap
+        
+        if self.graphics_view.pixmap_item.pixmap().cacheKey() != pixmap.cacheKey():
+            self.graphics_view.pixmap_item.setPixmap(pixmap)
+            self.graphics_view.fit_scene_to_page()
+    
+    # === FUNCIONES DE REVISIÓN ===
+    
+    def compare_revision(self):
+        """Abrir una nueva revisión del plano y compararla con la actual en segundo plano"""
+        if not self.pdf_document or self.diff_worker is not None or self.candidate_worker is not None:
+            return
+        
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, 'Seleccionar Nueva Revisión', '', 'PDF Files (*.pdf);;All Files (*.*)'
+        )
+        
+        if not file_path:
+            return
+        
+        # Guardar la página actual para comparar con los globos al día
+        self.save_balloons_for_current_page()
+        
+        self.btn_compare_revision.setEnabled(False)
+        self.lbl_file_info.setText('Comparando revisiones...')
+        
+        self.diff_session = self.active_session
+        self.diff_worker = RevisionDiffWorker(self.current_pdf_path, file_path, self)
+        self.diff_worker.progress.connect(self.on_revision_diff_progress)
+        self.diff_worker.finished_diff.connect(
+            lambda result, pdf_hash: self.apply_revision_diff(file_path, result, pdf_hash)
+        )
+        self.diff_worker.failed.connect(self.on_revision_diff_failed)
+        self.diff_worker.diff_cancelled.connect(self.on_revision_diff_cancelled)
+        self.diff_worker.start()
+    
+    def on_revision_diff_progress(self, done, total):
+        """Mostrar el avance de la comparación"""
+        if self.diff_session is self.active_session:
+            self.lbl_file_info.setText(f'Comparando revisiones... {done}/{total}')
+    
+    def on_revision_diff_cancelled(self):
+        """La comparación se interrumpió: dejar el documento actual intacto"""
+        self.diff_worker = None
+        self.diff_session = None
+        self.btn_compare_revision.setEnabled(bool(self.pdf_document))
+        if self.current_pdf_path:
+            self.lbl_file_info.setText(Path(self.current_pdf_path).name)
+    
+    def on_revision_diff_failed(self, message):
+        """La comparación falló: dejar el documento actual intacto"""
+        self.on_revision_diff_cancelled()
+        QMessageBox.critical(self, 'Error', f'Error al comparar revisiones:\n{message}')
+    
+    def apply_revision_diff(self, new_path, changes_by_page, pdf_hash):
+        """Abrir la nueva revisión conservando los globos de las zonas sin cambios"""
+        self.diff_worker = None
+        
+        # La revisión se aplica al documento que la pidió: mostrar su pestaña
+        session, self.diff_session = self.diff_session, None
+        if session is not None and session is not self.active_session:
+            self.document_tabs.setCurrentIndex(self.sessions.index(session))
+        self.btn_compare_revision.setEnabled(True)
+        
+        try:
+            new_document = fitz.open(new_path)
+        except Exception as e:
+            self.lbl_file_info.setText(Path(self.current_pdf_path).name)
+            QMessageBox.critical(self, 'Error', f'Error al cargar PDF:\n{e}')
+            return
+        
+        # Incluir lo editado en la página actual mientras corría la comparación
+        self.save_balloons_for_current_page()
+        
+        carried = 0
+        dropped = 0
+        new_balloons_by_page = {}
+        
+        for page_num, page_data in self.balloons_by_page.items():
+            if page_num >= len(new_document):
+                dropped += len(page_data['balloons'])
+                continue
+            
+            changes = changes_by_page.get(page_num)
+            if not changes:
+                # Página sin cambios: se conservan todos los globos
+                new_balloons_by_page[page_num] = page_data
+                carried += len(page_data['balloons'])
+                continue
+            
+            kept_balloons = []
+            kept_rows = []
+            
+            for i, balloon in enumerate(page_data['balloons']):
+                radius = balloon['size'] / 2.0
+                if point_in_rects(balloon['x'], balloon['y'], changes, margin=radius):
+                    dropped += 1
+                    continue
+                
+                kept_balloons.append(balloon)
+                if i < len(page_data['table']):
+                    kept_rows.append(page_data['table'][i])
+                carried += 1
+            
+            # Filas de tabla sin globo asociado se conservan tal cual
+            kept_rows.extend(page_data['table'][len(page_data['balloons']):])
+            
+            new_balloons_by_page[page_num] = {
+                'balloons': kept_balloons,
+                'table': kept_rows,
+                'counter': len(kept_balloons)
+            }
+        
+        # Reemplazar el documento por la nueva revisión
+        self.pdf_document.close()
+        self.pdf_document = new_document
+        self.current_pdf_path = new_path
+        self.total_pages = len(new_document)
+        self.current_page = min(self.current_page, self.total_pages - 1)
+        self.original_pixmap = None
+        self.pdf_hash = pdf_hash
+        self.balloons_by_page = new_balloons_by_page
+        self.numbering.rebuild(new_balloons_by_page, self.total_pages)
+        self.characteristic_index.rebuild(new_balloons_by_page)
+        self.tolerance_stats.rebuild(new_balloons_by_page)
+        self.word_index_by_page = {}
+        self.candidates_by_page = {}
+        self.rotation_by_page = {
+            page_num: rotation for page_num, rotation in self.rotation_by_page.items()
+            if page_num < self.total_pages
+        }
+        self.revision_changes_by_page = {
+            page_num: rects for page_num, rects in changes_by_page.items() if rects
+        }
+        
+        self.lbl_file_info.setText(Path(new_path).name)
+        if self.active_session in self.sessions:
+            index = self.sessions.index(self.active_session)
+            self.document_tabs.setTabText(index, Path(new_path).name)
+            self.document_tabs.setTabToolTip(index, new_path)
+        self.show_current_page()
+        self.reset_thumbnails()
+        
+        changed_pages = sorted(page_num + 1 for page_num in self.revision_changes_by_page)
+        QMessageBox.information(self, 'Revisión Comparada',
+                              f'Páginas con cambios: {len(changed_pages)}/{self.total_pages}\n'
+                              f'{", ".join(map(str, changed_pages[:20]))}'
+                              f'{"..." if len(changed_pages) > 20 else ""}\n\n'
+                              f'{carried} globos conservados\n'
+                              f'{dropped} globos en zonas cambiadas (eliminados)')
+    
+    def update_revision_highlights(self):
+        """Dibujar las zonas cambiadas de la página actual sobre el plano"""
+        rects = self.revision_changes_by_page.get(self.current_page, [])
+        if not rects or not self.pdf_document:
+            self.graphics_view.set_highlights([])
+            return
+        
+        box = self.pdf_document[self.current_page].cropbox
+        scene_rects = [self.pdf_rect_to_scene(rect, box) for rect in rects]
+        self.graphics_view.set_highlights(scene_rects)
+    
     # === FUNCIONES DE BALONEO ===
     
     def on_image_click(self, x, y):
         """Callback cuando se hace clic en la imagen"""
-        # Incrementar contador
+        # Buscar una cota en la capa de texto cerca del clic
+        dimension = self.find_dimension_near(x, y) if self.chk_snap.isChecked() else None
+        
+        # Agregar globo y fila (con los valores de la cota si se encontró)
+        if dimension:
+            nominal, tol_pos, tol_neg, text, rect = dimension
+            x, y = self.snap_position_for_rect(rect)
+            self.place_balloon(x, y, (nominal, tol_pos, tol_neg), text)
+        else:
+            self.place_balloon(x, y)
+        
+        # Actualizar contador visual
+        self.update_balloon_counter()
+    
+    def place_balloon(self, x, y, values=('0.0', '0.0', '0.0'), notas=''):
+        """
+        Agregar un globo con su fila de tabla.
+        Con intercalado activo se inserta tras la fila seleccionada como 12A, 12B...
+        sin desplazar la numeración del resto.
+        """
+        balloons = self.graphics_view.balloon_items
+        index = len(balloons)
+        sub = False
+        selected_row = self.current_table_row()
+        if self.chk_insert_between.isChecked() and 0 <= selected_row < len(balloons):
+            index = selected_row + 1
+            while index < len(balloons) and balloons[index].get('sub'):
+                index += 1
+            sub = True
+        
+        self.graphics_view.add_balloon(x, y, '', index=index, sub=sub)
+        self.add_dimension_row('', *values, notas, row=index)
         self.balloon_counter += 1
+        self.renumber_current_page(index)
+    
+    def renumber_current_page(self, start=0):
+        """
+        Recalcular las etiquetas de la página actual desde la posición start.
+        Solo se tocan los globos cuya etiqueta cambia; el nombre de la fila se
+        actualiza si seguía el patrón D<número> (los nombres editados se respetan).
+        """
+        if not self.pdf_document:
+            return
+        balloons = self.graphics_view.balloon_items
+        sub_flags = [balloon.get('sub', False) for balloon in balloons]
+        self.numbering.set_page_count(self.current_page, sub_flags.count(False))
+        labels = self.numbering.labels(self.current_page, sub_flags)
+        
+        for i in range(start, len(balloons)):
+            old_label = str(balloons[i]['number'])
+            if old_label == labels[i]:
+                continue
+            self.graphics_view.set_balloon_number(i, labels[i])
+            rows = self.table_model.rows
+            if i < len(rows) and rows[i]['nombre'] == f'D{old_label}':
+                self.table_model.set_value(i, 'nombre', f'D{labels[i]}')
+    
+    def renumber_stored_pages(self):
+        """Actualizar las etiquetas guardadas de todas las páginas (antes de exportar)"""
+        for page_num, page_data in self.balloons_by_page.items():
+            sub_flags = [balloon.get('sub', False) for balloon in page_data['balloons']]
+            labels = self.numbering.labels(page_num, sub_flags)
+            for i, (balloon, label) in enumerate(zip(page_data['balloons'], labels)):
+                old_label = str(balloon['number'])
+                if i < len(page_data['table']) and page_data['table'][i]['nombre'] == f'D{old_label}':
+                    page_data['table'][i]['nombre'] = f'D{label}'
+                    self.characteristic_index.update_row(page_data['table'][i])
+                balloon['number'] = label
+    
+    def update_numbering_policy(self, index):
+        """Cambiar la política de numeración del documento actual"""
+        self.numbering.policy = self.cmb_numbering.itemData(index)
+        self.renumber_current_page()
+    
+    def get_word_index(self, page_num):
+        """Obtener (o construir una sola vez) el índice de texto de una página"""
+        if page_num not in self.word_index_by_page:
+            self.word_index_by_page[page_num] = WordIndex.from_page(self.pdf_document[page_num])
+        return self.word_index_by_page[page_num]
+    
+    def find_dimension_near(self, x, y):
+        """
+        Buscar la cota más cercana a un punto de la escena.
+        Retorna (nominal, tol_pos, tol_neg, texto, rect) con valores validados o None.
+        """
+        if not self.pdf_document:
+            return None
         
-        # Agregar globo visual en la imagen
-        self.graphics_view.add_balloon(x, y, self.balloon_counter)
+        box = self.pdf_document[self.current_page].cropbox
+        pdf_x, pdf_y = self.scene_to_pdf(x, y, box)
+        dimension = self.get_word_index(self.current_page).nearest(pdf_x, pdf_y)
+        if not dimension:
+            return None
         
-        # Agregar fila a la tabla
-        self.add_dimension_row(self.balloon_counter)
+        nominal, tol_pos, tol_neg, text, rect = dimension
+        values = self.validate_dimension_values(nominal, tol_pos, tol_neg)
+        if not values:
+            return None
         
-        # Actualizar contador visual
-        self.update_balloon_counter()
+        return values + (text, rect)
+    
+    def validate_dimension_values(self, nominal, tol_pos, tol_neg):
+        """
+        Validar los valores leídos del plano con el mismo parser que usa la exportación.
+        Retorna (nominal, tol_pos, tol_neg) como texto o None si el nominal no es válido.
+        """
+        if not nominal or self.parse_fraction_or_decimal(nominal) == 0.0:
+            return None
+        tol_pos = tol_pos if tol_pos and self.parse_fraction_or_decimal(tol_pos) else '0.0'
+        tol_neg = tol_neg if tol_neg and self.parse_fraction_or_decimal(tol_neg) else '0.0'
+        return nominal, tol_pos, tol_neg
+    
+    def snap_position_for_rect(self, rect):
+        """Posición del globo (escena) junto a la cota, a la derecha del texto"""
+        size = self.graphics_view.balloon_size
+        box = self.pdf_document[self.current_page].cropbox
+        scene_rect = self.pdf_rect_to_scene(rect, box)
+        return scene_rect.right() + size / 2 + 4, scene_rect.center().y()
     
     def update_balloon_counter(self):
         """Actualizar el contador visual de globos"""
         self.lbl_balloon_count.setText(str(self.balloon_counter))
+        self.update_thumbnail_mark(self.current_page)
+        if self.table.model() is self.all_pages_model:
+            self.refresh_all_pages_table()
     
     def clear_balloons(self):
         """Limpiar todos los globos"""
@@ -866,8 +2636,9 @@ class BaloneaSimpleApp(QMainWindow):
         
         if reply == QMessageBox.Yes:
             self.graphics_view.clear_balloons()
-            self.table.setRowCount(0)
+            self.table_model.set_rows([])
             self.balloon_counter = 0
+            self.renumber_current_page()
             self.update_balloon_counter()
     
     def remove_last_balloon(self):
@@ -877,11 +2648,12 @@ class BaloneaSimpleApp(QMainWindow):
             self.graphics_view.remove_balloon(self.balloon_counter - 1)
             
             # Eliminar última fila de la tabla
-            if self.table.rowCount() > 0:
-                self.table.removeRow(self.table.rowCount() - 1)
+            if self.table_model.rows:
+                self.table_model.remove_row(len(self.table_model.rows) - 1)
             
             # Decrementar contador
             self.balloon_counter -= 1
+            self.renumber_current_page(self.balloon_counter)
             self.update_balloon_counter()
     
     def zoom_fit(self):
@@ -889,48 +2661,294 @@ class BaloneaSimpleApp(QMainWindow):
         if self.graphics_view.pixmap_item:
             self.graphics_view.fitInView(self.graphics_view.pixmap_item, Qt.KeepAspectRatio)
     
-    # === FUNCIONES DE TABLA ===
+    # === CANDIDATOS AUTOMÁTICOS ===
     
-    def add_dimension_row(self, balloon_number):
-        """Agregar nueva fila a la tabla de dimensiones"""
-        row_count = self.table.rowCount()
-        self.table.insertRow(row_count)
+    def detect_candidates(self):
+        """Detectar candidatos de globo en todas las páginas con procesos en segundo plano"""
+        if not self.pdf_document or self.candidate_worker is not None:
+            return
         
-        # Nombre (basado en el número de globo) - EDITABLE
-        nombre_item = QTableWidgetItem(f'D{balloon_number}')
-        self.table.setItem(row_count, 0, nombre_item)
+        self.candidates_by_page = {}
+        self.update_candidate_items()
+        self.btn_detect_candidates.setEnabled(False)
+        self.btn_compare_revision.setEnabled(False)
         
-        # Nominal
-        nominal_item = QTableWidgetItem('0.0')
-        self.table.setItem(row_count, 1, nominal_item)
+        self.candidate_session = self.active_session
+        self.candidate_worker = CandidateDetectionWorker(
+            self.current_pdf_path, range(self.total_pages), self
+        )
+        self.candidate_worker.page_ready.connect(self.on_candidates_ready)
+        self.candidate_worker.progress.connect(self.on_candidate_detection_progress)
+        self.candidate_worker.failed.connect(
+            lambda message: QMessageBox.critical(self, 'Error', f'Error al detectar candidatos:\n{message}')
+        )
+        self.candidate_worker.finished.connect(self.on_candidate_detection_finished)
+        self.candidate_worker.start()
+    
+    def on_candidate_detection_progress(self, done, total):
+        """Mostrar el avance de la detección en la pestaña del documento analizado"""
+        if self.candidate_session is self.active_session:
+            self.lbl_file_info.setText(f'Detectando candidatos... {done}/{total}')
+    
+    def on_candidates_ready(self, page_num, candidates):
+        """Recibir los candidatos de una página a medida que se detectan"""
+        session = self.candidate_session
+        if session is None:
+            return
+        if candidates:
+            self.session_state(session, 'candidates_by_page')[page_num] = candidates
+        if session is self.active_session and page_num == self.current_page:
+            self.update_candidate_items()
+    
+    def on_candidate_detection_finished(self):
+        """Fin de la detección: informar el total encontrado"""
+        self.candidate_worker = None
+        session, self.candidate_session = self.candidate_session, None
+        self.btn_detect_candidates.setEnabled(bool(self.pdf_document))
+        self.btn_compare_revision.setEnabled(bool(self.pdf_document))
+        if self.current_pdf_path:
+            self.lbl_file_info.setText(Path(self.current_pdf_path).name)
+        if session is None or session not in self.sessions:
+            return
         
-        # Tolerancia +
-        tol_pos_item = QTableWidgetItem('0.0')
-        self.table.setItem(row_count, 2, tol_pos_item)
+        candidates_by_page = self.session_state(session, 'candidates_by_page')
+        total = sum(len(candidates) for candidates in candidates_by_page.values())
+        name = Path(self.session_state(session, 'current_pdf_path')).name
+        QMessageBox.information(self, 'Detección Terminada',
+                              f'{name}: {total} candidatos en {len(candidates_by_page)} páginas\n\n'
+                              f'Clic sobre un candidato para aceptarlo, clic derecho para rechazarlo.')
+    
+    def update_candidate_items(self):
+        """Dibujar los candidatos pendientes de la página actual"""
+        candidates = self.candidates_by_page.get(self.current_page, [])
+        positions = []
+        for index, candidate in enumerate(candidates):
+            x, y = self.snap_position_for_rect(candidate['rect'])
+            positions.append((x, y, index))
+        self.graphics_view.set_candidates(positions)
+    
+    def accept_candidate(self, index, refresh=True):
+        """Convertir un candidato de la página actual en globo con su fila de tabla"""
+        candidates = self.candidates_by_page.get(self.current_page, [])
+        if not 0 <= index < len(candidates):
+            return
         
-        # Tolerancia -
-        tol_neg_item = QTableWidgetItem('0.0')
-        self.table.setItem(row_count, 3, tol_neg_item)
+        candidate = candidates.pop(index)
+        x, y = self.snap_position_for_rect(candidate['rect'])
         
-        # Instrumento (ComboBox)
-        cmb_instrumento = QComboBox()
-        cmb_instrumento.addItems(['Vernier', 'Micrómetro', 'Calibrador', 'Probador', 'CMM', 'Comparador', 'Otro'])
-        cmb_instrumento.setStyleSheet("background-color: #3c3c3c; color: #ffffff;")
-        self.table.setCellWidget(row_count, 4, cmb_instrumento)
+        values = self.validate_dimension_values(
+            candidate['nominal'], candidate['tol_pos'], candidate['tol_neg']
+        ) or ('0.0', '0.0', '0.0')
+        self.place_balloon(x, y, values, candidate['text'])
         
-        # Unidad
-        unidad_item = QTableWidgetItem(self.unidad_global)
-        unidad_item.setFlags(Qt.ItemIsEnabled | Qt.ItemIsSelectable)  # No editable
-        unidad_item.setBackground(QColor(60, 60, 60))
-        self.table.setItem(row_count, 5, unidad_item)
+        if refresh:
+            self.update_balloon_counter()
+            self.update_candidate_items()
+    
+    def reject_candidate(self, index):
+        """Descartar un candidato de la página actual"""
+        candidates = self.candidates_by_page.get(self.current_page, [])
+        if 0 <= index < len(candidates):
+            candidates.pop(index)
+            self.update_candidate_items()
+    
+    def accept_all_candidates(self):
+        """Aceptar todos los candidatos pendientes de la página actual"""
+        candidates = self.candidates_by_page.get(self.current_page, [])
+        if not candidates:
+            return
+        while candidates:
+            self.accept_candidate(0, refresh=False)
+        self.update_balloon_counter()
+        self.update_candidate_items()
+    
+    def reject_all_candidates(self):
+        """Descartar todos los candidatos pendientes de la página actual"""
+        if self.candidates_by_page.pop(self.current_page, None):
+            self.update_candidate_items()
+    
+    # === FUNCIONES DE TABLA ===
+    
+    def set_table_model(self, model):
+        """Mostrar un modelo en la tabla y ajustar sus columnas"""
+        self.table.setModel(model)
+        header = self.table.horizontalHeader()
+        for column, (key, _, width) in enumerate(model.columns):
+            if not width:
+                header.setSectionResizeMode(column, QHeaderView.Stretch)
+                continue
+            fixed = key in model.read_only or key == 'nombre'
+            header.setSectionResizeMode(column, QHeaderView.Fixed if fixed else QHeaderView.Interactive)
+            self.table.setColumnWidth(column, width)
+    
+    def set_table_scope(self, index):
+        """Alternar entre la tabla de la hoja actual y la de todas las hojas"""
+        all_pages = index == 1
+        if all_pages:
+            self.refresh_all_pages_table()
+        self.set_table_model(self.all_pages_model if all_pages else self.table_model)
+        # Eliminar filas y globos solo tiene sentido sobre la hoja visible
+        self.btn_delete_row.setEnabled(not all_pages)
+        self.btn_clear_table.setEnabled(not all_pages)
+    
+    def refresh_all_pages_table(self):
+        """Pasar al modelo de todas las hojas las listas de filas (la actual, en vivo)"""
+        page_nums = set(self.balloons_by_page)
+        if self.pdf_document:
+            page_nums.add(self.current_page)
+        pages = [
+            (page_num, self.table_model.rows if page_num == self.current_page
+             else self.balloons_by_page[page_num]['table'])
+            for page_num in sorted(page_nums)
+        ]
+        self.all_pages_model.set_pages(pages)
+    
+    def row_indexes(self):
+        """Estructuras que siguen fila a fila la tabla del documento activo"""
+        return (self.characteristic_index, self.tolerance_stats)
+    
+    def on_table_reset(self):
+        for index in self.row_indexes():
+            index.set_page(self.current_page, self.table_model.rows)
+        self.schedule_search()
+    
+    def on_table_rows_inserted(self, parent, first, last):
+        for row in self.table_model.rows[first:last + 1]:
+            for index in self.row_indexes():
+                index.add_row(self.current_page, row)
+        self.schedule_search()
+    
+    def on_table_rows_removed(self, parent, first, last):
+        for row in self.table_model.rows[first:last + 1]:
+            for index in self.row_indexes():
+                index.remove_row(row)
+        self.schedule_search()
+    
+    def on_table_data_changed(self, top_left, bottom_right, roles=()):
+        model = self.sender()
+        for row in range(top_left.row(), bottom_right.row() + 1):
+            for index in self.row_indexes():
+                index.update_row(model.row_at(row))
+        self.schedule_search()
+    
+    # === ESTADÍSTICA DE TOLERANCIAS ===
+    
+    def show_tolerance_stats(self):
+        """Mostrar bandas de tolerancia y apilamiento (cadena inicial: filas seleccionadas)"""
+        if not self.pdf_document:
+            QMessageBox.warning(self, 'Sin PDF', 
+                              'No hay PDF cargado.\n'
+                              'Cargue un PDF antes de calcular tolerancias.')
+            return
         
-        # Notas
-        notas_item = QTableWidgetItem('')
-        self.table.setItem(row_count, 6, notas_item)
+        chain = []
+        if self.table.model() is self.table_model:
+            balloons = self.graphics_view.balloon_items
+            for row in sorted({index.row() for index in self.table.selectedIndexes()}):
+                if row < len(balloons):
+                    chain.append(str(balloons[row]['number']))
+        ToleranceStatsDialog(self, ' '.join(chain)).exec_()
+    
+    def resolve_stackup_chain(self, text):
+        """
+        Convertir '1 +2 -5 3:4A' en [(fila, signo)].
+        Sin hoja, el globo se busca en la hoja actual y después en el resto del documento.
+        Lanza KeyError con el término que no corresponde a ningún globo.
+        """
+        chain = []
+        for term in text.split():
+            match = STACKUP_TERM_RE.match(term)
+            if not match:
+                raise KeyError(term)
+            sign_text, page_text, label = match.groups()
+            sign = -1 if sign_text == '-' else 1
+            pages = [int(page_text) - 1] if page_text else [self.current_page] + sorted(self.balloons_by_page)
+            row = None
+            for page_num in pages:
+                row = self.row_for_balloon(page_num, label)
+                if row is not None:
+                    break
+            if row is None:
+                raise KeyError(term)
+            chain.append((row, sign))
+        return chain
+    
+    def row_for_balloon(self, page_num, label):
+        """Fila de tabla del globo con etiqueta label en una hoja (o None)"""
+        if page_num == self.current_page:
+            labels = [str(balloon['number']) for balloon in self.graphics_view.balloon_items]
+            rows = self.table_model.rows
+        elif page_num in self.balloons_by_page:
+            page_data = self.balloons_by_page[page_num]
+            sub_flags = [balloon.get('sub', False) for balloon in page_data['balloons']]
+            labels = self.numbering.labels(page_num, sub_flags)
+            rows = page_data['table']
+        else:
+            return None
+        if label in labels and labels.index(label) < len(rows):
+            return rows[labels.index(label)]
+        return None
+    
+    # === BÚSQUEDA ===
+    
+    def schedule_search(self):
+        """Repetir la búsqueda activa cuando vuelva el bucle de eventos (agrupa cambios)"""
+        if self.txt_search.text().strip():
+            self.search_timer.start()
+    
+    def run_search(self):
+        """Mostrar las filas de todas las hojas que cumplen la consulta"""
+        self.search_results.clear()
+        query = self.txt_search.text().strip()
+        if not query:
+            self.lbl_search_info.setText('')
+            return
+        
+        start = time.perf_counter()
+        matches = self.characteristic_index.search(query)
+        elapsed = (time.perf_counter() - start) * 1000
+        
+        for page_num, position, row in matches[:SEARCH_RESULT_LIMIT]:
+            text = f"Hoja {page_num + 1} · {row['nombre']}  {row['nominal']}  {row['instrumento']}"
+            if row.get('notas'):
+                text += f"  ({row['notas']})"
+            item = QListWidgetItem(text)
+            item.setData(Qt.UserRole, (page_num, row))
+            self.search_results.addItem(item)
+        
+        shown = f' (se muestran {SEARCH_RESULT_LIMIT})' if len(matches) > SEARCH_RESULT_LIMIT else ''
+        self.lbl_search_info.setText(
+            f'{len(matches)} de {len(self.characteristic_index)} características{shown} · {elapsed:.1f} ms'
+        )
+    
+    def jump_to_search_result(self, item):
+        """Ir a la hoja del resultado, seleccionar su fila y centrar la vista en su globo"""
+        page_num, row = item.data(Qt.UserRole)
+        if page_num != self.current_page:
+            self.go_to_page(page_num)
+        position = next((i for i, other in enumerate(self.table_model.rows) if other is row), -1)
+        if position < 0:
+            return
+        if self.table.model() is self.table_model:
+            self.table.selectRow(position)
+        self.graphics_view.focus_balloon(position)
+    
+    def current_table_row(self):
+        """Fila seleccionada en la tabla de la hoja actual (-1 si no hay o se ven todas las hojas)"""
+        if self.table.model() is not self.table_model:
+            return -1
+        return self.table.currentIndex().row()
+    
+    def add_dimension_row(self, balloon_number, nominal='0.0', tol_pos='0.0', tol_neg='0.0', notas='', row=None):
+        """Agregar nueva fila a la tabla de dimensiones (al final o en la posición row)"""
+        row_count = len(self.table_model.rows) if row is None else row
+        self.table_model.insert_row(
+            row_count, new_dimension_row(f'D{balloon_number}', nominal, tol_pos, tol_neg, self.unidad_global, notas)
+        )
     
     def delete_dimension_row(self):
         """Eliminar fila seleccionada"""
-        current_row = self.table.currentRow()
+        current_row = self.current_table_row()
         if current_row >= 0:
             reply = QMessageBox.question(
                 self, '¿Eliminar Fila?',
@@ -939,16 +2957,23 @@ class BaloneaSimpleApp(QMainWindow):
             )
             
             if reply == QMessageBox.Yes:
-                self.table.removeRow(current_row)
-                # También eliminar el globo correspondiente
-                if current_row < len(self.graphics_view.balloon_items):
+                self.table_model.remove_row(current_row)
+                # También eliminar el globo correspondiente y renumerar los siguientes
+                balloons = self.graphics_view.balloon_items
+                if current_row < len(balloons):
+                    removed = balloons[current_row]
                     self.graphics_view.remove_balloon(current_row)
+                    # Un intercalado (12A) ocupa el lugar del principal eliminado
+                    if (not removed.get('sub') and current_row < len(balloons)
+                            and balloons[current_row].get('sub')):
+                        balloons[current_row]['sub'] = False
                     self.balloon_counter -= 1
+                    self.renumber_current_page(current_row)
                     self.update_balloon_counter()
     
     def clear_table(self):
         """Limpiar toda la tabla"""
-        if self.table.rowCount() == 0:
+        if not self.table_model.rows:
             return
         
         reply = QMessageBox.question(
@@ -958,23 +2983,47 @@ class BaloneaSimpleApp(QMainWindow):
         )
         
         if reply == QMessageBox.Yes:
-            self.table.setRowCount(0)
+            self.table_model.set_rows([])
             self.graphics_view.clear_balloons()
             self.balloon_counter = 0
+            self.renumber_current_page()
             self.update_balloon_counter()
     
     def update_global_unit(self, unit):
-        """Actualizar unidad global en todas las filas"""
+        """
+        Cambiar la unidad global convirtiendo nominal y tolerancias de todas las hojas
+        de los documentos abiertos (valores exactos, ver convert_row_unit). La tabla
+        recibe una sola notificación al terminar.
+        """
         self.unidad_global = unit
-        for i in range(self.table.rowCount()):
-            if self.table.item(i, 5):
-                self.table.item(i, 5).setText(unit)
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            for session in self.sessions:
+                balloons_by_page = self.session_state(session, 'balloons_by_page')
+                indexes = (self.session_state(session, 'characteristic_index'),
+                           self.session_state(session, 'tolerance_stats'))
+                tables = [page_data['table'] for page_data in balloons_by_page.values()]
+                if session is self.active_session:
+                    tables.append(self.table_model.rows)
+                for rows in tables:
+                    for row in rows:
+                        if convert_row_unit(row, unit):
+                            for index in indexes:
+                                index.update_row(row)
+        finally:
+            QApplication.restoreOverrideCursor()
+        
+        self.table_model.refresh()
+        self.all_pages_model.refresh()
     
     # === FUNCIONES DE EXPORTACIÓN/IMPORTACIÓN ===
     
     def export_json(self):
-        """Exportar dimensiones a JSON en el formato especificado"""
-        if self.table.rowCount() == 0:
+        """Exportar dimensiones a JSON en el formato especificado (en segundo plano)"""
+        if self.export_in_progress():
+            return
+        self.ensure_dimensions_panel()
+        if not self.table_model.rows:
             QMessageBox.warning(self, 'Tabla Vacía', 
                               'No hay dimensiones para exportar.')
             return
@@ -987,66 +3036,29 @@ class BaloneaSimpleApp(QMainWindow):
         if not file_path:
             return
         
-        try:
-            # Recolectar datos de la tabla
-            dimensiones = []
-            for i in range(self.table.rowCount()):
-                nombre = self.table.item(i, 0).text() if self.table.item(i, 0) else f'D{i+1}'
-                
-                # Parsear valores aceptando fracciones o decimales
-                nominal = self.parse_fraction_or_decimal(
-                    self.table.item(i, 1).text() if self.table.item(i, 1) else '0'
-                )
-                
-                tol_pos = self.parse_fraction_or_decimal(
-                    self.table.item(i, 2).text() if self.table.item(i, 2) else '0'
-                )
-                
-                tol_neg = self.parse_fraction_or_decimal(
-                    self.table.item(i, 3).text() if self.table.item(i, 3) else '0'
-                )
-                
-                # Obtener instrumento del ComboBox
-                cmb_widget = self.table.cellWidget(i, 4)
-                instrumento = cmb_widget.currentText() if cmb_widget else 'Vernier'
-                
-                unidad = self.table.item(i, 5).text() if self.table.item(i, 5) else 'mm'
-                notas = self.table.item(i, 6).text() if self.table.item(i, 6) else ''
-                
-                dimensiones.append({
-                    'nombre': nombre,
-                    'nominal': nominal,
-                    'tol_pos': tol_pos,
-                    'tol_neg': tol_neg,
-                    'instrumento': instrumento,
-                    'unidad': unidad,
-                    'notas': notas
-                })
-            
-            # Crear estructura JSON en el formato especificado
-            data = {
-                'dimensiones': dimensiones,
-                'version': 1,
-                'fecha_creacion': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            }
-            
-            # Guardar archivo
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-            
+        # Instantánea de la tabla: se puede seguir editando mientras se escribe
+        count = len(self.table_model.rows)
+        dimensions_json = self.generate_dimensions_json()
+        
+        def job(progress, cancelled):
+            write_file_atomic(file_path, dimensions_json)
+            progress(1, 1)
+        
+        def on_finished(_):
             QMessageBox.information(self, 'Exportación Exitosa',
                                   f'✅ Archivo exportado correctamente:\n{file_path}\n\n'
-                                  f'📊 {len(dimensiones)} dimensiones guardadas\n'
-                                  f' Fecha: {data["fecha_creacion"]}')
-            
-        except Exception as e:
-            QMessageBox.critical(self, 'Error', f'Error al exportar:\n{e}')
+                                  f'📊 {count} dimensiones guardadas')
+        
+        self.start_export('JSON', job, on_finished)
     
     def export_pdf_with_balloons(self):
-        """Exportar PDF con globos dibujados y JSON de dimensiones"""
+        """Exportar PDF con globos dibujados y JSON de dimensiones (en segundo plano)"""
+        if self.export_in_progress():
+            return
+        self.ensure_dimensions_panel()
         
         # Validar que hay dimensiones
-        if self.table.rowCount() == 0:
+        if not self.table_model.rows:
             QMessageBox.warning(self, 'Sin dimensiones', 
                               'No hay dimensiones para exportar.\n'
                               'Agregue al menos una dimensión antes de exportar.')
@@ -1059,348 +3071,290 @@ class BaloneaSimpleApp(QMainWindow):
                               'Cargue un PDF antes de exportar.')
             return
         
-        try:
-            # Solicitar nombre base para los archivos
-            default_name = Path(self.current_pdf_path).stem + '_baloneado'
-            file_path, _ = QFileDialog.getSaveFileName(
-                self, 'Guardar PDF con Globos', default_name, 'PDF Files (*.pdf)'
-            )
-            
-            if not file_path:
-                return
-            
-            # Asegurar extensión .pdf
-            if not file_path.lower().endswith('.pdf'):
-                file_path += '.pdf'
-            
-            # Crear archivo PDF con globos
-            pdf_bytes = self.generate_pdf_with_balloons()
-            
-            if not pdf_bytes:
-                QMessageBox.warning(self, 'Error', 'No se pudo generar el PDF con globos')
-                return
-            
-            # Guardar PDF
-            with open(file_path, 'wb') as f:
-                f.write(pdf_bytes)
-            
-            # Guardar JSON con el mismo nombre base
-            json_path = Path(file_path).with_suffix('.json')
-            dimensions_json = self.generate_dimensions_json()
-            
-            with open(json_path, 'w', encoding='utf-8') as f:
-                f.write(dimensions_json)
-            
+        # Solicitar nombre base para los archivos
+        default_name = Path(self.current_pdf_path).stem + '_baloneado'
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, 'Guardar PDF con Globos', default_name, 'PDF Files (*.pdf)'
+        )
+        
+        if not file_path:
+            return
+        
+        # Asegurar extensión .pdf
+        if not file_path.lower().endswith('.pdf'):
+            file_path += '.pdf'
+        json_path = Path(file_path).with_suffix('.json')
+        
+        # Instantánea del documento y los globos; el trabajo no toca el estado de la interfaz
+        pdf_bytes, balloons_by_page = self.export_snapshot()
+        dimensions_json = self.generate_dimensions_json()
+        profile_key = self.cmb_export_profile.currentData()
+        annotations = self.chk_annotations.isChecked()
+        balloon_count = sum(len(page_data['balloons']) for page_data in balloons_by_page.values())
+        row_count = len(self.table_model.rows)
+        
+        def job(progress, cancelled):
+            start = time.perf_counter()
+            data = build_balloon_pdf(pdf_bytes, balloons_by_page, profile_key, annotations, progress, cancelled)
+            elapsed = time.perf_counter() - start
+            write_file_atomic(file_path, data)
+            write_file_atomic(json_path, dimensions_json)
+            return len(data), elapsed
+        
+        def on_finished(result):
+            size, elapsed = result
             QMessageBox.information(self, 'Exportación Exitosa',
                                   f'Archivos exportados correctamente:\n\n'
                                   f'PDF: {file_path}\n'
                                   f'JSON: {json_path}\n\n'
-                                  f'{self.balloon_counter} globos dibujados\n'
-                                  f'{self.table.rowCount()} dimensiones guardadas')
-            
-        except Exception as e:
-            QMessageBox.critical(self, 'Error', f'Error al exportar:\n{e}')
-            import traceback
-            traceback.print_exc()
+                                  f'{balloon_count} globos dibujados\n'
+                                  f'{row_count} dimensiones guardadas\n\n'
+                                  f'Perfil {EXPORT_PROFILES[profile_key]["titulo"]}: '
+                                  f'{size / 1024:.0f} KB en {elapsed:.2f} s')
+        
+        self.start_export('PDF', job, on_finished)
     
-    def generate_dimensions_json(self):
-        """Generar JSON de dimensiones en formato string"""
-        dimensiones = []
+    def export_inspection_report(self):
+        """Exportar todas las características del documento a XLSX, CSV o PDF (en segundo plano)"""
+        if self.export_in_progress():
+            return
+        if not self.pdf_document:
+            QMessageBox.warning(self, 'Sin PDF', 
+                              'No hay PDF cargado.\n'
+                              'Cargue un PDF antes de exportar.')
+            return
         
-        for i in range(self.table.rowCount()):
-            nombre = self.table.item(i, 0).text() if self.table.item(i, 0) else f'D{i+1}'
-            
-            # Parsear valores aceptando fracciones o decimales
-            nominal = self.parse_fraction_or_decimal(
-                self.table.item(i, 1).text() if self.table.item(i, 1) else '0'
-            )
-            
-            tol_pos = self.parse_fraction_or_decimal(
-                self.table.item(i, 2).text() if self.table.item(i, 2) else '0'
-            )
-            
-            tol_neg = self.parse_fraction_or_decimal(
-                self.table.item(i, 3).text() if self.table.item(i, 3) else '0'
-            )
-            
-            # Obtener instrumento del ComboBox
-            cmb_widget = self.table.cellWidget(i, 4)
-            instrumento = cmb_widget.currentText() if cmb_widget else 'Vernier'
-            
-            unidad = self.table.item(i, 5).text() if self.table.item(i, 5) else 'mm'
-            notas = self.table.item(i, 6).text() if self.table.item(i, 6) else ''
-            
-            dimensiones.append({
-                'nombre': nombre,
-                'nominal': nominal,
-                'tol_pos': tol_pos,
-                'tol_neg': tol_neg,
-                'instrumento': instrumento,
-                'unidad': unidad,
-                'notas': notas
-            })
+        # Guardar la página actual y poner al día la numeración de todas las hojas
+        self.save_balloons_for_current_page()
+        self.renumber_stored_pages()
         
-        # Crear estructura JSON
-        data = {
-            'dimensiones': dimensiones,
-            'version': 1,
-            'fecha_creacion': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
+        if not any(page_data['table'] for page_data in self.balloons_by_page.values()):
+            QMessageBox.warning(self, 'Sin dimensiones', 
+                              'No hay dimensiones para exportar.\n'
+                              'Agregue al menos una dimensión antes de exportar.')
+            return
         
-        # Convertir a string JSON
-        return json.dumps(data, indent=2, ensure_ascii=False)
-    
-    def generate_pdf_with_balloons(self):
-        """Generar PDF con los globos dibujados en todas las páginas"""
-        try:
-            if not self.pdf_document:
-                return None
-            
-            # Guardar la página actual antes de exportar
-            self.save_balloons_for_current_page()
-            
-            # Crear un nuevo PDF temporal con los globos dibujados
-            import tempfile
-            import os
-            
-            # Crear primer archivo temporal para el PDF original
-            temp_fd1, temp_path1 = tempfile.mkstemp(suffix='.pdf')
-            os.close(temp_fd1)
-            
-            # Aplicar todas las rotaciones guardadas antes de guardar
-            for page_num, rotation in self.rotation_by_page.items():
-                if rotation != 0:
-                    page = self.pdf_document[page_num]
-                    page.set_rotation(rotation)
-            
-            # Guardar el PDF actual (con rotaciones aplicadas)
-            self.pdf_document.save(temp_path1)
-            
-            # Reabrir el PDF guardado para dibujar los globos
-            temp_doc = fitz.open(temp_path1)
-            
-            # Procesar cada página que tenga globos
-            for page_num, page_data in self.balloons_by_page.items():
-                if page_num >= len(temp_doc):
-                    continue
-                    
-                page = temp_doc[page_num]
-                balloons = page_data['balloons']
-                
-                if len(balloons) == 0:
-                    continue
-                
-                self.draw_balloons_on_page(page, balloons, page_num)
-            
-            # Crear segundo archivo temporal para guardar el PDF modificado
-            temp_fd2, temp_path2 = tempfile.mkstemp(suffix='.pdf')
-            os.close(temp_fd2)
-            
-            # Guardar el PDF modificado en el segundo archivo temporal
-            temp_doc.save(temp_path2)
-            temp_doc.close()
+        default_name = Path(self.current_pdf_path).stem + '_inspeccion'
+        file_path, selected_filter = QFileDialog.getSaveFileName(
+            self, 'Guardar Reporte de Inspección', default_name,
+            'Excel (*.xlsx);;CSV (*.csv);;PDF Files (*.pdf)'
+        )
+        
+        if not file_path:
+            return
+        
+        # Completar la extensión según el filtro elegido
+        suffix = Path(file_path).suffix.lower()
+        if suffix not in REPORT_WRITERS:
+            # Sin filtro elegido (algunos diálogos nativos no lo informan) se usa XLSX
+            match = re.search(r'\*(\.\w+)', selected_filter or '')
+            suffix = match.group(1) if match else '.xlsx'
+            file_path += suffix
+        
+        balloons_by_page = snapshot_balloons(self.balloons_by_page)
+        total_rows = sum(len(page_data['table']) for page_data in balloons_by_page.values())
+        title = f'Reporte de inspección - {Path(self.current_pdf_path).name}'
+        
+        def job(progress, cancelled):
+            start = time.perf_counter()
+            temp_path = f'{file_path}.part'
+            rows = iter_report_rows(balloons_by_page)
             
-            # Leer el PDF modificado
-            with open(temp_path2, 'rb') as f:
-                pdf_bytes = f.read()
+            def report_progress(done):
+                progress(done, total_rows)
             
-            # Eliminar archivos temporales
             try:
-                os.unlink(temp_path1)
-                os.unlink(temp_path2)
-            except:
-                pass  # Ignorar errores al eliminar archivos temporales
-            
-            print(f"DEBUG - PDF generado con {len(pdf_bytes)} bytes")
-            
-            return pdf_bytes
-            
-        except Exception as e:
-            print(f"Error generando PDF con globos: {e}")
-            import traceback
-            traceback.print_exc()
-            return None
+                if suffix == '.pdf':
+                    count = write_report_pdf(temp_path, rows, title, report_progress, cancelled)
+                else:
+                    count = REPORT_WRITERS[suffix](temp_path, rows, report_progress, cancelled)
+                os.replace(temp_path, file_path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.unlink(temp_path)
+                raise
+            return count, time.perf_counter() - start
+        
+        def on_finished(result):
+            count, elapsed = result
+            QMessageBox.information(self, 'Exportación Exitosa',
+                                  f'Reporte exportado correctamente:\n{file_path}\n\n'
+                                  f'{count} características en {elapsed:.2f} s')
+        
+        self.start_export('reporte', job, on_finished)
     
-    def draw_balloons_on_page(self, page, balloons, page_num):
-        """Dibujar globos en una página específica del PDF"""
-        # Obtener dimensiones de la página ORIGINAL (antes de rotación)
-        # La página ya tiene la rotación aplicada, pero necesitamos las dimensiones originales
-        page_rect = page.rect
-        page_width = page_rect.width
-        page_height = page_rect.height
-        
-        # Factor de zoom usado al renderizar el PDF (en show_current_page)
-        render_zoom = 2.0
-        
-        # Obtener rotación de la página
-        rotation = page.rotation
-        
-        print(f"DEBUG PDF Página {page_num+1} - Después de rotación: {page_width}x{page_height}")
-        print(f"DEBUG - Rotación de página: {rotation}°")
-        print(f"DEBUG - Globos a dibujar: {len(balloons)}")
-        
-        # Calcular dimensiones originales (antes de rotar)
-        if rotation in [90, 270]:
-            # Si está rotado 90° o 270°, las dimensiones están intercambiadas
-            original_width = page_height
-            original_height = page_width
-        else:
-            original_width = page_width
-            original_height = page_height
-        
-        print(f"DEBUG - Dimensiones originales: {original_width}x{original_height}")
-        
-        # Dibujar cada globo en el PDF
-        for i, balloon in enumerate(balloons):
-            # Las coordenadas x, y están en el sistema de coordenadas de la escena
-            # que corresponde a la imagen ROTADA renderizada a 2.0x
-            x = balloon['x']
-            y = balloon['y']
-            number = balloon['number']
-            size = balloon['size']
-            balloon_rotation = balloon.get('rotation', 0)  # Rotación cuando se agregó el globo
-            
-            print(f"DEBUG Globo {number} - Escena: ({x:.1f}, {y:.1f}), Tamaño: {size}, Rotación guardada: {balloon_rotation}°")
-            
-            # Convertir coordenadas de la imagen renderizada (dividir por zoom)
-            screen_x = x / render_zoom
-            screen_y = y / render_zoom
-            
-            # Dimensiones de la imagen renderizada rotada
-            if rotation in [90, 270]:
-                rendered_width = page_height
-                rendered_height = page_width
-            else:
-                rendered_width = page_width
-                rendered_height = page_height
-            
-            print(f"DEBUG Globo {number} - Coords pantalla: ({screen_x:.1f}, {screen_y:.1f})")
-            print(f"DEBUG - Dimensiones para transformación: original={original_width}x{original_height}, rotada={page_width}x{page_height}")
-            
-            # Transformar coordenadas según la rotación
-            # IMPORTANTE: Las coordenadas en pantalla van en el sistema rotado
-            # Necesitamos convertirlas al sistema PDF original
-            if rotation == 0:
-                # Sin rotación - solo usar las coordenadas directamente
-                pdf_x = screen_x
-                pdf_y = screen_y
-            elif rotation == 90:
-                # 90° horario: La imagen rotó, así que transformamos
-                # En pantalla vemos (x,y) pero en PDF original es:
-                # La coordenada X de pantalla se convierte en Y de PDF
-                # La coordenada Y de pantalla se convierte en (original_width - X) de PDF
-                pdf_x = screen_y
-                pdf_y = page_width - screen_x
-            elif rotation == 180:
-                # 180°: Volteado completamente
-                pdf_x = page_width - screen_x
-                pdf_y = page_height - screen_y
-            elif rotation == 270:
-                # 270° horario (o 90° antihorario)
-                # X pantalla → (original_height - Y) PDF
-                # Y pantalla → X PDF  
-                pdf_x = page_height - screen_y
-                pdf_y = screen_x
-            else:
-                pdf_x = screen_x
-                pdf_y = screen_y
-            
-            pdf_radius = (size / 2.0) / render_zoom
-            
-            print(f"DEBUG Globo {number} - PDF final: ({pdf_x:.1f}, {pdf_y:.1f}), Radio: {pdf_radius:.1f}")
-            
-            # Dibujar círculo con relleno
-            page.draw_circle(
-                (pdf_x, pdf_y), 
-                pdf_radius, 
-                color=(0, 0.47, 0.84),  # Azul
-                width=2.5,  # Línea gruesa
-                fill=(0, 0.47, 0.84),  # Relleno azul
-                fill_opacity=0.4
-            )
-            
-            # Calcular el tamaño de fuente
-            fontsize = pdf_radius * 1.2
-            
-            # Insertar texto centrado en el globo - ROTANDO JUNTO CON LA PÁGINA
-            text = str(number)
-            
-            # Calcular el tamaño aproximado del texto
-            text_width = fitz.get_text_length(text, fontname="helv", fontsize=fontsize)
-            text_height = fontsize
-            
-            # Usar el centro del globo como punto de anclaje para la rotación
-            # y ajustar desde ahí según la rotación
-            if rotation == 0:
-                # Sin rotación - centrado normal
-                text_x = pdf_x - (text_width / 2)
-                text_y = pdf_y + (text_height / 3)
-            elif rotation == 90:
-                # Rotado 90° horario
-                text_x = pdf_x + (text_height / 3)
-                text_y = pdf_y + (text_width / 2)
-            elif rotation == 180:
-                # Rotado 180°
-                text_x = pdf_x + (text_width / 2)
-                text_y = pdf_y - (text_height / 3)
-            elif rotation == 270:
-                # Rotado 270° horario (90° antihorario)
-                text_x = pdf_x - (text_height / 3)
-                text_y = pdf_y - (text_width / 2)
-            else:
-                text_x = pdf_x - (text_width / 2)
-                text_y = pdf_y + (text_height / 3)
-            
-            # Aplicar la MISMA rotación que la página para que el texto rote junto con ella
+    def export_images(self):
+        """Exportar las hojas con globos como PNG o TIFF multipágina (en segundo plano)"""
+        if self.export_in_progress():
+            return
+        if not self.current_pdf_path or not self.pdf_document:
+            QMessageBox.warning(self, 'Sin PDF', 
+                              'No hay PDF cargado.\n'
+                              'Cargue un PDF antes de exportar.')
+            return
+        
+        dpi, ok = QInputDialog.getInt(
+            self, 'Resolución', 'Resolución de exportación (DPI):',
+            IMAGE_EXPORT_DPI, IMAGE_EXPORT_MIN_DPI, IMAGE_EXPORT_MAX_DPI, 50
+        )
+        if not ok:
+            return
+        
+        default_name = Path(self.current_pdf_path).stem + '_baloneado'
+        file_path, selected_filter = QFileDialog.getSaveFileName(
+            self, 'Guardar Imagen', default_name,
+            'TIFF multipágina (*.tif *.tiff);;PNG por hoja (*.png)'
+        )
+        
+        if not file_path:
+            return
+        
+        if Path(file_path).suffix.lower() not in ('.png', '.tif', '.tiff'):
+            file_path += '.png' if 'png' in selected_filter.lower() else '.tif'
+        
+        # El mismo PDF que la exportación vectorial, así raster y PDF coinciden
+        pdf_bytes, balloons_by_page = self.export_snapshot()
+        profile_key = self.cmb_export_profile.currentData()
+        annotations = self.chk_annotations.isChecked()
+        page_count = self.total_pages
+        
+        def job(progress, cancelled):
+            start = time.perf_counter()
+            data = build_balloon_pdf(pdf_bytes, balloons_by_page, profile_key, annotations, cancelled=cancelled)
+            temp_fd, temp_path = tempfile.mkstemp(suffix='.pdf')
+            with os.fdopen(temp_fd, 'wb') as f:
+                f.write(data)
+            del data
             try:
-                page.insert_text(
-                    (text_x, text_y),
-                    text,
-                    fontsize=fontsize,
-                    color=(1, 1, 1),  # Blanco
-                    fontname="helv",
-                    rotate=rotation,  # MISMA rotación que la página
-                    overlay=True
-                )
-                
-                print(f"DEBUG Globo {number} - Texto insertado en ({text_x:.1f}, {text_y:.1f}) rotando {rotation}°")
-                
-            except Exception as e:
-                print(f"ERROR insertando texto en globo {number}: {e}")
-                import traceback
-                traceback.print_exc()
+                written = export_pdf_as_images(temp_path, file_path, dpi, progress, cancelled)
+            finally:
+                try:
+                    os.unlink(temp_path)
+                except OSError:
+                    pass
+            return written, time.perf_counter() - start
+        
+        def on_finished(result):
+            written, elapsed = result
+            QMessageBox.information(self, 'Exportación Exitosa',
+                                  f'Imagen exportada correctamente:\n{written[0]}'
+                                  f'{f" (+{len(written) - 1} archivos)" if len(written) > 1 else ""}\n\n'
+                                  f'{page_count} hojas a {dpi} DPI en {elapsed:.1f} s')
+        
+        self.start_export('imagen', job, on_finished)
+    
+    # === EXPORTACIÓN EN SEGUNDO PLANO ===
+    
+    def export_in_progress(self):
+        """Avisar si ya hay una exportación en curso (se permite una a la vez)"""
+        if self.export_worker is None:
+            return False
+        QMessageBox.information(self, 'Exportación en Curso',
+                              'Ya hay una exportación en curso.\n'
+                              'Espere a que termine o cancélela.')
+        return True
+    
+    def export_snapshot(self):
+        """
+        Bytes del PDF (con las rotaciones guardadas) y copia de los globos de todas
+        las hojas, con la numeración al día.
+        """
+        # Guardar la página actual antes de exportar
+        self.save_balloons_for_current_page()
+        self.renumber_stored_pages()
+        
+        # Aplicar todas las rotaciones guardadas antes de guardar
+        for page_num, rotation in self.rotation_by_page.items():
+            if rotation != 0:
+                page = self.pdf_document[page_num]
+                page.set_rotation(rotation)
+        
+        return self.pdf_document.tobytes(), snapshot_balloons(self.balloons_by_page)
+    
+    def start_export(self, title, job, on_finished):
+        """Lanzar un trabajo de exportación en un hilo y mostrar su progreso en la barra inferior"""
+        self.export_title = title
+        self.export_worker = ExportWorker(job, self)
+        self.export_worker.progress.connect(self.on_export_progress)
+        self.export_worker.finished_export.connect(on_finished)
+        self.export_worker.failed.connect(self.on_export_failed)
+        self.export_worker.export_cancelled.connect(self.on_export_cancelled)
+        self.export_worker.finished.connect(self.on_export_worker_finished)
+        
+        self.lbl_export_status.setText(f'Exportando {title}...')
+        self.lbl_export_status.show()
+        self.btn_cancel_export.setEnabled(True)
+        self.btn_cancel_export.show()
+        self.export_worker.start()
+    
+    def cancel_export(self):
+        """Pedir al trabajo en curso que se detenga en la siguiente hoja"""
+        if self.export_worker is not None:
+            self.export_worker.requestInterruption()
+            self.btn_cancel_export.setEnabled(False)
+            self.lbl_export_status.setText(f'Cancelando {self.export_title}...')
+    
+    def on_export_progress(self, done, total):
+        if self.export_worker is not None and not self.export_worker.isInterruptionRequested():
+            self.lbl_export_status.setText(f'Exportando {self.export_title}... {done}/{total}')
+    
+    def on_export_failed(self, message):
+        QMessageBox.critical(self, 'Error', f'Error al exportar {self.export_title}:\n{message}')
+    
+    def on_export_cancelled(self):
+        QMessageBox.information(self, 'Exportación Cancelada',
+                              f'Se canceló la exportación de {self.export_title}.\n'
+                              'No se escribió ningún archivo.')
+    
+    def on_export_worker_finished(self):
+        """El hilo terminó (bien, con error o cancelado): liberar la barra de progreso"""
+        self.export_worker = None
+        self.lbl_export_status.hide()
+        self.btn_cancel_export.hide()
+    
+    def compare_export_profiles(self):
+        """Generar el PDF con cada perfil en memoria e informar tamaño y tiempo (en segundo plano)"""
+        if self.export_in_progress():
+            return
+        if not self.pdf_document:
+            QMessageBox.warning(self, 'Sin PDF', 
+                              'No hay PDF cargado.\n'
+                              'Cargue un PDF antes de exportar.')
+            return
+        
+        pdf_bytes, balloons_by_page = self.export_snapshot()
+        annotations = self.chk_annotations.isChecked()
+        
+        def job(progress, cancelled):
+            lines = []
+            for done, (key, profile) in enumerate(EXPORT_PROFILES.items()):
+                start = time.perf_counter()
+                data = build_balloon_pdf(pdf_bytes, balloons_by_page, key, annotations, cancelled=cancelled)
+                elapsed = time.perf_counter() - start
+                lines.append(f'{profile["titulo"]}: {len(data) / 1024:.0f} KB en {elapsed:.2f} s')
+                progress(done + 1, len(EXPORT_PROFILES))
+            return lines
+        
+        def on_finished(lines):
+            QMessageBox.information(self, 'Perfiles de Exportación', '\n'.join(lines))
+        
+        self.start_export('comparación de perfiles', job, on_finished)
+    
+    def generate_dimensions_json(self):
+        """Generar JSON de dimensiones en formato string"""
+        return dimensions_json(self.table_model.rows)
 
 
 def main():
     """Función principal"""
+    # Necesario para los procesos de trabajo en ejecutables congelados
+    multiprocessing.freeze_support()
+    
     app = QApplication(sys.argv)
     
     # Configurar estilo de la aplicación
     app.setStyle('Fusion')
     
-    # Configurar estilo para QMessageBox con texto negro visible
-    app.setStyleSheet("""
-        QMessageBox {
-            background-color: #f0f0f0;
-        }
-        QMessageBox QLabel {
-            color: #000000;
-            font-size: 12px;
-        }
-        QMessageBox QPushButton {
-            background-color: #0e639c;
-            color: white;
-            border: none;
-            padding: 8px 20px;
-            border-radius: 4px;
-            font-weight: bold;
-            min-width: 80px;
-        }
-        QMessageBox QPushButton:hover {
-            background-color: #1177bb;
-        }
-    """)
-    
     window = BaloneaSimpleApp()
     window.show()
     
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Medición del arranque de BALONEO SIMPLE
+
+Lanza varios procesos nuevos con `python -X importtime` y mide el tiempo de
+importación de baloneo_simple (con sus dependencias de primer nivel) y el
+tiempo hasta que la ventana queda mostrada. Sirve para comprobar que el
+arranque en frío no empeora:
+
+    python bench_startup.py --runs 7 --max-ms 400
+"""
+
+import argparse
+import compileall
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+# Línea de -X importtime: "import time: <propio> | <acumulado> | <sangría><módulo>"
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)')
+MODULE = 'baloneo_simple'
+
+# Proceso que mide el tiempo hasta mostrar la ventana (sin entrar en exec_)
+WINDOW_SCRIPT = """
+import time
+start = time.perf_counter()
+import sys
+from PyQt5.QtWidgets import QApplication
+app = QApplication(sys.argv)
+app.setStyle('Fusion')
+import baloneo_simple
+window = baloneo_simple.BaloneaSimpleApp()
+window.show()
+app.processEvents()
+shown = time.perf_counter()
+window.ensure_dimensions_panel()
+app.processEvents()
+ready = time.perf_counter()
+print(f'{(shown - start) * 1000:.1f} {(ready - start) * 1000:.1f}')
+window.close()
+"""
+
+
+def run_importtime(directory):
+    """Importar el módulo en un proceso nuevo; devuelve {módulo de primer nivel: ms} y el total"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {MODULE}'],
+        cwd=directory, capture_output=True, text=True, check=True
+    )
+    children = {}
+    total = None
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if not match:
+            continue
+        cumulative_ms = int(match.group(2)) / 1000
+        depth = len(match.group(3))
+        name = match.group(4)
+        if name == MODULE and depth == 1:
+            total = cumulative_ms
+        elif depth == 3:
+            children[name] = children.get(name, 0) + cumulative_ms
+    return children, total
+
+
+def run_window(directory, offscreen):
+    """Tiempo (ms) hasta mostrar la ventana y hasta tener todos los paneles construidos"""
+    env = dict(os.environ)
+    if offscreen:
+        env['QT_QPA_PLATFORM'] = 'offscreen'
+    result = subprocess.run(
+        [sys.executable, '-c', WINDOW_SCRIPT],
+        cwd=directory, env=env, capture_output=True, text=True, check=True
+    )
+    shown, ready = result.stdout.split()[-2:]
+    return float(shown), float(ready)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Medir el arranque de BALONEO SIMPLE')
+    parser.add_argument('--runs', type=int, default=5, help='Procesos por medición (se informa la mediana)')
+    parser.add_argument('--top', type=int, default=10, help='Dependencias más lentas a listar')
+    parser.add_argument('--max-ms', type=float, default=None,
+                        help='Fallar (código 1) si la importación supera este tiempo')
+    parser.add_argument('--no-window', action='store_true', help='Medir solo la importación')
+    parser.add_argument('--offscreen', action='store_true', help='Usar la plataforma Qt offscreen')
+    args = parser.parse_args()
+    
+    directory = Path(__file__).resolve().parent
+    # Compilar antes (aplicación y baloneo_core) para que la generación de .pyc no cuente en la medición
+    # (con PYTHONDONTWRITEBYTECODE la importación no los escribe)
+    compileall.compile_file(str(directory / f'{MODULE}.py'), quiet=1)
+    compileall.compile_dir(str(directory / 'baloneo_core'), quiet=1)
+    
+    totals = []
+    per_module = {}
+    for _ in range(args.runs):
+        children, total = run_importtime(directory)
+        totals.append(total)
+        for name, ms in children.items():
+            per_module.setdefault(name, []).append(ms)
+    
+    import_ms = statistics.median(totals)
+    print(f'Importación de {MODULE}: {import_ms:.1f} ms (mediana de {args.runs}, '
+          f'mín {min(totals):.1f}, máx {max(totals):.1f})')
+    slowest = sorted(((statistics.median(v), k) for k, v in per_module.items()), reverse=True)
+    for ms, name in slowest[:args.top]:
+        print(f'  {ms:8.1f} ms  {name}')
+    
+    if not args.no_window:
+        samples = [run_window(directory, args.offscreen) for _ in range(args.runs)]
+        shown = statistics.median(s[0] for s in samples)
+        ready = statistics.median(s[1] for s in samples)
+        print(f'Ventana mostrada: {shown:.1f} ms | paneles completos: {ready:.1f} ms')
+    
+    if args.max_ms is not None and import_ms > args.max_ms:
+        print(f'La importación ({import_ms:.1f} ms) supera el límite de {args.max_ms:.1f} ms')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""Las pruebas importan baloneo_core desde la raíz del repositorio"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""Pruebas de la comparación de revisiones (baloneo_core.diff)"""
+
+import fitz
+
+from baloneo_core.diff import diff_pages, merge_rects, point_in_rects
+
+
+def test_merge_rects_joins_touching_rects_only():
+    merged = merge_rects([(0, 0, 10, 10), (11, 0, 20, 10), (100, 100, 110, 110)])
+    assert sorted(merged) == [(0, 0, 20, 10), (100, 100, 110, 110)]
+    # Separados por más que el margen: quedan aparte
+    assert len(merge_rects([(0, 0, 10, 10), (13, 0, 20, 10)])) == 2
+
+
+def test_merge_rects_merges_chains_transitively():
+    merged = merge_rects([(0, 0, 10, 10), (40, 0, 50, 10), (10, 0, 40, 10)])
+    assert merged == [(0, 0, 50, 10)]
+
+
+def drawing(texts, size=(600, 400)):
+    doc = fitz.open()
+    page = doc.new_page(width=size[0], height=size[1])
+    page.draw_rect(fitz.Rect(20, 20, 580, 380), width=1)
+    for point, text in texts:
+        page.insert_text(point, text, fontsize=12)
+    return doc
+
+
+def test_identical_pages_have_no_changes():
+    old = drawing([((100, 100), 'Ø12.5'), ((300, 200), '25.40 ±0.05')])
+    new = drawing([((100, 100), 'Ø12.5'), ((300, 200), '25.40 ±0.05')])
+    assert diff_pages(old[0], new[0]) is None
+
+
+def test_changed_text_is_located():
+    old = drawing([((100, 100), 'Ø12.5'), ((300, 200), '25.40 ±0.05')])
+    new = drawing([((100, 100), 'Ø12.5'), ((300, 200), '25.60 ±0.05')])
+    changes = diff_pages(old[0], new[0])
+    assert changes
+    # El cambio cubre la cota editada y no la que sigue igual
+    assert point_in_rects(320, 196, changes)
+    assert not point_in_rects(110, 96, changes)
+
+
+def test_page_size_change_marks_the_whole_page():
+    old = drawing([])
+    new = drawing([], size=(842, 595))
+    assert diff_pages(old[0], new[0]) == [tuple(new[0].cropbox)]
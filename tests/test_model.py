@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""Pruebas de la numeración de globos (baloneo_core.model)"""
+
+import random
+
+import pytest
+
+from baloneo_core.model import (NUMBERING_DOCUMENT, NUMBERING_PAGE, BalloonNumbering, FenwickTree,
+                                suffix_letters)
+
+
+def page(*sub_flags):
+    return {'balloons': [{'sub': sub} for sub in sub_flags], 'table': []}
+
+
+@pytest.mark.parametrize('n, letters', [(1, 'A'), (26, 'Z'), (27, 'AA'), (52, 'AZ'), (53, 'BA'), (703, 'AAA')])
+def test_suffix_letters(n, letters):
+    assert suffix_letters(n) == letters
+
+
+def test_fenwick_prefix_matches_plain_sums():
+    rng = random.Random(7)
+    values = [0] * 50
+    tree = FenwickTree(len(values))
+    for _ in range(500):
+        index, delta = rng.randrange(len(values)), rng.randint(-3, 5)
+        values[index] += delta
+        tree.add(index, delta)
+        end = rng.randrange(len(values) + 1)
+        assert tree.prefix(end) == sum(values[:end])
+
+
+def test_labels_with_insert_between_balloons():
+    numbering = BalloonNumbering(3)
+    numbering.rebuild({0: page(False, False, True, True, False), 2: page(True, False)}, 3)
+    assert numbering.labels(0, [False, False, True, True, False]) == ['1', '2', '2A', '2B', '3']
+    # Hoja vacía en medio: la numeración sigue donde quedó
+    assert numbering.offset(2) == 3
+    # Un intercalado al principio de la hoja cuelga del último principal anterior
+    assert numbering.labels(2, [True, False]) == ['3A', '4']
+
+
+def test_later_pages_shift_when_a_page_changes():
+    numbering = BalloonNumbering(4)
+    numbering.rebuild({0: page(False, False), 1: page(False), 3: page(False)}, 4)
+    assert numbering.labels(3, [False]) == ['4']
+    
+    numbering.set_page_count(0, 5)
+    assert numbering.labels(1, [False]) == ['6']
+    assert numbering.labels(3, [False]) == ['7']
+    
+    numbering.set_page_count(1, 0)
+    assert numbering.offset(3) == 5
+
+
+def test_page_policy_restarts_on_every_page():
+    numbering = BalloonNumbering(2, policy=NUMBERING_PAGE)
+    numbering.rebuild({0: page(False, False), 1: page(False, True)}, 2)
+    assert numbering.labels(1, [False, True]) == ['1', '1A']
+    numbering.policy = NUMBERING_DOCUMENT
+    assert numbering.labels(1, [False, True]) == ['3', '3A']
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""Pruebas de la escritura de globos en el PDF (baloneo_core.pdfwriter)"""
+
+import fitz
+import pytest
+
+from baloneo_core.model import new_dimension_row
+from baloneo_core.pdfwriter import build_balloon_pdf, draw_balloons_on_page, read_balloon_annotations
+
+
+BALLOONS = [
+    {'x': 100.0, 'y': 80.0, 'number': '1', 'size': 30.0},
+    {'x': 300.0, 'y': 200.0, 'number': '12', 'size': 30.0},
+]
+
+
+def render_with_balloons(mediabox, rotation, glyphs):
+    """PNG de una página con los globos dibujados como glifo compartido o con draw_circle"""
+    doc = fitz.open()
+    page = doc.new_page(width=600, height=400)
+    page.set_mediabox(fitz.Rect(mediabox))
+    page.set_rotation(rotation)
+    draw_balloons_on_page(page, BALLOONS, glyphs)
+    # Volver a abrir desde los bytes: así se renderiza lo que se exporta
+    out = fitz.open('pdf', doc.tobytes())
+    return out[0].get_pixmap(dpi=72, alpha=False)
+
+
+def ink_bbox(pix):
+    """Caja (x0, y0, x1, y1) en píxeles de todo lo que no es blanco"""
+    xs, ys = [], []
+    samples, n, width = pix.samples, pix.n, pix.width
+    for offset in range(0, len(samples), n):
+        if min(samples[offset:offset + n]) < 200:
+            pixel = offset // n
+            xs.append(pixel % width)
+            ys.append(pixel // width)
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+@pytest.mark.parametrize('mediabox', [(0, 0, 600, 400), (50, 30, 650, 430)])
+@pytest.mark.parametrize('rotation', [0, 90, 180, 270])
+def test_glyph_export_matches_draw_circle(mediabox, rotation):
+    with_glyphs = render_with_balloons(mediabox, rotation, {})
+    with_shape = render_with_balloons(mediabox, rotation, None)
+    assert (with_glyphs.width, with_glyphs.height) == (with_shape.width, with_shape.height)
+    
+    # Los dos caminos deben pintar los círculos en el mismo sitio (se tolera el antialias)
+    expected = ink_bbox(with_shape)
+    assert all(abs(a - b) <= 2 for a, b in zip(ink_bbox(with_glyphs), expected))
+    differing = sum(1 for a, b in zip(with_glyphs.samples, with_shape.samples) if abs(a - b) > 64)
+    assert differing < 200
+
+
+@pytest.mark.parametrize('rotation', [0, 90])
+def test_annotation_export_round_trip(rotation):
+    doc = fitz.open()
+    doc.new_page(width=600, height=400)
+    page = doc.new_page(width=600, height=400)
+    page.set_rotation(rotation)
+    # Una anotación ajena al programa no se lee ni se borra
+    page.add_text_annot((500, 300), 'Revisar')
+    balloons = [
+        {'x': 100.0, 'y': 80.0, 'number': '1', 'size': 30.0, 'sub': False},
+        {'x': 300.0, 'y': 200.0, 'number': '1A', 'size': 24.0, 'sub': True},
+    ]
+    rows = [
+        new_dimension_row('Ø', nominal='12.5', tol_pos='0.1', tol_neg='0.05', notas='crítica'),
+        new_dimension_row('L', nominal='1 1/2', unidad='in'),
+    ]
+    data = build_balloon_pdf(doc.tobytes(), {1: {'balloons': balloons, 'table': rows}}, 'rapido',
+                             annotations=True)
+    
+    exported = fitz.open('pdf', data)
+    result = read_balloon_annotations(exported, strip=True)
+    assert list(result) == [1]
+    read = result[1]
+    assert read['table'] == rows
+    for original, balloon in zip(balloons, read['balloons']):
+        assert balloon['x'] == pytest.approx(original['x'], abs=0.01)
+        assert balloon['y'] == pytest.approx(original['y'], abs=0.01)
+        assert (balloon['number'], balloon['size'], balloon['sub']) == (
+            original['number'], original['size'], original['sub'])
+    
+    # strip=True deja solo la anotación ajena
+    assert [annot.type[1] for annot in exported[1].annots()] == ['Text']
+    assert read_balloon_annotations(exported) == {}
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""Pruebas de los renders de los procesos de trabajo (miniaturas y planos escaneados)"""
+
+import fitz
+
+from baloneo_core.pdfwriter import build_balloon_pdf
+from baloneo_core.raster import render_thumbnail_png
+from baloneo_core.scan import preprocess_scanned_page
+
+
+def make_drawing(path):
+    doc = fitz.open()
+    page = doc.new_page(width=600, height=400)
+    page.draw_rect(fitz.Rect(50, 50, 550, 350), width=2)
+    page.insert_text((80, 120), 'Ø12.5 ±0.1', fontsize=14)
+    doc.save(str(path))
+    return path.read_bytes()
+
+
+def test_worker_renders_ignore_balloon_annotations(tmp_path):
+    original = tmp_path / 'plano.pdf'
+    pdf_bytes = make_drawing(original)
+    balloons = {0: {'balloons': [{'x': 300.0, 'y': 200.0, 'number': '1', 'size': 30.0}], 'table': []}}
+    annotated = tmp_path / 'plano_globos.pdf'
+    annotated.write_bytes(build_balloon_pdf(pdf_bytes, balloons, 'rapido', annotations=True))
+    with fitz.open(str(annotated)) as doc:
+        assert doc[0].first_annot is not None
+    
+    # Los globos ya están en la escena: el fondo y la miniatura no deben repetirlos
+    assert render_thumbnail_png(str(annotated), 0)[1] == render_thumbnail_png(str(original), 0)[1]
+    assert (preprocess_scanned_page(str(annotated), 0, 1.0, 0)
+            == preprocess_scanned_page(str(original), 0, 1.0, 0))
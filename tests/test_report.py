@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""Pruebas del reporte de inspección en CSV y XLSX (baloneo_core.report)"""
+
+import csv
+import zipfile
+from xml.etree import ElementTree
+
+import pytest
+
+from baloneo_core.model import new_dimension_row
+from baloneo_core.pdfwriter import ExportCancelled
+from baloneo_core.report import (REPORT_CHUNK_ROWS, REPORT_COLUMNS, iter_report_rows, write_report_csv,
+                                 write_report_xlsx)
+
+
+XLSX_NS = {'s': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+
+
+def report_rows():
+    balloons_by_page = {
+        2: {'balloons': [{'number': '5'}], 'table': [new_dimension_row('Ø', nominal='8')]},
+        0: {
+            'balloons': [{'number': '1'}, {'number': '1A'}],
+            'table': [
+                new_dimension_row('L', nominal='12.5', tol_pos='0.1', notas='A < B & "C"'),
+                new_dimension_row('R', nominal='1 1/2', unidad='in', notas='ctrl\x01char'),
+                # Fila sin globo: se reporta con el número vacío
+                new_dimension_row('Extra'),
+            ],
+        },
+    }
+    return list(iter_report_rows(balloons_by_page))
+
+
+def test_rows_follow_page_and_balloon_order():
+    rows = report_rows()
+    assert [(row[0], row[1], row[2]) for row in rows] == [
+        ('1', '1', 'L'), ('1', '1A', 'R'), ('1', '', 'Extra'), ('3', '5', 'Ø'),
+    ]
+    assert all(len(row) == len(REPORT_COLUMNS) for row in rows)
+
+
+def test_csv_writer(tmp_path):
+    path = tmp_path / 'reporte.csv'
+    rows = report_rows()
+    assert write_report_csv(str(path), iter(rows)) == len(rows)
+    
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        read = list(csv.reader(f))
+    assert read[0] == [header for _, header, _ in REPORT_COLUMNS]
+    assert [tuple(row) for row in read[1:]] == rows
+
+
+def test_xlsx_writer(tmp_path):
+    path = tmp_path / 'reporte.xlsx'
+    rows = report_rows()
+    assert write_report_xlsx(str(path), iter(rows)) == len(rows)
+    
+    with zipfile.ZipFile(path) as zf:
+        assert zf.testzip() is None
+        sheet = ElementTree.fromstring(zf.read('xl/worksheets/sheet1.xml'))
+    sheet_rows = sheet.findall('s:sheetData/s:row', XLSX_NS)
+    assert [row.get('r') for row in sheet_rows] == [str(i) for i in range(1, len(rows) + 2)]
+    
+    def cell_value(cell):
+        if cell.get('t') == 'inlineStr':
+            return cell.find('s:is/s:t', XLSX_NS).text or ''
+        return cell.find('s:v', XLSX_NS).text
+    
+    values = [[cell_value(cell) for cell in row] for row in sheet_rows]
+    assert values[0] == [header for _, header, _ in REPORT_COLUMNS]
+    assert values[1][2:4] == ['L', '12.5']
+    # Los números van como número y los textos se escapan (sin caracteres de control)
+    assert sheet_rows[1].findall('s:c', XLSX_NS)[3].get('t') is None
+    assert values[1][-1] == 'A < B & "C"'
+    assert values[2][-1] == 'ctrlchar'
+    assert values[2][3] == '1 1/2'
+
+
+@pytest.mark.parametrize('writer', [write_report_csv, write_report_xlsx])
+def test_writers_report_progress_and_cancel(tmp_path, writer):
+    rows = [tuple(str(i) for _ in REPORT_COLUMNS) for i in range(REPORT_CHUNK_ROWS * 2 + 10)]
+    progress = []
+    assert writer(str(tmp_path / 'a'), iter(rows), progress.append) == len(rows)
+    assert progress == [REPORT_CHUNK_ROWS, REPORT_CHUNK_ROWS * 2, len(rows)]
+    
+    # Cancelar tras el primer bloque: no se escribe el siguiente
+    written = []
+    with pytest.raises(ExportCancelled):
+        writer(str(tmp_path / 'b'), iter(rows), written.append, cancelled=lambda: bool(written))
+    assert written == [REPORT_CHUNK_ROWS]
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""Pruebas del servicio HTTP de exportación (baloneo_core.service)"""
+
+import asyncio
+import base64
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import fitz
+import pytest
+
+from baloneo_core.service import BalloonExportService, ServiceError
+
+
+def sample_pdf():
+    doc = fitz.open()
+    doc.new_page(width=600, height=400).insert_text((80, 120), 'Ø12.5', fontsize=14)
+    return doc.tobytes()
+
+
+def test_rejected_concurrent_upload_keeps_cached_document(tmp_path):
+    pdf_bytes = sample_pdf()
+    
+    async def scenario():
+        # Un solo proceso y sin cola: la segunda subida del mismo PDF recibe 503
+        service = BalloonExportService(pool=ThreadPoolExecutor(1), workers=1, queue_limit=0,
+                                       directory=tmp_path)
+        first, second = await asyncio.gather(
+            service.store_document(pdf_bytes), service.store_document(pdf_bytes),
+            return_exceptions=True,
+        )
+        assert isinstance(second, ServiceError) and second.status == 503
+        digest, path, page_count = first
+        assert os.path.exists(path) and page_count == 1
+        
+        body = json.dumps({'documento': digest, 'paginas': {'0': {'balloons': [{'x': 50, 'y': 50, 'number': 1}]}}})
+        response = await service.handle_balloons(body.encode('utf-8'))
+        return path, fitz.open('pdf', base64.b64decode(response['pdf']))
+    
+    path, exported = asyncio.run(scenario())
+    assert len(exported) == 1
+    # Solo queda el original guardado: ningún temporal de la petición rechazada
+    assert os.listdir(tmp_path) == [os.path.basename(path)]
+
+
+def test_invalid_upload_leaves_no_files(tmp_path):
+    async def scenario():
+        service = BalloonExportService(pool=ThreadPoolExecutor(1), directory=tmp_path)
+        with pytest.raises(ServiceError) as error:
+            await service.store_document(b'no es un pdf')
+        return error.value.status
+    
+    assert asyncio.run(scenario()) == 400
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""Pruebas de la estadística de tolerancias y el apilamiento (baloneo_core.stats)"""
+
+import math
+
+import pytest
+
+from baloneo_core.model import new_dimension_row
+from baloneo_core.stats import TOLERANCE_BANDS, ToleranceStats
+
+
+def make_stats(*rows):
+    stats = ToleranceStats()
+    stats.rebuild({0: {'balloons': [], 'table': list(rows)}})
+    return stats
+
+
+def test_stackup_worst_case_and_rss():
+    a = new_dimension_row('A', nominal='10', tol_pos='0.1', tol_neg='0.05')
+    b = new_dimension_row('B', nominal='5', tol_pos='0.2', tol_neg='0.1')
+    stats = make_stats(a, b)
+    
+    result = stats.stackup([(a, +1), (b, -1)])
+    assert result['nominal'] == pytest.approx(5.0)
+    # Peor caso: mínimo de A menos máximo de B, máximo de A menos mínimo de B
+    assert result['peor_caso'] == pytest.approx((9.95 - 5.2, 10.1 - 4.9))
+    # RSS: centros de las zonas de tolerancia y semi-bandas en cuadratura
+    center = 10.025 - 5.05
+    half = math.sqrt(0.075 ** 2 + 0.15 ** 2)
+    assert result['rss'] == pytest.approx((center - half, center + half))
+
+
+def test_negative_tolerance_is_stored_as_magnitude():
+    row = new_dimension_row('A', nominal='10', tol_pos='0.1', tol_neg='-0.05')
+    stats = make_stats(row)
+    assert stats.limits(row) == pytest.approx((9.95, 10.1))
+
+
+def test_inch_rows_are_stored_in_mm():
+    row = new_dimension_row('A', nominal='1', tol_pos='0.001', tol_neg='0.001', unidad='in')
+    stats = make_stats(row)
+    assert stats.limits(row) == pytest.approx((25.4 - 0.0254, 25.4 + 0.0254))
+    assert stats.limits(row, 'in') == pytest.approx((0.999, 1.001))
+
+
+def test_band_counts_follow_edits_and_removals():
+    a = new_dimension_row('A', tol_pos='0.01', tol_neg='0')
+    b = new_dimension_row('B', tol_pos='0.5', tol_neg='0.5')
+    stats = make_stats(a, b)
+    counts = dict(stats.distribution())
+    assert sum(counts.values()) == 2
+    assert stats.band_counts[0] == 1 and stats.band_counts[len(TOLERANCE_BANDS) - 2] == 1
+    
+    a['tol_pos'] = '2'
+    stats.update_row(a)
+    assert stats.band_counts[0] == 0
+    assert stats.band_counts[-1] == 1
+    
+    stats.remove_row(b)
+    assert len(stats) == 1
+    assert sum(stats.band_counts) == 1
+    # La posición libre se reutiliza
+    c = new_dimension_row('C')
+    stats.add_row(0, c)
+    assert len(stats.rows) == 2
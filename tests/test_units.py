@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""Pruebas de los valores de cota y la conversión exacta mm <-> in (baloneo_core.units)"""
+
+from fractions import Fraction
+
+import pytest
+
+from baloneo_core.units import (convert_row_unit, convert_value_text, format_exact, parse_exact,
+                                parse_fraction_or_decimal, row_value)
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('12.5', Fraction(25, 2)),
+    ('3/4', Fraction(3, 4)),
+    ('1 1/2', Fraction(3, 2)),
+    ('-1 1/2', Fraction(-3, 2)),
+    (' 0.1 ', Fraction(1, 10)),
+    ('', None),
+    ('M8', None),
+    ('1/0', None),
+])
+def test_parse_exact(text, expected):
+    assert parse_exact(text) == expected
+
+
+def test_parse_fraction_or_decimal():
+    assert parse_fraction_or_decimal('1 1/2') == 1.5
+    assert parse_fraction_or_decimal('3/4') == 0.75
+    assert parse_fraction_or_decimal('abc') == 0.0
+    assert parse_fraction_or_decimal('') == 0.0
+
+
+def test_format_exact_uses_inch_fractions_up_to_64ths():
+    assert format_exact(Fraction(3, 64), 'in') == '3/64'
+    assert format_exact(Fraction(-3, 2), 'in') == '-1 1/2'
+    assert format_exact(Fraction(2), 'in') == '2.0'
+    # 1/128 no se muestra como fracción: decimal con 4 cifras
+    assert format_exact(Fraction(1, 128), 'in') == '0.0078'
+    assert format_exact(Fraction(127, 10), 'mm') == '12.7'
+
+
+def test_convert_value_text_is_exact():
+    assert convert_value_text('1', 'mm') == ('25.4', None)
+    assert convert_value_text('1/2', 'mm') == ('12.7', None)
+    assert convert_value_text('12.7', 'in') == ('1/2', None)
+    # 10 mm no es exacto en pulgadas: el texto es un redondeo y se guarda el valor exacto
+    assert convert_value_text('10', 'in') == ('0.3937', '50/127')
+    assert convert_value_text('M8', 'in') is None
+
+
+def test_convert_row_unit_round_trip_returns_original_values():
+    row = {'nominal': '10', 'tol_pos': '0.1', 'tol_neg': '0.05', 'unidad': 'mm', 'notas': 'M8'}
+    assert convert_row_unit(row, 'in')
+    assert row['unidad'] == 'in'
+    assert row['nominal'] == '0.3937'
+    assert row_value(row, 'nominal') == float(Fraction(50, 127))
+    assert not convert_row_unit(row, 'in')
+    
+    assert convert_row_unit(row, 'mm')
+    assert (row['nominal'], row['tol_pos'], row['tol_neg']) == ('10.0', '0.1', '0.05')
+    assert '_exact' not in row
+    assert row['notas'] == 'M8'
+
+
+def test_edited_text_drops_the_exact_value():
+    row = {'nominal': '10', 'tol_pos': '0', 'tol_neg': '0', 'unidad': 'mm'}
+    convert_row_unit(row, 'in')
+    row['nominal'] = '0.5'
+    assert row_value(row, 'nominal') == 0.5
+    convert_row_unit(row, 'mm')
+    assert row['nominal'] == '12.7'